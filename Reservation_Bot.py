@@ -2,13 +2,21 @@
 
 import os
 import psycopg2
-from db_utils import get_db_connection, init_db
+from psycopg2.extras import execute_values
+from db_utils import get_db_connection, init_db, on_commit
 import requests
 import json
 from datetime import datetime, timedelta
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from gcal import create_event, delete_event
+from gcal import create_event, delete_event, delete_events, preload_clients
+import event_bus
+import report_engine
+import pricing
+import localization
+import metrics
+import async_pipeline
+import side_effects
+import sql_profiler
+from log_utils import get_logger
 from dotenv import load_dotenv
 from flask import (
     Flask,
@@ -19,15 +27,31 @@ from flask import (
     redirect,
     url_for,
     jsonify,
+    Response,
+    stream_with_context,
+    g,
 )
 from werkzeug.security import generate_password_hash, check_password_hash
-from dateutil import parser as dtparse
 import pytz
-import sys
+import logging
 import time
-from urllib.parse import quote_plus
+from urllib.parse import quote_plus, urlencode
 import secrets
+import hashlib
+import queue
+import contextvars
+import functools
 from flask import abort
+
+webhook_log = get_logger("webhook")
+payload_log = get_logger("webhook.payload")
+whatsapp_log = get_logger("whatsapp")
+conversation_log = get_logger("conversation")
+gcal_log = get_logger("gcal")
+ai_log = get_logger("ai")
+sql_log = get_logger("sql")
+onboarding_log = get_logger("onboarding")
+dashboard_log = get_logger("dashboard")
 # ------------------ BUSINESS HELPERS ------------------
 
 processed_message_ids = {}
@@ -38,17 +62,18 @@ PROCESSING_MESSAGE_TTL = 60        # 1 minute
 
 
 def cleanup_message_tracking():
+    # list() snapshots: async pipeline threads mark messages concurrently.
     now = time.time()
 
     expired_done = [
-        mid for mid, ts in processed_message_ids.items()
+        mid for mid, ts in list(processed_message_ids.items())
         if now - ts > PROCESSED_MESSAGE_TTL
     ]
     for mid in expired_done:
         processed_message_ids.pop(mid, None)
 
     expired_processing = [
-        mid for mid, ts in processing_message_ids.items()
+        mid for mid, ts in list(processing_message_ids.items())
         if now - ts > PROCESSING_MESSAGE_TTL
     ]
     for mid in expired_processing:
@@ -141,6 +166,82 @@ def get_business_by_id(business_id: int):
     return None
 
 
+# ------------------ PER-TURN MEMO ------------------
+
+# Read-only lookups made while handling one incoming message (day rules,
+# resources, service rows, a day's reservations) are cached for the rest of
+# that message. The memo lives in a context variable so the conversation and
+# availability helpers share it without passing it around; outside a turn
+# (dashboard, API routes) every call goes to the database as before.
+_turn_memo = contextvars.ContextVar("turn_memo", default=None)
+
+metrics.counter("turn_memo_turns_total", "Messages handled with a turn memo.")
+metrics.counter(
+    "turn_memo_lookups_total",
+    "Memoized lookups made while handling messages, by whether the memo answered them.",
+)
+
+
+def begin_turn_memo():
+    return _turn_memo.set({"values": {}, "lookups": 0, "saved": 0})
+
+
+def end_turn_memo(token):
+    """
+    Drops the turn's memo and returns (lookups, saved) for it.
+    """
+    memo = _turn_memo.get()
+    _turn_memo.reset(token)
+    if memo is None:
+        return 0, 0
+    metrics.inc("turn_memo_turns_total")
+    if memo["saved"]:
+        metrics.inc("turn_memo_lookups_total", memo["saved"], result="hit")
+    if memo["lookups"] > memo["saved"]:
+        metrics.inc("turn_memo_lookups_total", memo["lookups"] - memo["saved"], result="miss")
+    return memo["lookups"], memo["saved"]
+
+
+def get_turn_memo_stats():
+    """
+    Totals since the worker started: turns, lookups, and lookups saved.
+    """
+    turns = sum(metrics.counter_snapshot("turn_memo_turns_total").values())
+    lookups = {
+        dict(labels)["result"]: value
+        for labels, value in metrics.counter_snapshot("turn_memo_lookups_total").items()
+    }
+    hits = lookups.get("hit", 0)
+    return {"turns": turns, "lookups": hits + lookups.get("miss", 0), "saved": hits}
+
+
+def clear_turn_memo():
+    """
+    Called on writes so later lookups in the same turn see the new rows.
+    """
+    memo = _turn_memo.get()
+    if memo is not None:
+        memo["values"].clear()
+
+
+def turn_memoized(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        memo = _turn_memo.get()
+        if memo is None:
+            return fn(*args, **kwargs)
+
+        key = (fn.__name__, args, tuple(sorted(kwargs.items())))
+        memo["lookups"] += 1
+        if key in memo["values"]:
+            memo["saved"] += 1
+            return memo["values"][key]
+
+        value = memo["values"][key] = fn(*args, **kwargs)
+        return value
+    return wrapper
+
+
 # ------------------ FLASK APP ------------------
 
 app = Flask(__name__)
@@ -178,6 +279,72 @@ def csrf_protect():
     if not session_token or not form_token or session_token != form_token:
         abort(403)
 
+
+metrics.histogram("http_request_seconds", "HTTP request latency by endpoint.")
+
+
+SQL_PROFILE_HEADER = "X-SQL-Profile"
+
+
+def sql_profile_requested():
+    """
+    SQL_PROFILE=1 profiles every request; otherwise the X-SQL-Profile header
+    turns it on for one request when it carries SQL_PROFILE_TOKEN or comes
+    from a support session.
+    """
+    if sql_profiler.ALWAYS_ON:
+        return True
+    header = request.headers.get(SQL_PROFILE_HEADER)
+    if not header:
+        return False
+    profile_token = os.getenv("SQL_PROFILE_TOKEN")
+    if profile_token and secrets.compare_digest(header, profile_token):
+        return True
+    return require_support()
+
+
+def finish_sql_profile():
+    report = sql_profiler.finish()
+    if report is None:
+        return None
+    if report["n_plus_one"]:
+        sql_log.warning("%s", sql_profiler.summarize(report))
+    else:
+        sql_log.debug("%s", sql_profiler.summarize(report))
+    return report
+
+
+@app.before_request
+def start_request_metrics():
+    g.request_started_at = time.perf_counter()
+    metrics.begin_request_db()
+    if sql_profile_requested():
+        sql_profiler.start(request.endpoint or "unmatched", path=request.path, method=request.method)
+
+
+@app.after_request
+def attach_sql_profile(response):
+    report = finish_sql_profile()
+    if report is not None:
+        response.headers["X-SQL-Profile-Id"] = str(report["id"])
+        response.headers["X-SQL-Queries"] = str(report["queries"])
+        response.headers["X-SQL-N-Plus-One"] = str(len(report["n_plus_one"]))
+    return response
+
+
+@app.teardown_request
+def record_request_metrics(exc=None):
+    # Requests that raised skip after_request; close their profile here.
+    finish_sql_profile()
+    started = g.pop("request_started_at", None)
+    queries, db_seconds = metrics.end_request_db()
+    if started is None:
+        return
+    endpoint = request.endpoint or "unmatched"
+    metrics.observe("http_request_seconds", time.perf_counter() - started, endpoint=endpoint)
+    metrics.observe("db_queries_per_request", queries, endpoint=endpoint)
+    metrics.observe("db_seconds_per_request", db_seconds, endpoint=endpoint)
+
 # ------------------ WHATSAPP EMBEDDED SIGNUP / COEXISTENCE ------------------
 
 @app.route("/wa-onboarding")
@@ -365,7 +532,7 @@ def exchange_whatsapp_signup_code(code):
     meta_app_secret = os.getenv("META_APP_SECRET", "").strip()
 
     if not meta_app_id or not meta_app_secret:
-        print("Missing META_APP_ID or META_APP_SECRET; cannot exchange code.", flush=True)
+        onboarding_log.error("missing META_APP_ID or META_APP_SECRET; cannot exchange code")
         return None, None
 
     try:
@@ -379,8 +546,9 @@ def exchange_whatsapp_signup_code(code):
             timeout=15,
         )
 
-        print("Token exchange status:", response.status_code, flush=True)
-        print("Token exchange body:", response.text, flush=True)
+        onboarding_log.info("token exchange status: %s", response.status_code)
+        # The body carries the access token; the log formatter redacts it.
+        onboarding_log.debug("token exchange body: %s", response.text)
 
         if not response.ok:
             return None, None
@@ -392,7 +560,7 @@ def exchange_whatsapp_signup_code(code):
         return access_token, expires_in
 
     except Exception as e:
-        print("exchange_whatsapp_signup_code error:", e, flush=True)
+        onboarding_log.error("exchange_whatsapp_signup_code error: %s", e)
         return None, None
 
 
@@ -793,6 +961,66 @@ def ensure_fb_tables():
     c.execute("CREATE INDEX IF NOT EXISTS idx_fb_sales_business_sold_at ON fb_sales (business_id, sold_at DESC)")
     c.execute("CREATE INDEX IF NOT EXISTS idx_fb_sale_items_sale_id ON fb_sale_items (sale_id)")
 
+    # Daily rollups (business-local dates) kept up to date by insert_fb_sale,
+    # so reports never scan the full sales history.
+    c.execute("SELECT to_regclass('fb_daily_sales') IS NULL AS missing")
+    rollups_missing = c.fetchone()["missing"]
+
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS fb_daily_sales (
+            business_id INTEGER NOT NULL,
+            sale_date DATE NOT NULL,
+            sales_count INTEGER NOT NULL DEFAULT 0,
+            revenue NUMERIC(12,2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (business_id, sale_date)
+        )
+        """
+    )
+
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS fb_daily_items (
+            business_id INTEGER NOT NULL,
+            sale_date DATE NOT NULL,
+            product_name TEXT NOT NULL,
+            quantity INTEGER NOT NULL DEFAULT 0,
+            revenue NUMERIC(12,2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (business_id, sale_date, product_name)
+        )
+        """
+    )
+
+    if rollups_missing:
+        c.execute(
+            """
+            INSERT INTO fb_daily_sales (business_id, sale_date, sales_count, revenue)
+            SELECT s.business_id,
+                   (s.sold_at AT TIME ZONE COALESCE(b.timezone, 'Asia/Beirut'))::date,
+                   COUNT(*),
+                   SUM(s.total_amount)
+            FROM fb_sales s
+            LEFT JOIN businesses b ON b.id = s.business_id
+            GROUP BY 1, 2
+            ON CONFLICT DO NOTHING
+            """
+        )
+        c.execute(
+            """
+            INSERT INTO fb_daily_items (business_id, sale_date, product_name, quantity, revenue)
+            SELECT s.business_id,
+                   (s.sold_at AT TIME ZONE COALESCE(b.timezone, 'Asia/Beirut'))::date,
+                   TRIM(COALESCE(NULLIF(i.product_name_snapshot, ''), 'Unnamed item')),
+                   SUM(i.quantity),
+                   SUM(i.line_total)
+            FROM fb_sale_items i
+            JOIN fb_sales s ON s.id = i.sale_id
+            LEFT JOIN businesses b ON b.id = s.business_id
+            GROUP BY 1, 2, 3
+            ON CONFLICT DO NOTHING
+            """
+        )
+
     conn.commit()
     conn.close()
     _fb_tables_ready = True
@@ -834,6 +1062,49 @@ def ensure_reservation_extension_columns():
     _reservation_extension_columns_ready = True
 
 
+_reservation_search_indexes_ready = False
+
+# Searchable text of a reservation. chr(31) keeps a query from matching
+# across two fields. Must stay identical to the trigram index expression.
+RESERVATION_SEARCH_EXPR = (
+    "lower(coalesce(customer_name, '') || chr(31) || coalesce(customer_phone, '') || chr(31) || "
+    "coalesce(service, '') || chr(31) || coalesce(notes, '') || chr(31) || "
+    "coalesce(resource_name_snapshot, ''))"
+)
+
+def ensure_reservation_search_indexes():
+    global _reservation_search_indexes_ready
+    if _reservation_search_indexes_ready:
+        return
+
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute(
+        """
+        CREATE INDEX IF NOT EXISTS idx_reservations_business_keyset
+        ON reservations (business_id, date DESC, time DESC, id DESC)
+        """
+    )
+    conn.commit()
+
+    # pg_trgm is optional: without it search still works, just with scans.
+    try:
+        c.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        c.execute(
+            f"""
+            CREATE INDEX IF NOT EXISTS idx_reservations_search_trgm
+            ON reservations USING gin (({RESERVATION_SEARCH_EXPR}) gin_trgm_ops)
+            """
+        )
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        sql_log.warning("ensure_reservation_search_indexes: trigram index skipped: %s", e)
+
+    conn.close()
+    _reservation_search_indexes_ready = True
+
+
 _service_metadata_columns_ready = False
 
 def ensure_service_metadata_columns():
@@ -851,6 +1122,81 @@ def ensure_service_metadata_columns():
     _service_metadata_columns_ready = True
 
 
+_capacity_pool_tables_ready = False
+
+# Services of these sports share one court pool unless the business assigns
+# them to a pool of its own (kept for businesses set up before pools existed).
+LEGACY_SHARED_POOL_KEY = "shared_tennis_basketball_court"
+LEGACY_SHARED_POOL_CAPACITY = 2
+LEGACY_SHARED_POOL_SPORTS = {"basketball", "tennis"}
+
+def ensure_capacity_pool_tables():
+    global _capacity_pool_tables_ready
+    if _capacity_pool_tables_ready:
+        return
+
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS capacity_pools (
+            id SERIAL PRIMARY KEY,
+            business_id INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            capacity INTEGER NOT NULL DEFAULT 1,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """
+    )
+    # pool_id NULL = the service never shares a pool (opt out of the legacy rule).
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS service_capacity_pools (
+            service_id INTEGER PRIMARY KEY REFERENCES services(id) ON DELETE CASCADE,
+            business_id INTEGER NOT NULL,
+            pool_id INTEGER REFERENCES capacity_pools(id) ON DELETE CASCADE
+        )
+        """
+    )
+    c.execute("CREATE INDEX IF NOT EXISTS idx_capacity_pools_business ON capacity_pools (business_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_service_capacity_pools_business ON service_capacity_pools (business_id)")
+    conn.commit()
+    conn.close()
+
+    _capacity_pool_tables_ready = True
+
+
+def capacity_pool_key(pool_id):
+    return f"pool:{pool_id}"
+
+
+def get_capacity_pools(business_id):
+    ensure_capacity_pool_tables()
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute(
+        """
+        SELECT id, name, capacity
+        FROM capacity_pools
+        WHERE business_id = %s
+        ORDER BY id ASC
+        """,
+        (business_id,),
+    )
+    pools = c.fetchall()
+    c.execute(
+        """
+        SELECT service_id, pool_id
+        FROM service_capacity_pools
+        WHERE business_id = %s
+        """,
+        (business_id,),
+    )
+    members = c.fetchall()
+    conn.close()
+    return pools, members
+
+
 SPECIAL_NIGHT_PRICE_MAP = {
     "basketball half court 1 hour": 20.0,
     "basketball half court 2 hour": 40.0,
@@ -925,9 +1271,7 @@ def get_service_sport_category(business_id, service_name):
     return value or infer_service_sport_from_name(service_name)
 
 def get_service_capacity_units(business_id, service_name):
-    row = get_service_metadata_row(business_id, service_name)
-    value = safe_int(row.get("capacity_units_used") if row else None, 0)
-    return value if value > 0 else infer_service_capacity_units_from_name(service_name)
+    return build_service_slot_profile(get_service_profiles(business_id), service_name)["units"]
 
 def get_service_night_price(business_id, service_name):
     row = get_service_metadata_row(business_id, service_name)
@@ -935,27 +1279,79 @@ def get_service_night_price(business_id, service_name):
         return safe_float(row.get("night_price"), 0.0)
     return SPECIAL_NIGHT_PRICE_MAP.get((service_name or "").strip().lower())
 
+COMPILED_BUSINESS_RECHECK_SEC = 30
+
+_compiled_business_data = {}  # key: (kind, business_id) -> {"value", "version", "checked_at"}
+
+
+metrics.counter(
+    "compiled_cache_lookups_total",
+    "Compiled business data lookups: hit (fresh), revalidated (version unchanged) or rebuilt.",
+)
+
+
+def get_compiled_business_data(kind, business_id, builder, scope=None):
+    """
+    Per-business data compiled once in memory (price table, capacity model,
+    F&B catalog). Rebuilt when the version of its scope moves - by default
+    the business-wide one, which every service/settings/resource change
+    bumps; other workers notice within COMPILED_BUSINESS_RECHECK_SEC.
+    """
+    key = (kind, business_id)
+    now = time.time()
+    entry = _compiled_business_data.get(key)
+    if entry and now - entry["checked_at"] < COMPILED_BUSINESS_RECHECK_SEC:
+        metrics.inc("compiled_cache_lookups_total", kind=kind, result="hit")
+        return entry["value"]
+
+    version, _ = get_availability_versions(business_id, scope or AVAILABILITY_SCOPE_ALL)
+    if entry and entry["version"] == version:
+        entry["checked_at"] = now
+        metrics.inc("compiled_cache_lookups_total", kind=kind, result="revalidated")
+        return entry["value"]
+
+    metrics.inc("compiled_cache_lookups_total", kind=kind, result="rebuilt")
+    value = builder()
+    _compiled_business_data[key] = {"value": value, "version": version, "checked_at": now}
+    return value
+
+
+def invalidate_compiled_business_data(business_id, kind=None):
+    for key in [k for k in _compiled_business_data if k[1] == business_id and kind in (None, k[0])]:
+        _compiled_business_data.pop(key, None)
+
+
+def get_price_table(business_id, business=None):
+    """
+    In-memory price table of a business (see pricing.py).
+    """
+    def build():
+        settings = business if business is not None else (get_business_by_id(business_id) or {})
+        return pricing.build_price_table(
+            load_service_rows_for_availability(business_id),
+            extension_pricing_mode=settings.get("extension_pricing_mode"),
+            extension_flat_30_price=settings.get("extension_flat_30_price"),
+            night_price_map=SPECIAL_NIGHT_PRICE_MAP,
+        )
+
+    return get_compiled_business_data("price_table", business_id, build)
+
+
 def get_effective_service_price(business_id, service_name, time_str=None):
-    base_price = float(get_service_info(business_id, service_name).get("price", 0) or 0)
-    if time_str and is_night_time_str(time_str):
-        night_price = get_service_night_price(business_id, service_name)
-        if night_price is not None:
-            return float(night_price)
-    return base_price
+    return pricing.quote_service_price(
+        get_price_table(business_id),
+        service_name,
+        is_night=bool(time_str) and is_night_time_str(time_str),
+    )
 
 def get_effective_service_price_for_reservation_row(business, reservation):
     return get_effective_service_price(business["id"], reservation.get("service"), reservation.get("time"))
 
 def get_service_shared_pool_key(business_id, service_name):
-    sport = get_service_sport_category(business_id, service_name)
-    if sport in {"basketball", "tennis"}:
-        return "shared_tennis_basketball_court"
-    return None
+    return build_service_slot_profile(get_service_profiles(business_id), service_name)["pool"]
 
 def get_service_pool_capacity(business_id, resource, service_name):
-    if get_service_shared_pool_key(business_id, service_name):
-        return 2
-    return int((resource or {}).get("capacity") or 1)
+    return slot_capacity(build_service_slot_profile(get_service_profiles(business_id), service_name), resource)
 
 def get_available_sports_for_business(business_id):
     ensure_service_metadata_columns()
@@ -1037,6 +1433,133 @@ def ensure_resource_availability_tables():
 
     _resource_availability_tables_ready = True
 
+_availability_versions_table_ready = False
+
+AVAILABILITY_SCOPE_ALL = "*"
+
+def ensure_availability_versions_table():
+    global _availability_versions_table_ready
+    if _availability_versions_table_ready:
+        return
+
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS availability_versions (
+            business_id INTEGER NOT NULL,
+            scope VARCHAR(50) NOT NULL,
+            version BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            PRIMARY KEY (business_id, scope)
+        )
+        """
+    )
+    conn.commit()
+    conn.close()
+
+    _availability_versions_table_ready = True
+
+
+def bump_availability_version(business_id, dates=None, cursor=None):
+    """
+    Increments the change counter for the given reservation dates, or the
+    business-wide counter when dates is None (hours, services, resources...).
+    Pass the caller's cursor to bump inside the same transaction; a
+    business-wide bump drops this process's compiled data once that
+    transaction commits, so no reader rebuilds it from the old rows.
+    Returns {scope: new version}.
+    """
+    ensure_availability_versions_table()
+    clear_turn_memo()
+
+    if dates is None:
+        scopes = [AVAILABILITY_SCOPE_ALL]
+    elif isinstance(dates, str):
+        scopes = [dates]
+    else:
+        scopes = sorted({d for d in dates if d})
+    if not scopes:
+        return {}
+
+    own_conn = None
+    c = cursor
+    if c is None:
+        own_conn = get_db_connection()
+        c = own_conn.cursor()
+
+    try:
+        c.execute(
+            """
+            INSERT INTO availability_versions (business_id, scope, version, updated_at)
+            SELECT %s, scope, 1, NOW() FROM unnest(%s::text[]) AS scope
+            ON CONFLICT (business_id, scope)
+            DO UPDATE SET
+                version = availability_versions.version + 1,
+                updated_at = NOW()
+            RETURNING scope, version
+            """,
+            (business_id, scopes),
+        )
+        versions = {row["scope"]: int(row["version"]) for row in c.fetchall()}
+        if dates is None:
+            on_commit(c.connection, lambda: invalidate_compiled_business_data(business_id))
+        if own_conn:
+            own_conn.commit()
+    finally:
+        if own_conn:
+            own_conn.close()
+    return versions
+
+
+def get_availability_versions(business_id, date_iso):
+    """
+    Returns (date_version, business_wide_version) for ETag generation.
+    """
+    ensure_availability_versions_table()
+
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute(
+        """
+        SELECT scope, version
+        FROM availability_versions
+        WHERE business_id = %s
+          AND scope = ANY(%s)
+        """,
+        (business_id, [date_iso, AVAILABILITY_SCOPE_ALL]),
+    )
+    versions = {row["scope"]: int(row["version"]) for row in c.fetchall()}
+    conn.close()
+    return versions.get(date_iso, 0), versions.get(AVAILABILITY_SCOPE_ALL, 0)
+
+
+def publish_reservation_event(business_id, event_type, reservation_ids, dates, versions=None):
+    """
+    Tells open shop mode screens that reservations changed.
+    event_type: new / cancelled / done / extended / rescheduled.
+    versions: what bump_availability_version returned for the write, so a
+    screen can tell whether anything else changed since.
+    Call after the write is committed; never raises.
+    """
+    if isinstance(reservation_ids, int):
+        reservation_ids = [reservation_ids]
+    if isinstance(dates, str):
+        dates = [dates]
+
+    try:
+        event_bus.publish(
+            business_id,
+            event_type,
+            {
+                "reservation_ids": [int(rid) for rid in (reservation_ids or []) if rid],
+                "dates": sorted({d for d in (dates or []) if d}),
+                "versions": dict(versions or {}),
+            },
+        )
+    except Exception as e:
+        conversation_log.warning("publish_reservation_event failed for business %s: %s", business_id, e)
+
 def infer_business_feature_defaults(business_id):
     ensure_fb_tables()
 
@@ -1099,24 +1622,7 @@ def business_has_feature(business, feature_name):
 
 
 def get_service_price_for_duration(business_id, duration_min):
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute(
-        """
-        SELECT price
-        FROM services
-        WHERE business_id = %s
-          AND duration_min = %s
-        ORDER BY id DESC
-        LIMIT 1
-        """,
-        (business_id, duration_min),
-    )
-    row = c.fetchone()
-    conn.close()
-    if not row:
-        return None
-    return float(row.get("price") or 0)
+    return pricing.price_for_duration(get_price_table(business_id), duration_min)
 
 
 def get_reservation_base_duration_minutes(business_id, service_name):
@@ -1128,48 +1634,16 @@ def get_reservation_total_duration_minutes(business_id, service_name, extra_minu
 
 
 def get_reservation_total_price(business_id, service_name, extra_price=0):
-    base_price = float(get_service_info(business_id, service_name).get("price", 0) or 0)
-    return base_price + float(extra_price or 0)
+    return pricing.base_price(get_price_table(business_id), service_name) + float(extra_price or 0)
 
 
 def calculate_extension_extra_charge(business, service_name, current_extra_minutes=0, increment_minutes=30):
-    flags = get_business_feature_flags(business)
-    business_id = business["id"]
-
-    base_price = float(get_service_info(business_id, service_name).get("price", 0) or 0)
-    current_extra_minutes = int(current_extra_minutes or 0)
-    current_total_price = get_reservation_total_price(business_id, service_name, 0) + float(0)
-    current_total_price = base_price + 0  # explicit for readability
-
-    # What is already being charged for the current reservation state?
-    current_reservation_price = base_price
-    if current_extra_minutes:
-        current_duration = get_reservation_base_duration_minutes(business_id, service_name) + current_extra_minutes
-        current_duration_price = get_service_price_for_duration(business_id, current_duration)
-        if current_duration_price is not None:
-            current_reservation_price = current_duration_price
-        else:
-            current_reservation_price = base_price + (safe_float(flags.get("extension_flat_30_price") or 0) * (current_extra_minutes // 30))
-    else:
-        current_duration = get_reservation_base_duration_minutes(business_id, service_name)
-
-    new_duration = current_duration + int(increment_minutes or 0)
-    new_duration_price = get_service_price_for_duration(business_id, new_duration)
-
-    if flags.get("extension_pricing_mode") == "flat_30":
-        flat = safe_float(flags.get("extension_flat_30_price") or 0, 0.0)
-        if flat > 0:
-            return flat
-
-    if new_duration_price is not None:
-        extra = round(new_duration_price - current_reservation_price, 2)
-        return max(0.0, extra)
-
-    flat = safe_float(flags.get("extension_flat_30_price") or 0, 0.0)
-    if flat > 0:
-        return flat
-
-    return None
+    return pricing.quote_extension_charge(
+        get_price_table(business["id"], business),
+        service_name,
+        current_extra_minutes=current_extra_minutes,
+        increment_minutes=increment_minutes,
+    )
 
 
 def safe_float(value, default=0.0):
@@ -1215,19 +1689,133 @@ def get_fb_products(business_id, active_only=False):
     return rows
 
 
-def get_fb_recent_sales(business, limit=10):
-    ensure_fb_tables()
-    business_id = business["id"]
-    tz = pytz.timezone(business.get("timezone") or "Asia/Beirut")
+FB_CATALOG_SCOPE = "fb_catalog"
 
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute(
-        """
-        SELECT id, total_amount, sold_at
-        FROM fb_sales
-        WHERE business_id = %s
-        ORDER BY sold_at DESC, id DESC
+
+def get_fb_catalog(business_id):
+    """
+    Active F&B products of a business, cached in memory for the POS.
+    Product add/update/delete bump FB_CATALOG_SCOPE.
+    """
+    def build():
+        return tuple(
+            {"id": row["id"], "name": row["name"], "price": float(row["price"] or 0)}
+            for row in get_fb_products(business_id, active_only=True)
+        )
+
+    return get_compiled_business_data("fb_catalog", business_id, build, scope=FB_CATALOG_SCOPE)
+
+
+def bump_fb_catalog_version(business_id, cursor):
+    bump_availability_version(business_id, FB_CATALOG_SCOPE, cursor=cursor)
+
+
+def build_fb_sale_items(catalog, quantities):
+    """
+    quantities: {product_id: qty}. Returns (items, total_amount) priced from
+    the catalog; unknown products and non-positive quantities are ignored.
+    """
+    items = []
+    total_amount = 0.0
+    for product in catalog:
+        qty = safe_int(quantities.get(product["id"]) or 0, 0)
+        if qty <= 0:
+            continue
+
+        unit_price = product["price"]
+        line_total = unit_price * qty
+        total_amount += line_total
+        items.append(
+            {
+                "product_id": product["id"],
+                "product_name_snapshot": product["name"],
+                "quantity": qty,
+                "unit_price": unit_price,
+                "line_total": line_total,
+            }
+        )
+    return items, total_amount
+
+
+def insert_fb_sale(c, business_id, total_amount, items):
+    """
+    Writes the sale, all of its line items and the daily rollups in one
+    statement. Returns the new sale id.
+    """
+    c.execute(
+        """
+        WITH sale AS (
+            INSERT INTO fb_sales (business_id, total_amount)
+            VALUES (%(business_id)s, %(total_amount)s)
+            RETURNING
+                id,
+                business_id,
+                total_amount,
+                (sold_at AT TIME ZONE COALESCE(
+                    (SELECT timezone FROM businesses WHERE id = %(business_id)s), 'Asia/Beirut'
+                ))::date AS sale_date
+        ), lines AS (
+            INSERT INTO fb_sale_items (
+                sale_id,
+                product_id,
+                product_name_snapshot,
+                quantity,
+                unit_price,
+                line_total
+            )
+            SELECT sale.id, i.product_id, i.product_name_snapshot, i.quantity, i.unit_price, i.line_total
+            FROM sale,
+                 unnest(%(product_ids)s::int[], %(names)s::text[], %(quantities)s::int[],
+                        %(unit_prices)s::numeric[], %(line_totals)s::numeric[])
+                     AS i (product_id, product_name_snapshot, quantity, unit_price, line_total)
+            RETURNING product_name_snapshot, quantity, line_total
+        ), daily AS (
+            INSERT INTO fb_daily_sales (business_id, sale_date, sales_count, revenue)
+            SELECT business_id, sale_date, 1, total_amount FROM sale
+            ON CONFLICT (business_id, sale_date)
+            DO UPDATE SET
+                sales_count = fb_daily_sales.sales_count + 1,
+                revenue = fb_daily_sales.revenue + EXCLUDED.revenue
+        ), daily_items AS (
+            INSERT INTO fb_daily_items (business_id, sale_date, product_name, quantity, revenue)
+            SELECT sale.business_id, sale.sale_date,
+                   TRIM(COALESCE(NULLIF(lines.product_name_snapshot, ''), 'Unnamed item')),
+                   SUM(lines.quantity), SUM(lines.line_total)
+            FROM sale, lines
+            GROUP BY 1, 2, 3
+            ON CONFLICT (business_id, sale_date, product_name)
+            DO UPDATE SET
+                quantity = fb_daily_items.quantity + EXCLUDED.quantity,
+                revenue = fb_daily_items.revenue + EXCLUDED.revenue
+        )
+        SELECT id FROM sale
+        """,
+        {
+            "business_id": business_id,
+            "total_amount": total_amount,
+            "product_ids": [item["product_id"] for item in items],
+            "names": [item["product_name_snapshot"] for item in items],
+            "quantities": [item["quantity"] for item in items],
+            "unit_prices": [item["unit_price"] for item in items],
+            "line_totals": [item["line_total"] for item in items],
+        },
+    )
+    return c.fetchone()["id"]
+
+
+def get_fb_recent_sales(business, limit=10):
+    ensure_fb_tables()
+    business_id = business["id"]
+    tz = pytz.timezone(business.get("timezone") or "Asia/Beirut")
+
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute(
+        """
+        SELECT id, total_amount, sold_at
+        FROM fb_sales
+        WHERE business_id = %s
+        ORDER BY sold_at DESC, id DESC
         LIMIT %s
         """,
         (business_id, limit),
@@ -1281,102 +1869,53 @@ def get_fb_recent_sales(business, limit=10):
 
 
 def compute_fb_report_metrics(business):
+    """
+    Weekly / previous-week / all-time F&B revenue and this week's top items,
+    aggregated in SQL from the daily rollups (dates are business-local).
+    """
     ensure_fb_tables()
     business_id = business["id"]
     tz = pytz.timezone(business.get("timezone") or "Asia/Beirut")
-    today = datetime.now(tz).date()
-    current_start = today - timedelta(days=6)
-    previous_start = today - timedelta(days=13)
-    previous_end = today - timedelta(days=7)
+    windows = report_engine.week_windows(datetime.now(tz).date())
 
     conn = get_db_connection()
     c = conn.cursor()
 
     c.execute(
         """
-        SELECT id, total_amount, sold_at
-        FROM fb_sales
-        WHERE business_id = %s
-        ORDER BY sold_at DESC, id DESC
+        SELECT
+            COALESCE(SUM(revenue) FILTER (WHERE sale_date BETWEEN %(current_start)s AND %(today)s), 0) AS weekly,
+            COALESCE(SUM(revenue) FILTER (WHERE sale_date BETWEEN %(previous_start)s AND %(previous_end)s), 0) AS previous,
+            COALESCE(SUM(revenue), 0) AS total
+        FROM fb_daily_sales
+        WHERE business_id = %(business_id)s
         """,
-        (business_id,),
+        dict(windows, business_id=business_id),
     )
-    sales = c.fetchall()
+    totals = c.fetchone()
 
     c.execute(
         """
-        SELECT
-            s.sold_at,
-            i.product_name_snapshot,
-            i.quantity,
-            i.line_total
-        FROM fb_sale_items i
-        JOIN fb_sales s ON s.id = i.sale_id
-        WHERE s.business_id = %s
-        ORDER BY s.sold_at DESC, i.id DESC
+        SELECT product_name, SUM(quantity) AS quantity, SUM(revenue) AS revenue
+        FROM fb_daily_items
+        WHERE business_id = %(business_id)s
+          AND sale_date BETWEEN %(current_start)s AND %(today)s
+        GROUP BY product_name
         """,
-        (business_id,),
+        dict(windows, business_id=business_id),
     )
-    items = c.fetchall()
+    weekly_items = [
+        {"name": row["product_name"], "quantity": int(row["quantity"] or 0), "revenue": float(row["revenue"] or 0)}
+        for row in c.fetchall()
+    ]
     conn.close()
 
-    weekly_fb_revenue = 0.0
-    previous_weekly_fb_revenue = 0.0
-    fb_total_revenue = 0.0
-
-    for sale in sales:
-        sold_at = sale.get("sold_at")
-        if not sold_at:
-            continue
-
-        try:
-            if sold_at.tzinfo is None:
-                sold_at_local = pytz.utc.localize(sold_at).astimezone(tz)
-            else:
-                sold_at_local = sold_at.astimezone(tz)
-        except Exception:
-            sold_at_local = sold_at
-
-        sold_date = sold_at_local.date()
-        amount = float(sale.get("total_amount") or 0)
-        fb_total_revenue += amount
-
-        if current_start <= sold_date <= today:
-            weekly_fb_revenue += amount
-        elif previous_start <= sold_date <= previous_end:
-            previous_weekly_fb_revenue += amount
-
-    weekly_item_map = {}
-    for row in items:
-        sold_at = row.get("sold_at")
-        if not sold_at:
-            continue
-        try:
-            if sold_at.tzinfo is None:
-                sold_at_local = pytz.utc.localize(sold_at).astimezone(tz)
-            else:
-                sold_at_local = sold_at.astimezone(tz)
-        except Exception:
-            sold_at_local = sold_at
-
-        sold_date = sold_at_local.date()
-        if not (current_start <= sold_date <= today):
-            continue
-
-        name = (row.get("product_name_snapshot") or "Unnamed item").strip()
-        weekly_item_map.setdefault(name, {"name": name, "quantity": 0, "revenue": 0.0})
-        weekly_item_map[name]["quantity"] += int(row.get("quantity") or 0)
-        weekly_item_map[name]["revenue"] += float(row.get("line_total") or 0)
-
-    weekly_items = sorted(
-        weekly_item_map.values(),
-        key=lambda x: (-x["revenue"], x["name"].lower()),
-    )
+    weekly_items.sort(key=lambda x: (-x["revenue"], x["name"].lower()))
 
     return {
-        "weekly_fb_revenue": weekly_fb_revenue,
-        "previous_weekly_fb_revenue": previous_weekly_fb_revenue,
-        "fb_total_revenue": fb_total_revenue,
+        "weekly_fb_revenue": float(totals["weekly"]),
+        "previous_weekly_fb_revenue": float(totals["previous"]),
+        "fb_total_revenue": float(totals["total"]),
         "weekly_fb_items": weekly_items,
     }
 
@@ -1435,16 +1974,17 @@ SERVICE_KEYWORDS = {
 
 # ------------------ LOW-LEVEL HELPERS ------------------
 
+@metrics.timed("external_call_seconds", errors="external_call_errors_total", ok=bool, service="whatsapp_graph")
 def send_message(to: str, text: str, business: dict):
     phone_number_id = (business.get("phone_number_id") or "").strip()
     access_token = (business.get("access_token") or os.getenv("ACCESS_TOKEN") or "").strip()
 
     if not phone_number_id:
-        print("send_message: missing phone_number_id for business", flush=True)
+        whatsapp_log.warning("send_message: missing phone_number_id for business %s", business.get("id"))
         return False
 
     if not access_token:
-        print("send_message: missing access_token for business and no ACCESS_TOKEN fallback", flush=True)
+        whatsapp_log.warning("send_message: missing access_token for business %s and no ACCESS_TOKEN fallback", business.get("id"))
         return False
 
     url = f"https://graph.facebook.com/v21.0/{phone_number_id}/messages"
@@ -1463,11 +2003,14 @@ def send_message(to: str, text: str, business: dict):
 
     try:
         r = requests.post(url, headers=headers, json=payload, timeout=15)
-        print("send_message status:", r.status_code, flush=True)
-        print("send_message body:", r.text, flush=True)
+        if r.ok:
+            whatsapp_log.info("send_message to %s: %s", to, r.status_code)
+            whatsapp_log.debug("send_message body: %s", r.text)
+        else:
+            whatsapp_log.warning("send_message to %s: %s %s", to, r.status_code, r.text)
         return r.ok
     except Exception as e:
-        print("send_message error (meta):", e, flush=True)
+        whatsapp_log.error("send_message error (meta): %s", e)
         return False
 
 def ai_pick_service(business: dict, user_text: str):
@@ -1476,12 +2019,12 @@ def ai_pick_service(business: dict, user_text: str):
     Returns service name or None.
     """
     if not OPENROUTER_API_KEY:
-        print("ai_pick_service: no OPENROUTER_API_KEY set")
+        ai_log.debug("ai_pick_service: no OPENROUTER_API_KEY set")
         return None
 
     services = get_service_names_for_business(business["id"])
     if not services:
-        print("ai_pick_service: no services configured for business", business["id"])
+        ai_log.info("ai_pick_service: no services configured for business %s", business["id"])
         return None
 
     services_str = ", ".join(services)
@@ -1495,6 +2038,7 @@ def ai_pick_service(business: dict, user_text: str):
     )
     user_msg = f"Customer message: {user_text}"
 
+    started = time.perf_counter()
     try:
         resp = requests.post(
             "https://openrouter.ai/api/v1/chat/completions",
@@ -1512,9 +2056,10 @@ def ai_pick_service(business: dict, user_text: str):
             },
             timeout=12,
         )
-        print("ai_pick_service status:", resp.status_code)
+        metrics.observe("external_call_seconds", time.perf_counter() - started, service="openrouter")
         if not resp.ok:
-            print("ai_pick_service body:", resp.text)
+            metrics.inc("external_call_errors_total", service="openrouter")
+            ai_log.warning("ai_pick_service: %s %s", resp.status_code, resp.text)
             return None
 
         data = resp.json()
@@ -1528,11 +2073,13 @@ def ai_pick_service(business: dict, user_text: str):
             return service.strip()
 
     except Exception as e:
-        print("ai_pick_service error:", e)
+        metrics.inc("external_call_errors_total", service="openrouter")
+        ai_log.error("ai_pick_service error: %s", e)
 
     return None
 
 
+@turn_memoized
 def get_service_info(business_id, service_name):
     conn = get_db_connection()
     c = conn.cursor()
@@ -1574,6 +2121,7 @@ def get_service_info(business_id, service_name):
     return {"price": 0.0, "duration": 45}
 
 
+@turn_memoized
 def get_service_names_for_business(business_id):
     conn = get_db_connection()
     c = conn.cursor()
@@ -1642,20 +2190,7 @@ def suggest_slots(
 
     new_duration = int(get_service_info(business_id, service_name).get("duration", 45))
 
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute(
-        """
-        SELECT service, time
-        FROM reservations
-        WHERE business_id = %s
-          AND date = %s
-          AND status = 'CONFIRMED'
-        """,
-        (business_id, date_iso),
-    )
-    rows = c.fetchall()
-    conn.close()
+    rows = get_confirmed_reservation_rows_for_date(business_id, date_iso)
 
     existing_intervals = []
     for row in rows:
@@ -1733,15 +2268,17 @@ def save_reservation(
         )
         row = c.fetchone()
         new_id = row["id"] if isinstance(row, dict) else row[0]
+        versions = bump_availability_version(business_id, date, cursor=c)
         conn.commit()
-        print(
-            f"SAVED (CONFIRMED) -> id={new_id}, {name}, {service} on {date} at {time_}, "
-            f"resource_id={resource_id}, resource_name={resource_name_snapshot}"
+        publish_reservation_event(business_id, "new", new_id, date, versions)
+        conversation_log.info(
+            "saved reservation %s: %s on %s at %s, resource %s (%s)",
+            new_id, service, date, time_, resource_id, resource_name_snapshot,
         )
         return new_id
     except Exception as e:
         conn.rollback()
-        print("save_reservation error:", str(e))
+        conversation_log.error("save_reservation error: %s", e)
         raise
     finally:
         conn.close()
@@ -1757,16 +2294,13 @@ def ranges_overlap(start1, duration1, start2, duration2):
     return start1 < end2 and start2 < end1
 
 
-def is_slot_taken(business_id, date_iso, new_time, new_service):
-    new_service_info = get_service_info(business_id, new_service)
-    new_duration = int(new_service_info.get("duration", 45))
-    new_start = time_to_minutes(new_time)
-
+@turn_memoized
+def get_confirmed_reservation_rows_for_date(business_id, date_iso):
     conn = get_db_connection()
     c = conn.cursor()
     c.execute(
         """
-        SELECT service, time
+        SELECT service, time, resource_id, COALESCE(extra_minutes, 0) AS extra_minutes
         FROM reservations
         WHERE business_id = %s
           AND date = %s
@@ -1776,6 +2310,15 @@ def is_slot_taken(business_id, date_iso, new_time, new_service):
     )
     rows = c.fetchall()
     conn.close()
+    return rows
+
+
+def is_slot_taken(business_id, date_iso, new_time, new_service):
+    new_service_info = get_service_info(business_id, new_service)
+    new_duration = int(new_service_info.get("duration", 45))
+    new_start = time_to_minutes(new_time)
+
+    rows = get_confirmed_reservation_rows_for_date(business_id, date_iso)
 
     for row in rows:
         existing_service = row["service"]
@@ -1806,8 +2349,7 @@ def send_reservation_confirmation(
     lang="en",
     resource_name=None,
 ):
-    service_info = get_service_info(business["id"], service)
-    total_price = service_info["price"]
+    total_price = get_effective_service_price(business["id"], service, time)
 
     base_message = tr_confirmation(
         lang=lang,
@@ -1818,9 +2360,10 @@ def send_reservation_confirmation(
         total_price=total_price,
         calendar_added=calendar_added,
         resource_name=resource_name,
+        tone=get_business_tone(business),
     )
 
-    send_friendly_message(phone, business, lang, base_message, purpose="confirmation")
+    send_friendly_message(phone, business, lang, base_message, purpose="confirmation", toned=True)
 
 def send_reservation_cancellation(
     phone,
@@ -1843,9 +2386,10 @@ def send_reservation_cancellation(
         date=date,
         time=time,
         resource_name=resource_name,
+        tone=get_business_tone(business),
     )
 
-    send_friendly_message(phone, business, lang, message, purpose="cancel")
+    send_friendly_message(phone, business, lang, message, purpose="cancel", toned=True)
 
 
 def send_reservation_rescheduled(
@@ -1868,56 +2412,21 @@ def send_reservation_rescheduled(
         preferred = (business.get("preferred_language") or "auto").strip().lower()
         lang = preferred if preferred in ("en", "fr", "ar") else "en"
 
-    old_resource_line = ""
-    new_resource_line = ""
-    if old_resource_name:
-        if lang == "fr":
-            old_resource_line = f"\nAncien prestataire : {old_resource_name}"
-        elif lang == "ar":
-            old_resource_line = f"\nالموارد السابقة: {old_resource_name}"
-        else:
-            old_resource_line = f"\nPrevious staff/resource: {old_resource_name}"
-
-    if new_resource_name:
-        if lang == "fr":
-            new_resource_line = f"\nNouveau prestataire : {new_resource_name}"
-        elif lang == "ar":
-            new_resource_line = f"\nالمورد الجديد: {new_resource_name}"
-        else:
-            new_resource_line = f"\nNew staff/resource: {new_resource_name}"
-
-    if lang == "fr":
-        message = (
-            f"✅ Votre réservation a été reprogrammée.\n"
-            f"Nom : {name}\n"
-            f"Service : {service}\n"
-            f"Ancienne date : {old_date}\n"
-            f"Ancienne heure : {old_time}{old_resource_line}\n\n"
-            f"Nouvelle date : {new_date}\n"
-            f"Nouvelle heure : {new_time}{new_resource_line}"
-        )
-    elif lang == "ar":
-        message = (
-            f"✅ تم تعديل موعد حجزك.\n"
-            f"الاسم: {name}\n"
-            f"الخدمة: {service}\n"
-            f"التاريخ السابق: {old_date}\n"
-            f"الوقت السابق: {old_time}{old_resource_line}\n\n"
-            f"التاريخ الجديد: {new_date}\n"
-            f"الوقت الجديد: {new_time}{new_resource_line}"
-        )
-    else:
-        message = (
-            f"✅ Your reservation has been rescheduled.\n"
-            f"Name: {name}\n"
-            f"Service: {service}\n"
-            f"Previous date: {old_date}\n"
-            f"Previous time: {old_time}{old_resource_line}\n\n"
-            f"New date: {new_date}\n"
-            f"New time: {new_time}{new_resource_line}"
-        )
+    message = tr(
+        lang,
+        "rescheduled",
+        tone=get_business_tone(business),
+        name=name,
+        service=service,
+        old_date=old_date,
+        old_time=old_time,
+        new_date=new_date,
+        new_time=new_time,
+        old_resource_line=tr(lang, "old_resource_line", resource_name=old_resource_name) if old_resource_name else "",
+        new_resource_line=tr(lang, "new_resource_line", resource_name=new_resource_name) if new_resource_name else "",
+    )
 
-    return send_friendly_message(phone, business, lang, message, purpose="confirmation")
+    return send_friendly_message(phone, business, lang, message, purpose="confirmation", toned=True)
 
 
 def apply_reschedule_update(
@@ -1926,6 +2435,7 @@ def apply_reschedule_update(
     new_date,
     normalized_time,
     chosen_resource,
+    notify=None,
 ):
     business_id = business["id"]
     reservation_id = reservation["id"]
@@ -1934,13 +2444,19 @@ def apply_reschedule_update(
     c = conn.cursor()
     c.execute(
         """
-        UPDATE reservations
+        UPDATE reservations r
         SET date = %s,
             time = %s,
             resource_id = %s,
             resource_name_snapshot = %s,
-            status = CASE WHEN status = 'DONE' THEN 'CONFIRMED' ELSE status END
-        WHERE id = %s AND business_id = %s
+            status = CASE WHEN r.status = 'DONE' THEN 'CONFIRMED' ELSE r.status END
+        FROM (
+            SELECT id, date AS old_date
+            FROM reservations
+            WHERE id = %s AND business_id = %s
+        ) old
+        WHERE r.id = old.id
+        RETURNING old.old_date
         """,
         (
             new_date,
@@ -1951,29 +2467,37 @@ def apply_reschedule_update(
             business_id,
         ),
     )
+    updated = c.fetchone()
+    versions = bump_availability_version(
+        business_id,
+        [new_date, updated["old_date"] if updated else None],
+        cursor=c,
+    )
     conn.commit()
     conn.close()
-
-    old_event_id = reservation.get("google_event_id")
-    if old_event_id:
-        try:
-            delete_event(old_event_id, calendar_id=(business.get("calendar_id") or "primary"))
-        except Exception as e:
-            print("reschedule delete_event warning:", e, flush=True)
-
-    new_event = add_reservation_to_google_calendar(
+    publish_reservation_event(
         business_id,
-        reservation["customer_name"],
-        reservation["service"],
-        new_date,
-        normalized_time,
-        resource_name=chosen_resource["name"] if chosen_resource else None,
-        resource_id=chosen_resource["id"] if chosen_resource else None,
+        "rescheduled",
+        reservation_id,
+        [new_date, updated["old_date"] if updated else None],
+        versions,
     )
-    if new_event and new_event.get("id"):
-        save_google_event_id(reservation_id, new_event.get("id"))
 
-    return new_event
+    return replace_google_event(
+        business,
+        reservation_id,
+        reservation.get("google_event_id"),
+        lambda: add_reservation_to_google_calendar(
+            business_id,
+            reservation["customer_name"],
+            reservation["service"],
+            new_date,
+            normalized_time,
+            resource_name=chosen_resource["name"] if chosen_resource else None,
+            resource_id=chosen_resource["id"] if chosen_resource else None,
+        ),
+        notify=notify,
+    )
 
 
 def add_reservation_to_google_calendar(
@@ -2011,8 +2535,6 @@ def add_reservation_to_google_calendar(
             resource_name=resource_name,
         )
 
-        print("GCAL target calendar_id:", calendar_id, flush=True)
-
         try:
             event = create_event(
                 summary=summary,
@@ -2033,11 +2555,11 @@ def add_reservation_to_google_calendar(
                 duration_min=duration_min,
             )
 
-        print("Google Calendar event created:", event.get("id"), flush=True)
+        gcal_log.info("event %s created in calendar %s", event.get("id"), calendar_id)
         return event
 
     except Exception as e:
-        print("add_reservation_to_google_calendar error:", str(e), flush=True)
+        gcal_log.warning("add_reservation_to_google_calendar error: %s", e)
         return None
 
 def save_google_event_id(reservation_id, google_event_id):
@@ -2055,6 +2577,82 @@ def save_google_event_id(reservation_id, google_event_id):
     conn.close()
 
 
+def sync_calendar_and_confirm(
+    business,
+    reservation_id,
+    phone,
+    name,
+    service,
+    date,
+    time_,
+    lang="en",
+    resource_name=None,
+    resource_id=None,
+):
+    """
+    Creates the calendar event of a new booking (and stores its id) while
+    the WhatsApp confirmation goes out, so the customer waits for the slower
+    of the two rather than both. The confirmation is sent before the event
+    exists, so it does not mention the calendar. Returns the event, or None.
+    """
+    def create_calendar_event():
+        event = add_reservation_to_google_calendar(
+            business["id"],
+            name,
+            service,
+            date,
+            time_,
+            resource_name=resource_name,
+            resource_id=resource_id,
+        )
+        if event:
+            if event.get("id"):
+                save_google_event_id(reservation_id, event["id"])
+        else:
+            conversation_log.info("reservation %s: Google Calendar event was not created", reservation_id)
+        return event
+
+    def confirm():
+        send_reservation_confirmation(
+            phone,
+            name,
+            service,
+            date,
+            time_,
+            business,
+            lang=lang,
+            resource_name=resource_name,
+        )
+
+    return side_effects.run_concurrently({
+        "calendar_create": create_calendar_event,
+        "confirmation": confirm,
+    })["calendar_create"]
+
+
+def replace_google_event(business, reservation_id, old_event_id, create_new, notify=None):
+    """
+    Swaps a reservation's calendar event after an edit: the old event is
+    deleted while create_new() makes its replacement, and notify() (the
+    customer message), when given, runs alongside both. Returns the new
+    event, or None.
+    """
+    calendar_id = business.get("calendar_id") or "primary"
+
+    def create():
+        event = create_new()
+        if event and event.get("id"):
+            save_google_event_id(reservation_id, event["id"])
+        return event
+
+    calls = {"calendar_create": create}
+    if old_event_id:
+        calls["calendar_delete"] = lambda: delete_event(old_event_id, calendar_id=calendar_id)
+    if notify:
+        calls["notify"] = notify
+    return side_effects.run_concurrently(calls)["calendar_create"]
+
+
 def update_reservation_note_value(reservation_id, business_id, note):
     conn = get_db_connection()
     c = conn.cursor()
@@ -2094,64 +2692,164 @@ def get_confirmed_reservations_for_date_excluding_fast(business_id, date_iso, ex
     return [row for row in rows if row.get("id") != excluded_reservation_id]
 
 
-def compute_dashboard_report_metrics(business, services, reservations_rows):
-    service_meta = {}
-    for s in services:
-        service_meta[(s["name"] or "").strip().lower()] = {
-            "price": float(s.get("price") or 0),
-            "duration": int(s.get("duration_min") or 45),
-        }
+DASHBOARD_PAGE_SIZE = 50
+DASHBOARD_MAX_PAGE_SIZE = 200
+DASHBOARD_COUNT_CAP = 1000
 
-    def get_meta(service_name):
-        cleaned = (service_name or "").strip().lower()
-        if cleaned in service_meta:
-            return service_meta[cleaned]
-        for name, meta in service_meta.items():
-            if cleaned in name or name in cleaned:
-                return meta
-        return {"price": 0.0, "duration": 45}
-
-    def summarize_metrics(rows):
-        total = len(rows)
-        confirmed = sum(1 for r in rows if (r.get("status") or "").upper() == "CONFIRMED")
-        canceled = sum(1 for r in rows if (r.get("status") or "").upper() == "CANCELED")
-        done = sum(1 for r in rows if (r.get("status") or "").upper() == "DONE")
-
-        total_booked_revenue = 0.0
-        total_done_revenue = 0.0
-        service_counts = {}
-        resource_counts = {}
-
-        for r in rows:
-            status = (r.get("status") or "").upper()
-            meta = get_meta(r.get("service"))
-            base_price = get_effective_service_price_for_reservation_row(business, r)
-            extra_price = float(r.get("extra_price") or 0)
-            price = base_price + extra_price
-
-            if status in ("CONFIRMED", "DONE"):
-                total_booked_revenue += price
-            if status == "DONE":
-                total_done_revenue += price
-
-            service_name = (r.get("service") or "").strip()
-            if service_name:
-                service_counts[service_name] = service_counts.get(service_name, 0) + 1
-
-            resource_name = (r.get("resource_name_snapshot") or "").strip()
-            if resource_name:
-                resource_counts[resource_name] = resource_counts.get(resource_name, 0) + 1
 
-        return {
-            "total_reservations": total,
-            "confirmed_reservations": confirmed,
-            "canceled_reservations": canceled,
-            "done_reservations": done,
-            "total_booked_revenue": total_booked_revenue,
-            "total_done_revenue": total_done_revenue,
-            "top_service": max(service_counts.items(), key=lambda x: x[1])[0] if service_counts else "-",
-            "top_resource": max(resource_counts.items(), key=lambda x: x[1])[0] if resource_counts else "-",
-        }
+def encode_reservation_cursor(row):
+    return f"{row['date']}|{row['time']}|{row['id']}"
+
+
+def decode_reservation_cursor(raw):
+    parts = (raw or "").split("|")
+    if len(parts) != 3:
+        return None
+    try:
+        return parts[0], parts[1], int(parts[2])
+    except ValueError:
+        return None
+
+
+def escape_like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_reservations_page(
+    business_id,
+    since_date_iso=None,
+    search_query="",
+    status_filter="ALL",
+    after=None,
+    before=None,
+    page_size=DASHBOARD_PAGE_SIZE,
+):
+    """
+    One page of reservations, newest first, keyset-paginated on (date, time, id).
+    after / before are cursors from a previous page (older / newer rows).
+
+    Counts (the total and each status) are exact up to DASHBOARD_COUNT_CAP,
+    then reported as capped so a broad filter never turns into a full count
+    of the table.
+    """
+    ensure_reservation_search_indexes()
+
+    page_size = max(1, min(safe_int(page_size, DASHBOARD_PAGE_SIZE), DASHBOARD_MAX_PAGE_SIZE))
+
+    where = ["business_id = %s"]
+    params = [business_id]
+    if since_date_iso:
+        where.append("date >= %s")
+        params.append(since_date_iso)
+    if search_query:
+        where.append(f"{RESERVATION_SEARCH_EXPR} LIKE %s")
+        params.append("%" + escape_like(search_query.lower()) + "%")
+    if status_filter and status_filter != "ALL":
+        where.append("status = %s")
+        params.append(status_filter)
+
+    after_key = decode_reservation_cursor(after)
+    before_key = decode_reservation_cursor(before) if not after_key else None
+
+    page_where = list(where)
+    page_params = list(params)
+    if after_key:
+        page_where.append("(date, time, id) < (%s, %s, %s)")
+        page_params.extend(after_key)
+    elif before_key:
+        page_where.append("(date, time, id) > (%s, %s, %s)")
+        page_params.extend(before_key)
+
+    direction = "ASC" if before_key else "DESC"
+
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute(
+        f"""
+        SELECT id, customer_name, customer_phone, service, date, time, status, notes,
+               resource_id, resource_name_snapshot,
+               COALESCE(extra_minutes, 0) AS extra_minutes,
+               COALESCE(extra_price, 0) AS extra_price
+        FROM reservations
+        WHERE {" AND ".join(page_where)}
+        ORDER BY date {direction}, time {direction}, id {direction}
+        LIMIT %s
+        """,
+        page_params + [page_size + 1],
+    )
+    rows = c.fetchall()
+
+    # Each count reads at most DASHBOARD_COUNT_CAP + 1 index entries, the
+    # statuses separately so none is a share of a truncated sample.
+    count_where = " AND ".join(where)
+    c.execute(
+        f"""
+        SELECT
+            (SELECT COUNT(*) FROM (
+                SELECT 1 FROM reservations WHERE {count_where} LIMIT %s
+            ) t) AS total,
+            (SELECT COUNT(*) FROM (
+                SELECT 1 FROM reservations WHERE {count_where} AND status = 'CONFIRMED' LIMIT %s
+            ) t) AS confirmed,
+            (SELECT COUNT(*) FROM (
+                SELECT 1 FROM reservations WHERE {count_where} AND status = 'CANCELED' LIMIT %s
+            ) t) AS canceled,
+            (SELECT COUNT(*) FROM (
+                SELECT 1 FROM reservations WHERE {count_where} AND status = 'DONE' LIMIT %s
+            ) t) AS done
+        """,
+        (params + [DASHBOARD_COUNT_CAP + 1]) * 4,
+    )
+    raw_counts = {key: int(n) for key, n in c.fetchone().items()}
+    conn.close()
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if before_key:
+        rows.reverse()
+
+    if before_key:
+        newer = encode_reservation_cursor(rows[0]) if rows and has_more else None
+        older = encode_reservation_cursor(rows[-1]) if rows else None
+    else:
+        newer = encode_reservation_cursor(rows[0]) if rows and after_key else None
+        older = encode_reservation_cursor(rows[-1]) if rows and has_more else None
+
+    statuses = ("CONFIRMED", "CANCELED", "DONE")
+    return {
+        "rows": rows,
+        "newer_cursor": newer,
+        "older_cursor": older,
+        "counts": dict(
+            {status: min(raw_counts[status.lower()], DASHBOARD_COUNT_CAP) for status in statuses},
+            total=min(raw_counts["total"], DASHBOARD_COUNT_CAP),
+            capped=raw_counts["total"] > DASHBOARD_COUNT_CAP,
+            capped_statuses={status: raw_counts[status.lower()] > DASHBOARD_COUNT_CAP for status in statuses},
+        ),
+    }
+
+
+def build_report_price_resolver(price_table):
+    night_by_time = {}
+
+    def price_for(service_name, time_str):
+        is_night = night_by_time.get(time_str)
+        if is_night is None:
+            is_night = night_by_time[time_str] = bool(time_str) and is_night_time_str(time_str)
+        return pricing.quote_service_price(price_table, service_name, is_night=is_night)
+
+    return price_for
+
+
+def compute_dashboard_report_metrics(business, services, reservations_rows):
+    tz = pytz.timezone(business.get("timezone") or "Asia/Beirut")
+    windows = report_engine.week_windows(datetime.now(tz).date())
+
+    columns = report_engine.build_reservation_columns(
+        reservations_rows,
+        build_report_price_resolver(get_price_table(business["id"], business)),
+        windows,
+    )
 
     def build_trend(current, previous, good_when="up"):
         if current == previous:
@@ -2180,28 +2878,9 @@ def compute_dashboard_report_metrics(business, services, reservations_rows):
             "label": f"vs previous 7 days",
         }
 
-    overall = summarize_metrics(reservations_rows)
-
-    tz = pytz.timezone(business.get("timezone") or "Asia/Beirut")
-    today = datetime.now(tz).date()
-    current_start = today - timedelta(days=6)
-    previous_start = today - timedelta(days=13)
-    previous_end = today - timedelta(days=7)
-
-    current_rows = []
-    previous_rows = []
-    for row in reservations_rows:
-        try:
-            row_date = datetime.strptime(row.get("date"), "%Y-%m-%d").date()
-        except Exception:
-            continue
-        if current_start <= row_date <= today:
-            current_rows.append(row)
-        elif previous_start <= row_date <= previous_end:
-            previous_rows.append(row)
-
-    current_metrics = summarize_metrics(current_rows)
-    previous_metrics = summarize_metrics(previous_rows)
+    overall = report_engine.summarize_reservation_columns(columns)
+    current_metrics = report_engine.summarize_reservation_columns(columns, report_engine.BUCKET_CURRENT)
+    previous_metrics = report_engine.summarize_reservation_columns(columns, report_engine.BUCKET_PREVIOUS)
 
     whatsapp_connected = bool(business.get("access_token"))
     minutes_per_reservation = 3 if whatsapp_connected else 2
@@ -2241,9 +2920,10 @@ def build_service_duration_cache(business_id, reservations_rows, extra_service_n
             if s:
                 names.add(s)
 
+    service_profiles = get_service_profiles(business_id)
     cache = {}
     for name in names:
-        cache[name] = int(get_service_info(business_id, name).get("duration", 45))
+        cache[name] = build_service_slot_profile(service_profiles, name)["duration"]
     return cache
 
 
@@ -2256,16 +2936,16 @@ def is_resource_slot_full_fast(
     new_service,
 ):
     resource_id = resource["id"]
+    service_profiles = get_service_profiles(business_id)
+    new_profile = build_service_slot_profile(service_profiles, new_service)
     new_duration = int(service_duration_cache.get(new_service, 45))
     new_start = time_to_minutes(new_time)
-    new_units = get_service_capacity_units(business_id, new_service)
-    shared_pool = get_service_shared_pool_key(business_id, new_service)
-    capacity = 2 if shared_pool else int(resource.get("capacity") or 1)
-    overlapping_units = 0
+    shared_pool = new_profile["pool"]
+    free_units = slot_capacity(new_profile, resource) - new_profile["units"]
     for row in reservations_rows:
         existing_service = row.get("service")
-        existing_pool = get_service_shared_pool_key(business_id, existing_service)
-        same_pool = existing_pool == shared_pool if shared_pool else row.get("resource_id") == resource_id
+        existing_profile = build_service_slot_profile(service_profiles, existing_service)
+        same_pool = existing_profile["pool"] == shared_pool if shared_pool else row.get("resource_id") == resource_id
         if not same_pool:
             continue
         existing_time = normalize_time_str(row["time"])
@@ -2274,8 +2954,10 @@ def is_resource_slot_full_fast(
         existing_start = time_to_minutes(existing_time)
         existing_duration = int(service_duration_cache.get(existing_service, 45))
         if ranges_overlap(new_start, new_duration, existing_start, existing_duration):
-            overlapping_units += get_service_capacity_units(business_id, existing_service)
-    return (overlapping_units + new_units) > capacity
+            free_units -= existing_profile["units"]
+            if free_units < 0:
+                return True
+    return free_units < 0
 
 
 def get_manual_reservation_resource_choice_fast(
@@ -2428,33 +3110,35 @@ def get_service_duration_cached(business_id, service_name, cache=None):
     key = (service_name or "").strip().lower()
     if cache is not None and key in cache:
         return cache[key]
-    duration = int(get_service_info(business_id, service_name).get("duration", 45))
+    duration = build_service_slot_profile(get_service_profiles(business_id), service_name)["duration"]
     if cache is not None:
         cache[key] = duration
     return duration
 
 
 def is_resource_slot_full_from_prefetched(business_id, resource, new_time, new_service, reservations_by_resource, service_duration_cache=None):
+    service_profiles = get_service_profiles(business_id)
+    new_profile = build_service_slot_profile(service_profiles, new_service)
     new_duration = int(get_service_duration_cached(business_id, new_service, service_duration_cache))
     new_start = time_to_minutes(new_time)
-    new_units = get_service_capacity_units(business_id, new_service)
-    shared_pool = get_service_shared_pool_key(business_id, new_service)
-    capacity = 2 if shared_pool else int(resource.get("capacity") or 1)
-    overlapping_units = 0
+    shared_pool = new_profile["pool"]
+    free_units = slot_capacity(new_profile, resource) - new_profile["units"]
     row_sets = reservations_by_resource.values() if shared_pool else [reservations_by_resource.get(resource["id"], [])]
     for rows in row_sets:
         for row in rows:
-            existing_service = row.get("service")
-            if shared_pool and get_service_shared_pool_key(business_id, existing_service) != shared_pool:
+            existing_profile = build_service_slot_profile(service_profiles, row.get("service"))
+            if shared_pool and existing_profile["pool"] != shared_pool:
                 continue
             existing_time = normalize_time_str(row["time"])
             if not existing_time:
                 continue
-            existing_duration = int(get_service_duration_cached(business_id, existing_service, service_duration_cache))
+            existing_duration = int(get_service_duration_cached(business_id, row.get("service"), service_duration_cache))
             existing_start = time_to_minutes(existing_time)
             if ranges_overlap(new_start, new_duration, existing_start, existing_duration):
-                overlapping_units += get_service_capacity_units(business_id, existing_service)
-    return (overlapping_units + new_units) > capacity
+                free_units -= existing_profile["units"]
+                if free_units < 0:
+                    return True
+    return free_units < 0
 
 def reservation_has_ended(business, reservation):
     try:
@@ -2555,11 +3239,11 @@ def _handle_manual_add_reservation():
                 service_duration_cache,
             )
             if error_message:
-                print("manual_add_reservation:", error_message, flush=True)
+                dashboard_log.info("manual_add_reservation rejected: %s", error_message)
                 return dashboard_redirect_with_toast(error_message, "error")
         else:
             if is_slot_taken(business_id, date_iso, normalized_time, valid_service):
-                print("manual_add_reservation: business-wide slot already taken", flush=True)
+                dashboard_log.info("manual_add_reservation rejected: business-wide slot already taken")
                 return dashboard_redirect_with_toast("This time slot is already taken.", "error")
 
         calendar_warning = None
@@ -2606,14 +3290,16 @@ def _handle_manual_add_reservation():
         return dashboard_redirect_with_toast("Reservation added successfully.", "success")
 
     except Exception as e:
-        print("manual_add_reservation error:", str(e), flush=True)
+        dashboard_log.exception("manual_add_reservation error: %s", e)
         return dashboard_redirect_with_toast("Reservation could not be saved. Please check the server logs.", "error")
 
     finally:
-        total_seconds = time.perf_counter() - started_at
-        print(f"manual_add_reservation total_seconds: {total_seconds:.3f}", flush=True)
+        metrics.observe("manual_add_reservation_seconds", time.perf_counter() - started_at, phase="total")
         if calendar_seconds is not None:
-            print(f"manual_add_reservation calendar_seconds: {calendar_seconds:.3f}", flush=True)
+            metrics.observe("manual_add_reservation_seconds", calendar_seconds, phase="calendar")
+
+metrics.histogram("manual_add_reservation_seconds", "Dashboard manual add, total and Google Calendar part.")
+
 
 @app.route("/reservations/manual-add", methods=["POST"])
 def manual_add_reservation():
@@ -2656,55 +3342,11 @@ def is_resource_allowed_for_service(business_id, resource_id, service_name):
     conn.close()
     return bool(row)
 
-def apply_tone_to_text(business, text):
-    tone = (business.get("assistant_tone") or "friendly").strip().lower()
-    msg = (text or "").strip()
-
-    if tone == "professional":
-        replacements = [
-            ("Hi! Welcome 👋", "Hello."),
-            ("Hi!", "Hello."),
-            ("Hello! Welcome 🤍", "Hello."),
-            ("Sure —", "Certainly —"),
-            ("Of course —", "Certainly —"),
-            ("Thanks,", "Thank you,"),
-            ("Thanks so much,", "Thank you,"),
-            ("Perfect —", "Understood —"),
-            ("Perfect 🤍 —", "Understood —"),
-            ("Thank you for booking with us 🤍", "Thank you for your reservation."),
-            ("If this is a mistake, please contact us to reschedule.", "If needed, please contact us to reschedule."),
-            ("🤍", ""),
-            ("👋", ""),
-        ]
-    elif tone == "warm":
-        replacements = [
-            ("Hi! Welcome 👋", "Hello! Welcome 🤍"),
-            ("Hi!", "Hello!"),
-            ("Sure —", "Of course —"),
-            ("Thanks,", "Thanks so much,"),
-            ("Perfect —", "Perfect 🤍 —"),
-        ]
-    elif tone == "luxury":
-        replacements = [
-            ("Hi! Welcome 👋", "Welcome."),
-            ("Hi!", "Welcome."),
-            ("Hello! Welcome 🤍", "Welcome."),
-            ("Sure —", "Certainly —"),
-            ("Of course —", "Certainly —"),
-            ("Thanks,", "Thank you,"),
-            ("Thanks so much,", "Thank you,"),
-            ("Perfect —", "Wonderful —"),
-            ("Perfect 🤍 —", "Wonderful —"),
-            ("Thank you for booking with us 🤍", "We look forward to welcoming you."),
-            ("👋", ""),
-        ]
-    else:
-        replacements = []
-
-    for old, new in replacements:
-        msg = msg.replace(old, new)
+def get_business_tone(business):
+    return localization.normalize_tone(business.get("assistant_tone"))
 
-    return msg.strip()
+def apply_tone_to_text(business, text):
+    return localization.apply_tone(get_business_tone(business), (text or "").strip()).strip()
 
 def get_confirmed_reservations_for_phone(business, phone):
     mark_past_reservations_done(business)
@@ -2728,23 +3370,78 @@ def get_confirmed_reservations_for_phone(business, phone):
     return rows
 
 
-def mark_reservations_cancelled_by_phone(business_id, phone):
+def cancel_confirmed_reservations(business_id, phone=None, reservation_ids=None):
+    """
+    Cancels, in one UPDATE ... RETURNING, the CONFIRMED reservations of a
+    business that belong to a customer phone and/or are in reservation_ids.
+    Returns the rows that were actually cancelled, so callers report real
+    counts and know which calendar events and customers to follow up on.
+    """
+    if phone is None and not reservation_ids:
+        return []
+
+    conditions = ["business_id = %s", "status = 'CONFIRMED'"]
+    params = [business_id]
+    if phone is not None:
+        conditions.append("customer_phone = %s")
+        params.append(phone)
+    if reservation_ids:
+        conditions.append("id = ANY(%s)")
+        params.append(list(reservation_ids))
+
     conn = get_db_connection()
     c = conn.cursor()
     c.execute(
-        """
+        f"""
         UPDATE reservations
         SET status = 'CANCELED'
-        WHERE business_id = %s
-          AND customer_phone = %s
-          AND status = 'CONFIRMED'
+        WHERE {" AND ".join(conditions)}
+        RETURNING id, customer_name, customer_phone, service, date, time,
+                  google_event_id, resource_name_snapshot
         """,
-        (business_id, phone),
+        tuple(params),
     )
+    cancelled = c.fetchall()
+    cancelled_dates = [row["date"] for row in cancelled]
+    versions = {}
+    if cancelled_dates:
+        versions = bump_availability_version(business_id, cancelled_dates, cursor=c)
     conn.commit()
-    affected = c.rowcount
     conn.close()
-    return affected
+    if cancelled:
+        publish_reservation_event(
+            business_id,
+            "cancelled",
+            [row["id"] for row in cancelled],
+            cancelled_dates,
+            versions,
+        )
+    return cancelled
+
+
+def delete_reservation_events(business, reservations):
+    """
+    Removes the calendar events of cancelled reservations with one batched
+    Calendar request. Returns how many were deleted.
+    """
+    event_ids = [r["google_event_id"] for r in reservations if r.get("google_event_id")]
+    if not event_ids:
+        return 0
+    try:
+        return len(delete_events(event_ids, calendar_id=(business.get("calendar_id") or "primary")))
+    except Exception as e:
+        gcal_log.warning("delete_events error: %s", e)
+        return 0
+
+
+def notify_cancelled_customers(business, reservations):
+    side_effects.map_concurrently(
+        "cancellation",
+        lambda r: send_reservation_cancellation(
+            r["customer_phone"], r["customer_name"], r["service"], r["date"], r["time"], business
+        ),
+        [r for r in reservations if r.get("customer_phone")],
+    )
 
 # ------------------ CONVERSATION LOGIC ------------------
 import re
@@ -2861,219 +3558,61 @@ def is_no_intent(text):
 
 
 def tr_switch_offer(lang, preferred_name, offered_name, date_, time_, nearby_text=""):
-    if lang == "fr":
-        msg = (
-            f"{preferred_name} n’est pas disponible le {date_} à {time_}.\n"
-            f"{offered_name} est disponible à la même heure.\n"
-            f"Voulez-vous réserver avec {offered_name} ?"
-        )
-        if nearby_text:
-            msg += f"\n\nHeures proches avec {preferred_name} :\n{nearby_text}"
-        return msg
-
-    if lang == "ar":
-        msg = (
-            f"{preferred_name} غير متاح بتاريخ {date_} الساعة {time_}.\n"
-            f"{offered_name} متاح بنفس الوقت.\n"
-            f"بدك أحجز مع {offered_name}؟"
-        )
-        if nearby_text:
-            msg += f"\n\nأقرب الأوقات مع {preferred_name}:\n{nearby_text}"
-        return msg
-
-    msg = (
-        f"{preferred_name} isn’t available on {date_} at {time_}.\n"
-        f"{offered_name} is available at the same time.\n"
-        f"Would you like to book with {offered_name} instead?"
+    nearby_block = tr(lang, "switch_offer_nearby", preferred=preferred_name, nearby=nearby_text) if nearby_text else ""
+    return tr(
+        lang,
+        "switch_offer",
+        preferred=preferred_name,
+        offered=offered_name,
+        date=date_,
+        time=time_,
+        nearby_block=nearby_block,
     )
-    if nearby_text:
-        msg += f"\n\nClosest times with {preferred_name}:\n{nearby_text}"
-    return msg
 
 
 def tr_switch_declined(lang, preferred_name, nearby_text=""):
-    if lang == "fr":
-        if nearby_text:
-            return f"D’accord — voici les heures proches avec {preferred_name} :\n{nearby_text}"
-        return f"D’accord — aucune heure proche n’a été trouvée avec {preferred_name}."
-
-    if lang == "ar":
-        if nearby_text:
-            return f"أكيد — هيدي أقرب الأوقات مع {preferred_name}:\n{nearby_text}"
-        return f"أكيد — ما لقينا أوقات قريبة مع {preferred_name}."
-
     if nearby_text:
-        return f"Okay — here are the closest times with {preferred_name}:\n{nearby_text}"
-    return f"Okay — no nearby times were found with {preferred_name}."
-
-def tr(lang, key, **kwargs):
-    messages = {
-        "greeting": {
-            "en": "Hi! Welcome 👋\n\nHow can I help you today?\n• Type *book* to make a reservation\n• Type *cancel* to cancel your reservation\n• Type *reschedule* to move your reservation",
-            "ar": "أهلاً 👋\n\nكيف فيني ساعدك اليوم؟\n• اكتب *احجز* لتعمل حجز\n• اكتب *الغاء* لتلغي الحجز\n• اكتب *تغيير الحجز* لتغيير الموعد",
-            "fr": "Bonjour 👋\n\nComment puis-je vous aider aujourd’hui ?\n• Tapez *book* pour réserver\n• Tapez *cancel* pour annuler votre réservation\n• Tapez *reschedule* pour déplacer votre réservation",
-        },
-        "ask_name": {
-            "en": "Sure — what is your full name?",
-            "ar": "أكيد 🤍 شو الاسم الكامل للحجز؟",
-            "fr": "Bien sûr — quel est votre nom complet ?",
-        },
-        "ask_service": {
-            "en": "Thanks, {name}. Which service would you like? (e.g., haircut, consultation)",
-            "ar": "شكراً {name}. أي خدمة بدك؟ (مثلاً: قص شعر، استشارة)",
-            "fr": "Merci, {name}. Quel service souhaitez-vous ? (ex. coupe, consultation)",
-        },
-        "ask_date": {
-            "en": "Great — {service}. What date would you like? (e.g., 2026-04-20)",
-            "ar": "ممتاز — {service}. أي تاريخ بدك؟ (مثلاً: 2026-04-20)",
-            "fr": "Parfait — {service}. Quelle date souhaitez-vous ? (ex. 2026-04-20)",
-        },
-        "ask_time": {
-            "en": "Perfect — and what time? (e.g., 16:00 or 4 PM)",
-            "ar": "ممتاز — وأي ساعة؟ (مثلاً: 16:00 أو 4 PM)",
-            "fr": "Parfait — à quelle heure ? (ex. 16:00 ou 4 PM)",
-        },
-        "invalid_time": {
-            "en": "Please send a valid time, like 16:00 or 4 PM.",
-            "ar": "من فضلك ابعت وقت صحيح، مثل 16:00 أو 4 PM.",
-            "fr": "Veuillez envoyer une heure valide, comme 16:00 ou 4 PM.",
-        },
-        "slot_taken": {
-            "en": "Sorry, {date} at {time} is already booked. Please choose another time 🤍",
-            "ar": "عذراً، الموعد {date} الساعة {time} محجوز. اختار وقت تاني 🤍",
-            "fr": "Désolé, le créneau du {date} à {time} est déjà réservé. Choisissez une autre heure 🤍",
-        },
-        "no_active_cancel": {
-            "en": "You have no active reservations to cancel.",
-            "ar": "ما عندك أي حجوزات مفعّلة لتلغيها.",
-            "fr": "Vous n’avez aucune réservation active à annuler.",
-        },
-        "cancel_done": {
-            "en": "✅ Cancelled {count} reservation(s).\n🗓 Removed {events} event(s) from Google Calendar.",
-            "ar": "✅ تم إلغاء {count} حجز/حجوزات.\n🗓 وتم حذف {events} موعد/مواعيد من Google Calendar.",
-            "fr": "✅ {count} réservation(s) annulée(s).\n🗓 {events} événement(s) supprimé(s) de Google Calendar.",
-        },
-        "save_error": {
-            "en": "Something went wrong while saving your reservation. Please try again.",
-            "ar": "صار خطأ أثناء حفظ الحجز. جرب مرة ثانية.",
-            "fr": "Une erreur s’est produite أثناء حفظ la réservation. Veuillez réessayer.",
-        },
-        "invalid_date": {
-            "en": "Please send a valid date, like 2026-04-20 or 20 April.",
-            "ar": "من فضلك ابعت تاريخ صحيح، مثل 2026-04-20 أو 20 نيسان.",
-            "fr": "Veuillez envoyer une date valide, comme 2026-04-20 ou 20 avril.",
-        },
-        "past_date": {
-            "en": "That date is in the past. Please choose today or a future date.",
-            "ar": "هذا التاريخ أصبح بالماضي. اختار اليوم أو تاريخ بالمستقبل.",
-            "fr": "Cette date est déjà passée. Veuillez choisir aujourd’hui ou une date future.",
-        },
-        "closed_day": {
-            "en": "Sorry, we’re closed on that day. Please choose another date.",
-            "ar": "عذراً، نحن مغلقون في هذا اليوم. اختار تاريخ تاني.",
-            "fr": "Désolé, nous sommes fermés ce jour-là. Choisissez une autre date.",
-        },
-        "outside_hours": {
-            "en": "That time is outside business hours. Please choose another time.",
-            "ar": "هذا الوقت خارج ساعات العمل. اختار وقت تاني.",
-            "fr": "Cette heure est en dehors des horaires d’ouverture. Choisissez une autre heure.",
-        },
-    }
+        return tr(lang, "switch_declined", preferred=preferred_name, nearby=nearby_text)
+    return tr(lang, "switch_declined_none", preferred=preferred_name)
 
-    lang_messages = messages.get(key, {})
-    template = lang_messages.get(lang) or lang_messages.get("en") or key
-    return template.format(**kwargs)
+def tr(lang, key, tone=localization.DEFAULT_TONE, **kwargs):
+    return localization.render(lang, key, tone, **kwargs)
 WEEKDAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
 
-def tr_confirmation(lang, name, service, date, time, total_price, calendar_added=False, resource_name=None):
-    resource_line_map = {
-        "en": f"\nWith: {resource_name}" if resource_name else "",
-        "fr": f"\nAvec : {resource_name}" if resource_name else "",
-        "ar": f"\nمع: {resource_name}" if resource_name else "",
-    }
-    calendar_line_map = {
-        "en": "\n🗓 Also added to our Google Calendar." if calendar_added else "",
-        "fr": "\n🗓 Également ajouté à notre Google Calendar." if calendar_added else "",
-        "ar": "\n🗓 وتمت إضافته أيضاً إلى Google Calendar." if calendar_added else "",
-    }
-    messages = {
-        "en": f"✅ Your reservation is confirmed!\nName: {name}\nService: {service}{resource_line_map['en']}\nDate: {date}\nTime: {time}{calendar_line_map['en']}\n\nThank you for booking with us 🤍",
-        "fr": f"✅ Votre réservation est confirmée !\nNom : {name}\nService : {service}{resource_line_map['fr']}\nDate : {date}\nHeure : {time}{calendar_line_map['fr']}\n\nMerci pour votre réservation 🤍",
-        "ar": f"✅ تم تأكيد حجزك!\nالاسم: {name}\nالخدمة: {service}{resource_line_map['ar']}\nالتاريخ: {date}\nالوقت: {time}{calendar_line_map['ar']}\n\nشكراً لحجزك معنا 🤍",
-    }
-    return messages.get(lang, messages["en"])
-
-def tr_cancellation(lang, name, service, date, time, resource_name=None):
-    resource_line_map = {
-        "en": f"\nWith: {resource_name}" if resource_name else "",
-        "fr": f"\nAvec : {resource_name}" if resource_name else "",
-        "ar": f"\nمع: {resource_name}" if resource_name else "",
-    }
-
-    messages = {
-        "en": (
-            f"❌ Your reservation has been canceled.\n"
-            f"Name: {name}\n"
-            f"Service: {service}{resource_line_map['en']}\n"
-            f"Date: {date}\n"
-            f"Time: {time}\n\n"
-            f"If this is a mistake, please contact us to reschedule."
-        ),
-        "fr": (
-            f"❌ Votre réservation a été annulée.\n"
-            f"Nom : {name}\n"
-            f"Service : {service}{resource_line_map['fr']}\n"
-            f"Date : {date}\n"
-            f"Heure : {time}\n\n"
-            f"Si c’est une erreur, veuillez nous contacter pour reprogrammer."
-        ),
-        "ar": (
-            f"❌ تم إلغاء حجزك.\n"
-            f"الاسم: {name}\n"
-            f"الخدمة: {service}{resource_line_map['ar']}\n"
-            f"التاريخ: {date}\n"
-            f"الوقت: {time}\n\n"
-            f"إذا كان هذا عن طريق الخطأ، يرجى التواصل معنا لإعادة الحجز."
-        ),
-    }
+def tr_confirmation(lang, name, service, date, time, total_price, calendar_added=False, resource_name=None, tone=localization.DEFAULT_TONE):
+    return tr(
+        lang,
+        "confirmation",
+        tone=tone,
+        name=name,
+        service=service,
+        date=date,
+        time=time,
+        resource_line=tr(lang, "resource_line", resource_name=resource_name) if resource_name else "",
+        calendar_line=tr(lang, "calendar_added_line") if calendar_added else "",
+    )
 
-    return messages.get(lang, messages["en"])
+def tr_cancellation(lang, name, service, date, time, resource_name=None, tone=localization.DEFAULT_TONE):
+    return tr(
+        lang,
+        "cancellation",
+        tone=tone,
+        name=name,
+        service=service,
+        date=date,
+        time=time,
+        resource_line=tr(lang, "resource_line", resource_name=resource_name) if resource_name else "",
+    )
 
 
 def tr_resource_unavailable(lang, resource_name, date, time_, same_time_names="", nearby_text="", no_alternatives=False):
-    if lang == "fr":
-        parts = [
-            f"Désolé, {resource_name} n’est pas disponible le {date} à {time_}."
-        ]
-        if same_time_names:
-            parts.append(f"Disponible à la même heure : {same_time_names}.")
-        if nearby_text:
-            parts.append(f"Heures proches avec {resource_name} :\n{nearby_text}")
-        if no_alternatives:
-            parts.append("Aucune alternative proche n’a été trouvée.")
-        return "\n".join(parts)
-
-    if lang == "ar":
-        parts = [
-            f"عذراً، {resource_name} غير متاح بتاريخ {date} الساعة {time_}."
-        ]
-        if same_time_names:
-            parts.append(f"المتاحون في نفس الوقت: {same_time_names}.")
-        if nearby_text:
-            parts.append(f"أقرب الأوقات مع {resource_name}:\n{nearby_text}")
-        if no_alternatives:
-            parts.append("لم يتم العثور على بدائل قريبة.")
-        return "\n".join(parts)
-
-    parts = [
-        f"Sorry, {resource_name} isn’t available on {date} at {time_}."
-    ]
+    parts = [tr(lang, "resource_unavailable", resource_name=resource_name, date=date, time=time_)]
     if same_time_names:
-        parts.append(f"Available at the same time: {same_time_names}.")
+        parts.append(tr(lang, "resource_unavailable_same_time", names=same_time_names))
     if nearby_text:
-        parts.append(f"Closest times with {resource_name}:\n{nearby_text}")
+        parts.append(tr(lang, "resource_unavailable_nearby", resource_name=resource_name, nearby=nearby_text))
     if no_alternatives:
-        parts.append("No nearby alternatives were found.")
+        parts.append(tr(lang, "resource_unavailable_none"))
     return "\n".join(parts)
 
 def normalize_booking_date(date_str):
@@ -3117,6 +3656,10 @@ def normalize_booking_date(date_str):
     for ar, en in month_map.items():
         normalized = normalized.replace(ar, en)
 
+    # Imported on first use, like the Google clients in gcal: only free-form
+    # dates reach this fallback.
+    from dateutil import parser as dtparse
+
     dt = dtparse.parse(normalized, dayfirst=True, fuzzy=True)
 
     if dt.tzinfo is None:
@@ -3188,7 +3731,7 @@ def mark_past_reservations_done(business):
             if end_dt <= now:
                 ids_to_mark_done.append(row["id"])
         except Exception as e:
-            print("mark_past_reservations_done error on row:", row, e)
+            dashboard_log.warning("mark_past_reservations_done error on reservation %s: %s", row.get("id"), e)
 
     if ids_to_mark_done:
         for reservation_id in ids_to_mark_done:
@@ -3200,7 +3743,11 @@ def mark_past_reservations_done(business):
                 """,
                 (reservation_id,),
             )
+        done_ids = set(ids_to_mark_done)
+        done_dates = [row["date"] for row in rows if row["id"] in done_ids]
+        versions = bump_availability_version(business["id"], done_dates, cursor=c)
         conn.commit()
+        publish_reservation_event(business["id"], "done", ids_to_mark_done, done_dates, versions)
 
     conn.close()
 
@@ -3232,6 +3779,7 @@ def ensure_default_hours(business_id):
     conn.close()
 
 
+@turn_memoized
 def get_day_rules(business_id, date_iso):
     target_date = datetime.strptime(date_iso, "%Y-%m-%d").date()
     weekday = target_date.weekday()
@@ -3294,11 +3842,31 @@ def is_time_within_business_hours(time_str, open_time, close_time):
 def humanize_reply(lang, fallback_text, purpose="general"):
     return fallback_text
 
-def send_friendly_message(phone, business, lang, text, purpose="general"):
-    toned_text = apply_tone_to_text(business, text)
+def send_friendly_message(phone, business, lang, text, purpose="general", toned=False):
+    # toned: text was rendered from the catalog in the business tone already.
+    toned_text = text.strip() if toned else apply_tone_to_text(business, text)
     final_text = humanize_reply(lang, toned_text, purpose=purpose)
     send_message(phone, final_text, business)
 
+def get_reply_templates(business):
+    """
+    Reply templates of a business compiled in its tone, custom welcome
+    message included. Cached with the other compiled business data, so a
+    settings change rebuilds it.
+    """
+    def build():
+        custom = (business.get("custom_welcome_message") or "").strip()
+        return localization.compile_templates(
+            business.get("assistant_tone"),
+            overrides={"greeting": custom} if custom else None,
+        )
+
+    return get_compiled_business_data("reply_templates", business["id"], build)
+
+def send_reply(phone, business, lang, key, purpose="general", **kwargs):
+    text = localization.render_from(get_reply_templates(business), lang, key, **kwargs)
+    send_friendly_message(phone, business, lang, text, purpose=purpose, toned=True)
+
 import re
 
 def normalize_time_str_with_hours(time_input, open_time=None, close_time=None):
@@ -3397,6 +3965,7 @@ def validate_service_for_business(business_id, service_name):
                 return s, services
 
     return None, services
+@turn_memoized
 def get_service_row_for_business(business_id, service_name):
     conn = get_db_connection()
     c = conn.cursor()
@@ -3431,6 +4000,7 @@ def get_service_row_for_business(business_id, service_name):
     return row
 
 
+@turn_memoized
 def get_active_resources_for_service(business_id, service_name):
     """
     If no resource-service assignments exist for the business yet,
@@ -3510,6 +4080,7 @@ def extract_requested_resource_from_text(text, resources):
     return best
 
 
+@turn_memoized
 def get_resource_day_rules(business_id, resource_id, date_iso):
     target_date = datetime.strptime(date_iso, "%Y-%m-%d").date()
     weekday = target_date.weekday()
@@ -3565,31 +4136,28 @@ def is_resource_slot_full(business_id, resource_id, date_iso, new_time, new_serv
     resource = get_resource_by_id(resource_id, business_id)
     if not resource:
         return True
-    new_duration = int(get_service_info(business_id, new_service).get("duration", 45))
+    service_profiles = get_service_profiles(business_id)
+    new_profile = build_service_slot_profile(service_profiles, new_service)
+    new_duration = new_profile["duration"]
     new_start = time_to_minutes(new_time)
-    new_units = get_service_capacity_units(business_id, new_service)
-    shared_pool = get_service_shared_pool_key(business_id, new_service)
-    capacity = 2 if shared_pool else int(resource.get("capacity") or 1)
-    conn = get_db_connection(); c = conn.cursor()
-    c.execute("""SELECT service, time, resource_id, COALESCE(extra_minutes, 0) AS extra_minutes
-                 FROM reservations
-                 WHERE business_id = %s AND date = %s AND status = 'CONFIRMED'""", (business_id, date_iso))
-    rows = c.fetchall(); conn.close()
-    overlapping_units = 0
+    shared_pool = new_profile["pool"]
+    free_units = slot_capacity(new_profile, resource) - new_profile["units"]
+    rows = get_confirmed_reservation_rows_for_date(business_id, date_iso)
     for row in rows:
-        existing_service = row["service"]
-        existing_pool = get_service_shared_pool_key(business_id, existing_service)
-        same_pool = existing_pool == shared_pool if shared_pool else row.get("resource_id") == resource_id
+        existing_profile = build_service_slot_profile(service_profiles, row["service"])
+        same_pool = existing_profile["pool"] == shared_pool if shared_pool else row.get("resource_id") == resource_id
         if not same_pool:
             continue
         existing_time = normalize_time_str(row["time"])
         if not existing_time:
             continue
-        existing_duration = get_reservation_total_duration_minutes(business_id, existing_service, extra_minutes=row.get("extra_minutes") or 0)
+        existing_duration = existing_profile["duration"] + int(row.get("extra_minutes") or 0)
         existing_start = time_to_minutes(existing_time)
         if ranges_overlap(new_start, new_duration, existing_start, existing_duration):
-            overlapping_units += get_service_capacity_units(business_id, existing_service)
-    return (overlapping_units + new_units) > capacity
+            free_units -= existing_profile["units"]
+            if free_units < 0:
+                return True
+    return free_units < 0
 
 
 def get_available_resources_for_slot(business_id, date_iso, time_, service_name):
@@ -3714,261 +4282,725 @@ def suggest_resource_options(
 
     return final
 
-def process_incoming_message(business, phone, text):
-    global user_state
+# ------------------ MULTI-DAY AVAILABILITY SEARCH ------------------
 
-    t = (text or "").strip()
-    lt = t.lower()
+NEXT_AVAILABLE_DEFAULT_DAYS = 14
+NEXT_AVAILABLE_MAX_DAYS = 60
+NEXT_AVAILABLE_MAX_LIMIT = 20
 
-    key = (business["id"], phone)
-    state = user_state.get(key)
 
-    lang = get_effective_language(business, t, state)
+def load_service_rows_for_availability(business_id):
+    ensure_service_metadata_columns()
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute(
+        """
+        SELECT id, name, price, duration_min, sport_category, night_price, capacity_units_used
+        FROM services
+        WHERE business_id = %s
+        ORDER BY id DESC
+        """,
+        (business_id,),
+    )
+    rows = c.fetchall()
+    conn.close()
+    return rows
 
-    # GREETING
-    if is_greeting(t):
-        send_friendly_message(
-            phone,
-            business,
-            lang,
-            get_business_greeting(business, lang),
-            purpose="greeting",
-        )
-        return "ok", 200
 
-    # START BOOKING
-    if is_booking_intent(lt):
-        user_state[key] = {"step": "awaiting_name", "lang": lang}
-        send_friendly_message(phone, business, lang, tr(lang, "ask_name"), purpose="ask_name")
-        return "ok", 200
+def match_service_row(service_rows, service_name):
+    """
+    Same matching rules as get_service_info, but against rows that were
+    already loaded (services ordered by id DESC).
+    """
+    cleaned = (service_name or "").strip().lower()
+    for row in service_rows:
+        if (row.get("name") or "").strip().lower() == cleaned:
+            return row
+    if not cleaned:
+        return None
+    for row in service_rows:
+        if cleaned in (row.get("name") or "").lower():
+            return row
+    return None
 
-    # CANCEL BOOKING
-    if is_cancel_intent(lt):
-        reservations = get_confirmed_reservations_for_phone(business, phone)
 
-        if not reservations:
-            send_friendly_message(phone, business, lang, tr(lang, "no_active_cancel"), purpose="cancel")
-            return "ok", 200
+def compile_service_profiles(business_id):
+    """
+    Capacity model of a business: its services plus pool capacities and
+    explicit service -> pool assignments. Profiles are filled in lazily.
+    """
+    pool_rows, member_rows = get_capacity_pools(business_id)
 
-        deleted_count = 0
-        for r in reservations:
-            event_id = r.get("google_event_id")
-            if event_id:
-                if delete_event(event_id, calendar_id=(business.get("calendar_id") or "primary")):
-                    deleted_count += 1
+    pools = {LEGACY_SHARED_POOL_KEY: LEGACY_SHARED_POOL_CAPACITY}
+    for row in pool_rows:
+        pools[capacity_pool_key(row["id"])] = max(1, safe_int(row["capacity"], 1))
 
-        cancelled_count = mark_reservations_cancelled_by_phone(business["id"], phone)
+    members = {}  # service_id -> pool key, or None when it never shares one
+    for row in member_rows:
+        members[row["service_id"]] = capacity_pool_key(row["pool_id"]) if row["pool_id"] else None
 
-        send_friendly_message(
-            phone,
-            business,
-            lang,
-            tr(lang, "cancel_done", count=cancelled_count, events=deleted_count),
-            purpose="cancel",
-        )
-        return "ok", 200
+    return {
+        "service_rows": load_service_rows_for_availability(business_id),
+        "pools": pools,
+        "members": members,
+        "by_name": {},
+    }
 
-    # RESCHEDULE BOOKING
-    if is_reschedule_intent(lt):
-        reservations = get_confirmed_reservations_for_phone(business, phone)
 
-        if not reservations:
-            no_reschedule_map = {
-                "en": "You have no active reservation to reschedule.",
-                "fr": "Vous n’avez aucune réservation active à reprogrammer.",
-                "ar": "ما عندك حجز مفعّل لتغيير موعده.",
-            }
-            send_friendly_message(
-                phone,
-                business,
-                lang,
-                no_reschedule_map.get(lang, no_reschedule_map["en"]),
-                purpose="reschedule",
-            )
-            return "ok", 200
+def get_service_profiles(business_id):
+    return get_compiled_business_data(
+        "service_profiles",
+        business_id,
+        lambda: compile_service_profiles(business_id),
+    )
 
-        reservation = reservations[0]
-        user_state[key] = {
-            "step": "awaiting_reschedule_date",
-            "lang": lang,
-            "reschedule_reservation_id": reservation["id"],
-            "name": reservation.get("customer_name", ""),
-            "service": reservation.get("service", ""),
-            "old_date": reservation.get("date", ""),
-            "old_time": reservation.get("time", ""),
-            "resource_id": reservation.get("resource_id"),
-            "resource_name": reservation.get("resource_name_snapshot"),
-        }
 
-        ask_reschedule_date_map = {
-            "en": f"I found your active reservation for {reservation.get('service', '')} on {reservation.get('date', '')} at {reservation.get('time', '')}. What new date would you like?",
-            "fr": f"J’ai trouvé votre réservation active pour {reservation.get('service', '')} le {reservation.get('date', '')} à {reservation.get('time', '')}. Quelle nouvelle date souhaitez-vous ?",
-            "ar": f"لقيت حجزك المفعّل لخدمة {reservation.get('service', '')} بتاريخ {reservation.get('date', '')} الساعة {reservation.get('time', '')}. أي تاريخ جديد بدك؟",
-        }
-        send_friendly_message(
-            phone,
-            business,
-            lang,
-            ask_reschedule_date_map.get(lang, ask_reschedule_date_map["en"]),
-            purpose="ask_date",
-        )
-        return "ok", 200
+def build_service_slot_profile(service_profiles, service_name):
+    """
+    Duration, capacity units, pool key and pool capacity for a service name,
+    resolved from the compiled capacity model instead of one query per lookup.
+    """
+    profile = service_profiles["by_name"].get(service_name)
+    if profile is not None:
+        return profile
 
-    # STEP RESCHEDULE – DATE
-    if state and state.get("step") == "awaiting_reschedule_date":
-        lang = state.get("lang", lang)
+    row = match_service_row(service_profiles["service_rows"], service_name)
 
-        if is_booking_intent(t) or is_cancel_intent(t) or is_reschedule_intent(t):
-            repeat_date_map = {
-                "en": "Please send the new date you want for your reservation.",
-                "fr": "Veuillez envoyer la nouvelle date souhaitée pour votre réservation.",
-                "ar": "من فضلك ابعت التاريخ الجديد اللي بدك ياه للحجز.",
-            }
-            send_friendly_message(phone, business, lang, repeat_date_map.get(lang, repeat_date_map["en"]), purpose="ask_date")
-            return "ok", 200
+    units = safe_int(row.get("capacity_units_used") if row else None, 0)
+    if units <= 0:
+        units = infer_service_capacity_units_from_name(service_name)
 
-        try:
-            normalized_date = normalize_booking_date(t)
-        except Exception:
-            send_friendly_message(phone, business, lang, tr(lang, "invalid_date"), purpose="ask_date")
-            return "ok", 200
+    members = service_profiles["members"]
+    if row and row["id"] in members:
+        pool = members[row["id"]]
+    else:
+        sport = (row.get("sport_category") or "").strip().lower() if row else ""
+        sport = sport or infer_service_sport_from_name(service_name)
+        pool = LEGACY_SHARED_POOL_KEY if sport in LEGACY_SHARED_POOL_SPORTS else None
+
+    profile = {
+        "duration": int(row["duration_min"] or 45) if row else 45,
+        "units": units,
+        "pool": pool,
+        "pool_capacity": service_profiles["pools"].get(pool) if pool else None,
+    }
+    service_profiles["by_name"][service_name] = profile
+    return profile
 
-        if is_past_date_only(business, normalized_date):
-            send_friendly_message(phone, business, lang, tr(lang, "past_date"), purpose="ask_date")
-            return "ok", 200
 
-        day_rules = get_day_rules(business["id"], normalized_date)
-        if day_rules.get("closed"):
-            send_friendly_message(phone, business, lang, tr(lang, "closed_day"), purpose="availability")
-            return "ok", 200
+def slot_capacity(profile, resource):
+    if profile["pool"]:
+        return profile["pool_capacity"]
+    return int((resource or {}).get("capacity") or 1)
 
-        state["new_date"] = normalized_date
-        state["step"] = "awaiting_reschedule_time"
 
-        ask_reschedule_time_map = {
-            "en": f"Great — what new time would you like on {normalized_date}?",
-            "fr": f"Parfait — quelle nouvelle heure souhaitez-vous le {normalized_date} ?",
-            "ar": f"ممتاز — أي وقت جديد بدك بتاريخ {normalized_date}؟",
-        }
-        send_friendly_message(phone, business, lang, ask_reschedule_time_map.get(lang, ask_reschedule_time_map["en"]), purpose="ask_time")
-        return "ok", 200
+def load_availability_window(business_id, start_date_iso, end_date_iso, resource_ids=None, dates=None):
+    """
+    Loads everything the slot search needs for a date window in a handful
+    of queries: weekly hours, blocked dates (business + resources) and the
+    confirmed reservations of every day in the window.
+    Pass dates to load reservations for only those days of the window.
+    """
+    resource_ids = list(resource_ids or [])
 
-    # STEP RESCHEDULE – TIME
-    if state and state.get("step") == "awaiting_reschedule_time":
-        lang = state.get("lang", lang)
+    conn = get_db_connection()
+    c = conn.cursor()
 
-        if is_booking_intent(t) or is_cancel_intent(t) or is_reschedule_intent(t):
-            repeat_time_map = {
-                "en": "Please send the new time you want for your reservation.",
-                "fr": "Veuillez envoyer la nouvelle heure souhaitée pour votre réservation.",
-                "ar": "من فضلك ابعت الوقت الجديد اللي بدك ياه للحجز.",
-            }
-            send_friendly_message(phone, business, lang, repeat_time_map.get(lang, repeat_time_map["en"]), purpose="ask_time")
-            return "ok", 200
+    c.execute(
+        """
+        SELECT weekday, is_closed,
+               TO_CHAR(open_time, 'HH24:MI') AS open_time,
+               TO_CHAR(close_time, 'HH24:MI') AS close_time
+        FROM business_hours
+        WHERE business_id = %s
+        """,
+        (business_id,),
+    )
+    business_hours = {row["weekday"]: row for row in c.fetchall()}
 
-        new_date = state.get("new_date")
-        day_rules = get_day_rules(business["id"], new_date)
-        if day_rules.get("closed"):
-            send_friendly_message(phone, business, lang, tr(lang, "closed_day"), purpose="availability")
-            return "ok", 200
+    c.execute(
+        """
+        SELECT blocked_date::text AS blocked_date
+        FROM blocked_dates
+        WHERE business_id = %s
+          AND blocked_date BETWEEN %s AND %s
+        """,
+        (business_id, start_date_iso, end_date_iso),
+    )
+    blocked_dates = {row["blocked_date"] for row in c.fetchall()}
 
-        normalized_time = normalize_time_str_with_hours(
-            t,
-            day_rules.get("open_time"),
-            day_rules.get("close_time"),
+    resource_hours = {}
+    resource_blocked = set()
+    if resource_ids:
+        c.execute(
+            """
+            SELECT resource_id, weekday, is_closed,
+                   TO_CHAR(open_time, 'HH24:MI') AS open_time,
+                   TO_CHAR(close_time, 'HH24:MI') AS close_time
+            FROM resource_hours
+            WHERE business_id = %s
+              AND resource_id = ANY(%s)
+            """,
+            (business_id, resource_ids),
         )
-        if not normalized_time:
-            send_friendly_message(phone, business, lang, tr(lang, "invalid_time"), purpose="ask_time")
-            return "ok", 200
+        for row in c.fetchall():
+            resource_hours[(row["resource_id"], row["weekday"])] = row
 
-        if not is_time_within_business_hours(normalized_time, day_rules["open_time"], day_rules["close_time"]):
-            send_friendly_message(phone, business, lang, tr(lang, "outside_hours"), purpose="availability")
-            return "ok", 200
+        c.execute(
+            """
+            SELECT resource_id, blocked_date::text AS blocked_date
+            FROM resource_blocked_dates
+            WHERE business_id = %s
+              AND resource_id = ANY(%s)
+              AND blocked_date BETWEEN %s AND %s
+            """,
+            (business_id, resource_ids, start_date_iso, end_date_iso),
+        )
+        resource_blocked = {(row["resource_id"], row["blocked_date"]) for row in c.fetchall()}
 
-        reservation_id = state.get("reschedule_reservation_id")
-        conn = get_db_connection()
-        c = conn.cursor()
+    if dates is not None:
         c.execute(
             """
-            SELECT id, customer_name, customer_phone, service, status, google_event_id,
-                   resource_id, resource_name_snapshot, date, time
+            SELECT id, service, date, time, resource_id, COALESCE(extra_minutes, 0) AS extra_minutes
             FROM reservations
-            WHERE id = %s AND business_id = %s
-            LIMIT 1
+            WHERE business_id = %s
+              AND status = 'CONFIRMED'
+              AND date = ANY(%s)
             """,
-            (reservation_id, business["id"]),
+            (business_id, sorted(set(dates))),
         )
-        reservation = c.fetchone()
-        conn.close()
+    else:
+        c.execute(
+            """
+            SELECT id, service, date, time, resource_id, COALESCE(extra_minutes, 0) AS extra_minutes
+            FROM reservations
+            WHERE business_id = %s
+              AND status = 'CONFIRMED'
+              AND date >= %s
+              AND date <= %s
+            """,
+            (business_id, start_date_iso, end_date_iso),
+        )
+    reservations_by_date = {}
+    for row in c.fetchall():
+        reservations_by_date.setdefault(row["date"], []).append(row)
 
-        if not reservation:
-            user_state.pop(key, None)
-            missing_map = {
-                "en": "I could not find your reservation anymore. Please send book to create a new one.",
-                "fr": "Je n’ai plus trouvé votre réservation. Veuillez envoyer book pour créer une nouvelle réservation.",
-                "ar": "ما عاد لقيت الحجز. ابعت احجز إذا بدك تعمل حجز جديد.",
-            }
-            send_friendly_message(phone, business, lang, missing_map.get(lang, missing_map["en"]), purpose="error")
-            return "ok", 200
+    conn.close()
 
-        reservations_rows = get_confirmed_reservations_for_date_excluding_fast(
-            business["id"],
-            new_date,
-            excluded_reservation_id=reservation_id,
-        )
-        valid_service, _ = validate_service_for_business(business["id"], reservation["service"])
-        if not valid_service:
-            send_friendly_message(phone, business, lang, tr(lang, "save_error"), purpose="error")
-            user_state.pop(key, None)
-            return "ok", 200
+    return {
+        "business_hours": business_hours,
+        "blocked_dates": blocked_dates,
+        "resource_hours": resource_hours,
+        "resource_blocked": resource_blocked,
+        "reservations_by_date": reservations_by_date,
+    }
 
-        eligible_resources = get_active_resources_for_service(business["id"], valid_service)
-        service_duration_cache = build_service_duration_cache(
-            business["id"],
-            reservations_rows,
-            extra_service_names=[valid_service],
-        )
 
-        selected_resource_raw = str(state.get("resource_id")) if state.get("resource_id") else "auto"
-        chosen_resource = None
+def resolve_window_day_rules(window, date_iso, resource_id=None):
+    """
+    Mirrors get_resource_day_rules / get_day_rules using a preloaded window.
+    """
+    weekday = datetime.strptime(date_iso, "%Y-%m-%d").date().weekday()
 
-        if eligible_resources:
-            chosen_resource, error_message = get_manual_reservation_resource_choice_fast(
-                business["id"],
-                valid_service,
-                selected_resource_raw,
-                new_date,
-                normalized_time,
-                eligible_resources,
-                reservations_rows,
-                service_duration_cache,
-            )
-            if error_message:
-                send_friendly_message(phone, business, lang, error_message, purpose="slot_taken")
-                return "ok", 200
-        else:
-            new_duration = int(service_duration_cache.get(valid_service, 45))
-            new_start = time_to_minutes(normalized_time)
-            for row in reservations_rows:
-                existing_time = normalize_time_str(row["time"])
-                if not existing_time:
-                    continue
-                existing_start = time_to_minutes(existing_time)
-                existing_duration = int(service_duration_cache.get(row["service"], 45))
-                if ranges_overlap(new_start, new_duration, existing_start, existing_duration):
-                    send_friendly_message(phone, business, lang, tr(lang, "slot_taken", date=new_date, time=normalized_time), purpose="slot_taken")
-                    return "ok", 200
+    if resource_id is not None:
+        if (resource_id, date_iso) in window["resource_blocked"]:
+            return {"blocked": True, "closed": True, "reason": "blocked_date"}
+        row = window["resource_hours"].get((resource_id, weekday))
+        if row:
+            if row["is_closed"]:
+                return {"blocked": False, "closed": True, "reason": "weekly_closed"}
+            return {
+                "blocked": False,
+                "closed": False,
+                "open_time": row["open_time"],
+                "close_time": row["close_time"],
+            }
 
-        try:
-            new_event = apply_reschedule_update(
-                business,
-                reservation,
-                new_date,
-                normalized_time,
-                chosen_resource,
-            )
+    if date_iso in window["blocked_dates"]:
+        return {"blocked": True, "closed": True, "reason": "blocked_date"}
+
+    row = window["business_hours"].get(weekday)
+    if not row:
+        return {"blocked": False, "closed": False, "open_time": "09:00", "close_time": "18:00"}
+
+    if row["is_closed"]:
+        return {"blocked": False, "closed": True, "reason": "weekly_closed"}
+
+    return {
+        "blocked": False,
+        "closed": False,
+        "open_time": row["open_time"],
+        "close_time": row["close_time"],
+    }
+
+
+def build_day_intervals(rows, service_profiles):
+    """
+    Converts a day's confirmed reservations into
+    (start, end, resource_id, units, pool) tuples once per search.
+    """
+    intervals = []
+    for row in rows:
+        existing_time = normalize_time_str(row.get("time") or "")
+        if not existing_time:
+            continue
+        profile = build_service_slot_profile(service_profiles, row.get("service"))
+        start = time_to_minutes(existing_time)
+        end = start + profile["duration"] + int(row.get("extra_minutes") or 0)
+        intervals.append((start, end, row.get("resource_id"), profile["units"], profile["pool"]))
+    return intervals
+
+
+def find_next_available_slots(
+    business,
+    service_name,
+    start_date_iso=None,
+    days=NEXT_AVAILABLE_DEFAULT_DAYS,
+    limit=3,
+    resource_id=None,
+    step_min=15,
+):
+    """
+    Scans forward from start_date_iso and returns the earliest free slots
+    for a service, optionally restricted to one resource:
+      [{"date": "2026-04-21", "time": "16:00", "resource_id": 3, "resource_name": "Court 1"}, ...]
+    """
+    business_id = business["id"]
+    tz = pytz.timezone(business.get("timezone") or "Asia/Beirut")
+    now_dt = datetime.now(tz)
+    today = now_dt.date()
 
-            send_reservation_rescheduled(
+    try:
+        start_date = datetime.strptime(start_date_iso, "%Y-%m-%d").date() if start_date_iso else today
+    except Exception:
+        start_date = today
+    if start_date < today:
+        start_date = today
+
+    days = max(1, min(safe_int(days, NEXT_AVAILABLE_DEFAULT_DAYS), NEXT_AVAILABLE_MAX_DAYS))
+    limit = max(1, min(safe_int(limit, 3), NEXT_AVAILABLE_MAX_LIMIT))
+    end_date = start_date + timedelta(days=days - 1)
+
+    eligible_resources = get_active_resources_for_service(business_id, service_name)
+    if resource_id is not None:
+        eligible_resources = [r for r in eligible_resources if r["id"] == resource_id]
+        if not eligible_resources:
+            return []
+
+    window = load_availability_window(
+        business_id,
+        start_date.isoformat(),
+        end_date.isoformat(),
+        resource_ids=[r["id"] for r in eligible_resources],
+    )
+    service_profiles = get_service_profiles(business_id)
+    new_profile = build_service_slot_profile(service_profiles, service_name)
+    new_duration = new_profile["duration"]
+    new_units = new_profile["units"]
+    new_pool = new_profile["pool"]
+
+    # Without resources the business runs a single shared slot.
+    candidates = eligible_resources or [None]
+
+    results = []
+    current_date = start_date
+    while current_date <= end_date and len(results) < limit:
+        date_iso = current_date.isoformat()
+        intervals = build_day_intervals(
+            window["reservations_by_date"].get(date_iso, []),
+            service_profiles,
+        )
+        earliest_minutes = None
+        if current_date == today:
+            earliest_minutes = now_dt.hour * 60 + now_dt.minute
+
+        day_slots = {}
+        for resource in candidates:
+            rid = resource["id"] if resource else None
+            rules = resolve_window_day_rules(window, date_iso, rid)
+            if rules.get("closed"):
+                continue
+
+            open_minutes = time_to_minutes(rules["open_time"])
+            close_minutes = time_to_minutes(rules["close_time"])
+            capacity = slot_capacity(new_profile, resource)
+
+            current = open_minutes
+            while current + new_duration <= close_minutes:
+                if current in day_slots or (earliest_minutes is not None and current < earliest_minutes):
+                    current += step_min
+                    continue
+
+                new_end = current + new_duration
+                used_units = 0
+                for start, end, row_resource_id, units, pool in intervals:
+                    if resource is None:
+                        same_pool = True
+                    elif new_pool:
+                        same_pool = pool == new_pool
+                    else:
+                        same_pool = row_resource_id == rid
+                    if same_pool and current < end and start < new_end:
+                        used_units += units
+
+                free = used_units == 0 if resource is None else (used_units + new_units) <= capacity
+                if free:
+                    day_slots[current] = resource
+                current += step_min
+
+        for minutes in sorted(day_slots):
+            resource = day_slots[minutes]
+            results.append({
+                "date": date_iso,
+                "time": f"{minutes // 60:02d}:{minutes % 60:02d}",
+                "resource_id": resource["id"] if resource else None,
+                "resource_name": resource["name"] if resource else None,
+            })
+            if len(results) >= limit:
+                break
+
+        current_date += timedelta(days=1)
+
+    return results
+
+
+def format_next_available_lines(lang, slots):
+    lines = []
+    for slot in slots:
+        line = tr(lang, "next_available_line", date=slot["date"], time=slot["time"])
+        if slot.get("resource_name"):
+            line += tr(lang, "next_available_with", resource_name=slot["resource_name"])
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def next_available_reply_suffix(business, lang, service_name, after_date_iso, resource_id=None):
+    """
+    Text appended to dead-end slot_taken replies so the customer gets the
+    next open days instead of having to guess another date.
+    """
+    try:
+        start_date = datetime.strptime(after_date_iso, "%Y-%m-%d").date() + timedelta(days=1)
+        slots = find_next_available_slots(
+            business,
+            service_name,
+            start_date_iso=start_date.isoformat(),
+            limit=3,
+            resource_id=resource_id,
+        )
+    except Exception as e:
+        conversation_log.warning("next_available_reply_suffix warning: %s", e)
+        return ""
+
+    if not slots:
+        return ""
+
+    return "\n\n" + tr(lang, "next_available", slots=format_next_available_lines(lang, slots))
+
+
+# ------------------ CONVERSATION ENGINE ------------------
+
+# Intents that interrupt any step, in priority order.
+CONVERSATION_INTENTS = ("greeting", "booking", "cancel", "reschedule")
+
+conversation_intent_handlers = {}  # intent -> handler
+conversation_step_handlers = {}    # state["step"] -> handler
+
+
+def conversation_intent(name):
+    def register(handler):
+        conversation_intent_handlers[name] = handler
+        return handler
+    return register
+
+
+def conversation_step(name):
+    def register(handler):
+        conversation_step_handlers[name] = handler
+        return handler
+    return register
+
+
+def classify_message_intents(text):
+    """
+    Every intent check a handler may need, evaluated once per message.
+    """
+    return {
+        "greeting": is_greeting(text),
+        "booking": is_booking_intent(text),
+        "cancel": is_cancel_intent(text),
+        "reschedule": is_reschedule_intent(text),
+        "yes": is_yes_intent(text),
+        "no": is_no_intent(text),
+    }
+
+
+metrics.histogram("conversation_step_seconds", "Conversation handler latency by intent or step.")
+
+
+def record_step_latency(step, elapsed_ms):
+    metrics.observe("conversation_step_seconds", elapsed_ms / 1000.0, step=step)
+
+
+def get_step_latency_snapshot():
+    """
+    {step: {"count", "avg_ms", "buckets": {"<=10": n, ..., "+inf": n}}},
+    read from the conversation_step_seconds histogram.
+    """
+    bounds_ms = [round(b * 1000) for b in metrics.DEFAULT_BUCKETS]
+    labels = [f"<={b}" for b in bounds_ms] + ["+inf"]
+    snapshot = {}
+    for label_items, entry in metrics.histogram_snapshot("conversation_step_seconds").items():
+        step = dict(label_items).get("step")
+        snapshot[step] = {
+            "count": entry["count"],
+            "avg_ms": round(entry["sum"] * 1000 / entry["count"], 1) if entry["count"] else 0.0,
+            "buckets": dict(zip(labels, entry["counts"])),
+        }
+    return snapshot
+
+
+def process_incoming_message(business, phone, text):
+    t = (text or "").strip()
+
+    key = (business["id"], phone)
+    state = user_state.get(key)
+
+    lang = get_effective_language(business, t, state)
+    intents = classify_message_intents(t)
+
+    intent = next((name for name in CONVERSATION_INTENTS if intents[name]), None)
+    if intent:
+        step = f"intent:{intent}"
+        handler = conversation_intent_handlers[intent]
+    elif state and state.get("step") in conversation_step_handlers:
+        step = state["step"]
+        handler = conversation_step_handlers[step]
+        lang = state.get("lang", lang)
+    else:
+        # No command and no conversation in progress: nothing to answer.
+        return "ok", 200
+
+    started = time.perf_counter()
+    try:
+        return handler(business, phone, t, state, lang, intents)
+    finally:
+        record_step_latency(step, (time.perf_counter() - started) * 1000)
+
+
+# GREETING
+@conversation_intent("greeting")
+def handle_greeting_intent(business, phone, t, state, lang, intents):
+    send_reply(phone, business, lang, "greeting", purpose="greeting")
+    return "ok", 200
+
+
+# START BOOKING
+@conversation_intent("booking")
+def handle_booking_intent(business, phone, t, state, lang, intents):
+    key = (business["id"], phone)
+    user_state[key] = {"step": "awaiting_name", "lang": lang}
+    send_reply(phone, business, lang, "ask_name", purpose="ask_name")
+    return "ok", 200
+
+
+# CANCEL BOOKING
+@conversation_intent("cancel")
+def handle_cancel_intent(business, phone, t, state, lang, intents):
+    mark_past_reservations_done(business)
+    cancelled = cancel_confirmed_reservations(business["id"], phone=phone)
+
+    if not cancelled:
+        send_reply(phone, business, lang, "no_active_cancel", purpose="cancel")
+        return "ok", 200
+
+    send_reply(
+        phone,
+        business,
+        lang,
+        "cancel_done",
+        count=len(cancelled),
+        events=delete_reservation_events(business, cancelled),
+        purpose="cancel",
+    )
+    return "ok", 200
+
+
+# RESCHEDULE BOOKING
+@conversation_intent("reschedule")
+def handle_reschedule_intent(business, phone, t, state, lang, intents):
+    key = (business["id"], phone)
+    reservations = get_confirmed_reservations_for_phone(business, phone)
+
+    if not reservations:
+        send_reply(
+            phone,
+            business,
+            lang,
+            "no_active_reschedule",
+            purpose="reschedule",
+        )
+        return "ok", 200
+
+    reservation = reservations[0]
+    user_state[key] = {
+        "step": "awaiting_reschedule_date",
+        "lang": lang,
+        "reschedule_reservation_id": reservation["id"],
+        "name": reservation.get("customer_name", ""),
+        "service": reservation.get("service", ""),
+        "old_date": reservation.get("date", ""),
+        "old_time": reservation.get("time", ""),
+        "resource_id": reservation.get("resource_id"),
+        "resource_name": reservation.get("resource_name_snapshot"),
+    }
+
+    send_reply(
+        phone,
+        business,
+        lang,
+        "ask_reschedule_date",
+        service=reservation.get("service", ""),
+        date=reservation.get("date", ""),
+        time=reservation.get("time", ""),
+        purpose="ask_date",
+    )
+    return "ok", 200
+
+
+# STEP RESCHEDULE – DATE
+@conversation_step("awaiting_reschedule_date")
+def handle_awaiting_reschedule_date(business, phone, t, state, lang, intents):
+    if intents["booking"] or intents["cancel"] or intents["reschedule"]:
+        send_reply(phone, business, lang, "repeat_reschedule_date", purpose="ask_date")
+        return "ok", 200
+
+    try:
+        normalized_date = normalize_booking_date(t)
+    except Exception:
+        send_reply(phone, business, lang, "invalid_date", purpose="ask_date")
+        return "ok", 200
+
+    if is_past_date_only(business, normalized_date):
+        send_reply(phone, business, lang, "past_date", purpose="ask_date")
+        return "ok", 200
+
+    day_rules = get_day_rules(business["id"], normalized_date)
+    if day_rules.get("closed"):
+        send_reply(phone, business, lang, "closed_day", purpose="availability")
+        return "ok", 200
+
+    state["new_date"] = normalized_date
+    state["step"] = "awaiting_reschedule_time"
+
+    send_reply(phone, business, lang, "ask_reschedule_time", date=normalized_date, purpose="ask_time")
+    return "ok", 200
+
+
+# STEP RESCHEDULE – TIME
+@conversation_step("awaiting_reschedule_time")
+def handle_awaiting_reschedule_time(business, phone, t, state, lang, intents):
+    key = (business["id"], phone)
+    if intents["booking"] or intents["cancel"] or intents["reschedule"]:
+        send_reply(phone, business, lang, "repeat_reschedule_time", purpose="ask_time")
+        return "ok", 200
+
+    new_date = state.get("new_date")
+    day_rules = get_day_rules(business["id"], new_date)
+    if day_rules.get("closed"):
+        send_reply(phone, business, lang, "closed_day", purpose="availability")
+        return "ok", 200
+
+    normalized_time = normalize_time_str_with_hours(
+        t,
+        day_rules.get("open_time"),
+        day_rules.get("close_time"),
+    )
+    if not normalized_time:
+        send_reply(phone, business, lang, "invalid_time", purpose="ask_time")
+        return "ok", 200
+
+    if not is_time_within_business_hours(normalized_time, day_rules["open_time"], day_rules["close_time"]):
+        send_reply(phone, business, lang, "outside_hours", purpose="availability")
+        return "ok", 200
+
+    reservation_id = state.get("reschedule_reservation_id")
+    conn = get_db_connection()
+    c = conn.cursor()
+    c.execute(
+        """
+        SELECT id, customer_name, customer_phone, service, status, google_event_id,
+               resource_id, resource_name_snapshot, date, time
+        FROM reservations
+        WHERE id = %s AND business_id = %s
+        LIMIT 1
+        """,
+        (reservation_id, business["id"]),
+    )
+    reservation = c.fetchone()
+    conn.close()
+
+    if not reservation:
+        user_state.pop(key, None)
+        send_reply(phone, business, lang, "reschedule_missing", purpose="error")
+        return "ok", 200
+
+    reservations_rows = get_confirmed_reservations_for_date_excluding_fast(
+        business["id"],
+        new_date,
+        excluded_reservation_id=reservation_id,
+    )
+    valid_service, _ = validate_service_for_business(business["id"], reservation["service"])
+    if not valid_service:
+        send_reply(phone, business, lang, "save_error", purpose="error")
+        user_state.pop(key, None)
+        return "ok", 200
+
+    eligible_resources = get_active_resources_for_service(business["id"], valid_service)
+    service_duration_cache = build_service_duration_cache(
+        business["id"],
+        reservations_rows,
+        extra_service_names=[valid_service],
+    )
+
+    selected_resource_raw = str(state.get("resource_id")) if state.get("resource_id") else "auto"
+    chosen_resource = None
+
+    if eligible_resources:
+        chosen_resource, error_message = get_manual_reservation_resource_choice_fast(
+            business["id"],
+            valid_service,
+            selected_resource_raw,
+            new_date,
+            normalized_time,
+            eligible_resources,
+            reservations_rows,
+            service_duration_cache,
+        )
+        if error_message:
+            send_friendly_message(phone, business, lang, error_message, purpose="slot_taken")
+            return "ok", 200
+    else:
+        new_duration = int(service_duration_cache.get(valid_service, 45))
+        new_start = time_to_minutes(normalized_time)
+        for row in reservations_rows:
+            existing_time = normalize_time_str(row["time"])
+            if not existing_time:
+                continue
+            existing_start = time_to_minutes(existing_time)
+            existing_duration = int(service_duration_cache.get(row["service"], 45))
+            if ranges_overlap(new_start, new_duration, existing_start, existing_duration):
+                send_reply(phone, business, lang, "slot_taken", date=new_date, time=normalized_time, purpose="slot_taken")
+                return "ok", 200
+
+    try:
+        apply_reschedule_update(
+            business,
+            reservation,
+            new_date,
+            normalized_time,
+            chosen_resource,
+            notify=lambda: send_reservation_rescheduled(
                 phone,
                 reservation.get("customer_name", ""),
                 valid_service,
@@ -3980,508 +5012,409 @@ def process_incoming_message(business, phone, text):
                 old_resource_name=reservation.get("resource_name_snapshot"),
                 new_resource_name=chosen_resource["name"] if chosen_resource else None,
                 lang=lang,
-            )
-
-            user_state.pop(key, None)
-            return "ok", 200
-        except Exception as e:
-            print("customer reschedule error:", str(e), flush=True)
-            send_friendly_message(phone, business, lang, tr(lang, "save_error"), purpose="error")
-            return "ok", 200
-
-    # STEP X – ALTERNATIVE RESOURCE CONFIRMATION
-    if state and state.get("step") == "awaiting_alternative_confirmation":
-        lang = state.get("lang", lang)
-        offer = state.get("alternative_offer") or {}
-
-        offered_resource_name = offer.get("offered_resource_name", "")
-        preferred_resource_name = offer.get("preferred_resource_name", "")
-        nearby_slots = offer.get("nearby_slots") or []
-
-        user_text_lower = t.lower().strip()
-
-        accepted = (
-            is_yes_intent(t)
-            or (offered_resource_name and offered_resource_name.lower() in user_text_lower)
+            ),
         )
 
-        if accepted:
-            try:
-                reservation_id = save_reservation(
-                    business["id"],
-                    phone,
-                    state.get("name", ""),
-                    state.get("service", ""),
-                    state.get("date", ""),
-                    state.get("time", ""),
-                    resource_id=offer.get("offered_resource_id"),
-                    resource_name_snapshot=offered_resource_name,
-                )
-                print("Reservation saved with id:", reservation_id)
+        user_state.pop(key, None)
+        return "ok", 200
+    except Exception as e:
+        conversation_log.exception("customer reschedule error: %s", e)
+        send_reply(phone, business, lang, "save_error", purpose="error")
+        return "ok", 200
 
-                gcal_event = add_reservation_to_google_calendar(
-                    business["id"],
-                    state.get("name", ""),
-                    state.get("service", ""),
-                    state.get("date", ""),
-                    state.get("time", ""),
-                    resource_name=offered_resource_name,
-                    resource_id=offer.get("offered_resource_id"),
-                )
 
-                if gcal_event:
-                    event_id = gcal_event.get("id")
-                    print("Reservation added to Google Calendar:", event_id)
-                    if event_id:
-                        save_google_event_id(reservation_id, event_id)
-                else:
-                    print("Google Calendar event was not created")
+# STEP X – ALTERNATIVE RESOURCE CONFIRMATION
+@conversation_step("awaiting_alternative_confirmation")
+def handle_awaiting_alternative_confirmation(business, phone, t, state, lang, intents):
+    key = (business["id"], phone)
+    offer = state.get("alternative_offer") or {}
 
-                send_reservation_confirmation(
-                    phone,
-                    state.get("name", ""),
-                    state.get("service", ""),
-                    state.get("date", ""),
-                    state.get("time", ""),
-                    business,
-                    calendar_added=bool(gcal_event),
-                    lang=lang,
-                    resource_name=offered_resource_name,
-                )
+    offered_resource_name = offer.get("offered_resource_name", "")
+    preferred_resource_name = offer.get("preferred_resource_name", "")
+    nearby_slots = offer.get("nearby_slots") or []
 
-                user_state.pop(key, None)
-                return "ok", 200
+    user_text_lower = t.lower().strip()
 
-            except Exception as e:
-                print("STEP alternative confirmation save error:", str(e))
-                send_friendly_message(phone, business, lang, tr(lang, "save_error"), purpose="error")
-                return "ok", 200
+    accepted = (
+        intents["yes"]
+        or (offered_resource_name and offered_resource_name.lower() in user_text_lower)
+    )
 
-        if is_no_intent(t):
-            nearby_text = "\n".join([f"• {slot}" for slot in nearby_slots]) if nearby_slots else ""
-            send_friendly_message(
+    if accepted:
+        try:
+            reservation_id = save_reservation(
+                business["id"],
                 phone,
+                state.get("name", ""),
+                state.get("service", ""),
+                state.get("date", ""),
+                state.get("time", ""),
+                resource_id=offer.get("offered_resource_id"),
+                resource_name_snapshot=offered_resource_name,
+            )
+
+            sync_calendar_and_confirm(
                 business,
-                lang,
-                tr_switch_declined(lang, preferred_resource_name, nearby_text),
-                purpose="slot_taken",
+                reservation_id,
+                phone,
+                state.get("name", ""),
+                state.get("service", ""),
+                state.get("date", ""),
+                state.get("time", ""),
+                lang=lang,
+                resource_name=offered_resource_name,
+                resource_id=offer.get("offered_resource_id"),
             )
 
-            state["step"] = "awaiting_time"
-            state.pop("alternative_offer", None)
+            user_state.pop(key, None)
             return "ok", 200
 
-        # unclear answer → ask again
-        repeat_map = {
-            "en": f"Please reply yes to book with {offered_resource_name}, or no to see other times.",
-            "fr": f"Veuillez répondre oui pour réserver avec {offered_resource_name}, ou non pour voir d’autres heures.",
-            "ar": f"من فضلك جاوب نعم لنحجز مع {offered_resource_name}، أو لا لنشوف أوقات تانية.",
-        }
+        except Exception as e:
+            conversation_log.exception("alternative confirmation save error: %s", e)
+            send_reply(phone, business, lang, "save_error", purpose="error")
+            return "ok", 200
 
+    if intents["no"]:
+        nearby_text = "\n".join([f"• {slot}" for slot in nearby_slots]) if nearby_slots else ""
         send_friendly_message(
             phone,
             business,
             lang,
-            repeat_map.get(lang, repeat_map["en"]),
+            tr_switch_declined(lang, preferred_resource_name, nearby_text),
             purpose="slot_taken",
         )
+
+        state["step"] = "awaiting_time"
+        state.pop("alternative_offer", None)
         return "ok", 200
 
-    # STEP 1 – NAME
-    if state and state.get("step") == "awaiting_name":
-        lang = state.get("lang", lang)
+    # unclear answer → ask again
 
-        # User repeated a command instead of giving a name
-        if is_booking_intent(t) or is_cancel_intent(t):
-            send_friendly_message(phone, business, lang, tr(lang, "ask_name"), purpose="ask_name")
-            return "ok", 200
+    send_reply(
+        phone,
+        business,
+        lang,
+        "repeat_alternative_offer",
+        offered=offered_resource_name,
+        purpose="slot_taken",
+    )
+    return "ok", 200
 
-        state["name"] = t
 
-        if should_use_sport_first_flow(business["id"]):
-            sports = get_available_sports_for_business(business["id"])
-            state["step"] = "awaiting_sport"
-            sports_text = "\n".join([f"• {s.capitalize()}" for s in sports]) if sports else "• Padel\n• Basketball\n• Tennis"
-            prompt_map = {
-                "en": f"Thanks, {t}. Which sport would you like?\nAvailable sports:\n{sports_text}",
-                "fr": f"Merci, {t}. Quel sport souhaitez-vous ?\nSports disponibles :\n{sports_text}",
-                "ar": f"شكراً {t}. أي رياضة بدك؟\nالرياضات المتوفرة:\n{sports_text}",
-            }
-            send_friendly_message(phone, business, lang, prompt_map.get(lang, prompt_map["en"]), purpose="ask_sport")
-            return "ok", 200
+# STEP 1 – NAME
+@conversation_step("awaiting_name")
+def handle_awaiting_name(business, phone, t, state, lang, intents):
+    # User repeated a command instead of giving a name
+    if intents["booking"] or intents["cancel"]:
+        send_reply(phone, business, lang, "ask_name", purpose="ask_name")
+        return "ok", 200
 
-        state["step"] = "awaiting_service"
-        services_text = format_service_bullets_for_business(business["id"])
-        service_prompt_map = {
-            "en": f"Thanks, {t}. Which service would you like?\nAvailable services:\n{services_text}",
-            "fr": f"Merci, {t}. Quel service souhaitez-vous ?\nServices disponibles :\n{services_text}",
-            "ar": f"شكراً {t}. أي خدمة بدك؟\nالخدمات المتوفرة:\n{services_text}",
-        }
-        send_friendly_message(phone, business, lang, service_prompt_map.get(lang, service_prompt_map["en"]), purpose="ask_service")
+    state["name"] = t
+
+    if should_use_sport_first_flow(business["id"]):
+        sports = get_available_sports_for_business(business["id"])
+        state["step"] = "awaiting_sport"
+        sports_text = "\n".join([f"• {s.capitalize()}" for s in sports]) if sports else "• Padel\n• Basketball\n• Tennis"
+        send_reply(phone, business, lang, "ask_sport", name=t, sports=sports_text, purpose="ask_sport")
         return "ok", 200
 
-    if state and state.get("step") == "awaiting_sport":
-        lang = state.get("lang", lang)
-        text_lower = t.lower().strip()
-        available_sports = get_available_sports_for_business(business["id"])
-        direct_service, direct_sport, _available = resolve_valid_service_and_sport(business["id"], t, None)
-        if direct_service and direct_sport:
-            state["selected_sport"] = direct_sport
-            state["service"] = direct_service
-            state["step"] = "awaiting_date"
-            send_friendly_message(phone, business, lang, tr(lang, "ask_date", service=direct_service), purpose="ask_date")
-            return "ok", 200
-        chosen_sport = None
-        for sport in available_sports:
-            if sport.lower() == text_lower or sport.lower() in text_lower:
-                chosen_sport = sport
-                break
-        if not chosen_sport:
-            sports_text = "\n".join([f"• {s.capitalize()}" for s in available_sports]) if available_sports else "• Padel\n• Basketball\n• Tennis"
-            retry_map = {
-                "en": f"Please choose a sport first.\nAvailable sports:\n{sports_text}",
-                "fr": f"Veuillez d'abord choisir un sport.\nSports disponibles :\n{sports_text}",
-                "ar": f"من فضلك اختار الرياضة أولاً.\nالرياضات المتوفرة:\n{sports_text}",
-            }
-            send_friendly_message(phone, business, lang, retry_map.get(lang, retry_map["en"]), purpose="ask_sport")
-            return "ok", 200
-        state["selected_sport"] = chosen_sport
-        state["step"] = "awaiting_service"
-        services_text = format_service_bullets_for_sport(business["id"], chosen_sport)
-        prompt_map = {
-            "en": f"Great — {chosen_sport.capitalize()}. Which service would you like?\nAvailable services:\n{services_text}",
-            "fr": f"Parfait — {chosen_sport.capitalize()}. Quel service souhaitez-vous ?\nServices disponibles :\n{services_text}",
-            "ar": f"ممتاز — {chosen_sport.capitalize()}. أي خدمة بدك؟\nالخدمات المتوفرة:\n{services_text}",
-        }
-        send_friendly_message(phone, business, lang, prompt_map.get(lang, prompt_map["en"]), purpose="ask_service")
+    state["step"] = "awaiting_service"
+    services_text = format_service_bullets_for_business(business["id"])
+    send_reply(phone, business, lang, "ask_service_list", name=t, services=services_text, purpose="ask_service")
+    return "ok", 200
+
+
+@conversation_step("awaiting_sport")
+def handle_awaiting_sport(business, phone, t, state, lang, intents):
+    text_lower = t.lower().strip()
+    available_sports = get_available_sports_for_business(business["id"])
+    direct_service, direct_sport, _available = resolve_valid_service_and_sport(business["id"], t, None)
+    if direct_service and direct_sport:
+        state["selected_sport"] = direct_sport
+        state["service"] = direct_service
+        state["step"] = "awaiting_date"
+        send_reply(phone, business, lang, "ask_date", service=direct_service, purpose="ask_date")
+        return "ok", 200
+    chosen_sport = None
+    for sport in available_sports:
+        if sport.lower() == text_lower or sport.lower() in text_lower:
+            chosen_sport = sport
+            break
+    if not chosen_sport:
+        sports_text = "\n".join([f"• {s.capitalize()}" for s in available_sports]) if available_sports else "• Padel\n• Basketball\n• Tennis"
+        send_reply(phone, business, lang, "ask_sport_retry", sports=sports_text, purpose="ask_sport")
         return "ok", 200
+    state["selected_sport"] = chosen_sport
+    state["step"] = "awaiting_service"
+    services_text = format_service_bullets_for_sport(business["id"], chosen_sport)
+    send_reply(
+        phone,
+        business,
+        lang,
+        "ask_sport_service",
+        sport=chosen_sport.capitalize(),
+        services=services_text,
+        purpose="ask_service",
+    )
+    return "ok", 200
 
-    # STEP 2 – SERVICE (keywords + AI fallback
-    if state and state.get("step") == "awaiting_service":
-        lang = state.get("lang", lang)
-        lt2 = t.lower()
 
-        # User repeated a command instead of giving a service
-        if is_booking_intent(t) or is_cancel_intent(t):
-            send_friendly_message(
-                phone,
-                business,
-                lang,
-                tr(lang, "ask_service", name=state.get("name", "")),
-                purpose="ask_service",
-            )
-            return "ok", 200
+# STEP 2 – SERVICE (keywords + AI fallback
+@conversation_step("awaiting_service")
+def handle_awaiting_service(business, phone, t, state, lang, intents):
+    lt2 = t.lower()
+
+    # User repeated a command instead of giving a service
+    if intents["booking"] or intents["cancel"]:
+        send_reply(
+            phone,
+            business,
+            lang,
+            "ask_service",
+            name=state.get("name", ""),
+            purpose="ask_service",
+        )
+        return "ok", 200
 
-        matched = set()
-        for kw, canonical in SERVICE_KEYWORDS.items():
-            if kw.lower() in lt2:
-                matched.add(canonical)
+    matched = set()
+    for kw, canonical in SERVICE_KEYWORDS.items():
+        if kw.lower() in lt2:
+            matched.add(canonical)
 
-        ai_service = None
-        normalized = None
+    ai_service = None
+    normalized = None
 
-        if "Haircut" in matched and "Beard Trim" in matched:
-            normalized = "Haircut and Beard"
-        elif matched:
-            normalized = next(iter(matched))
-        else:
-            if OPENROUTER_API_KEY:
-                ai_service = ai_pick_service(business, t)
-                if ai_service:
-                    normalized = ai_service
+    if "Haircut" in matched and "Beard Trim" in matched:
+        normalized = "Haircut and Beard"
+    elif matched:
+        normalized = next(iter(matched))
+    else:
+        if OPENROUTER_API_KEY:
+            ai_service = ai_pick_service(business, t)
+            if ai_service:
+                normalized = ai_service
+
+    if normalized is None:
+        normalized = t
+
+    valid_service, available_services = validate_service_for_business(
+        business["id"], normalized
+    )
+    selected_sport = (state.get("selected_sport") or "").strip().lower()
+    if valid_service and selected_sport:
+        service_sport = (get_service_sport_category(business["id"], valid_service) or "").strip().lower()
+        if service_sport and service_sport != selected_sport:
+            valid_service = None
 
-        if normalized is None:
-            normalized = t
+    if not valid_service:
+        if selected_sport:
+            services_text = format_service_bullets_for_sport(business["id"], selected_sport)
+        elif available_services:
+            services_text = "\n".join([f"• {s}" for s in available_services])
+        else:
+            services_text = "• No services configured yet"
 
-        valid_service, available_services = validate_service_for_business(
-            business["id"], normalized
+        send_reply(
+            phone,
+            business,
+            lang,
+            "invalid_service",
+            services=services_text,
+            purpose="invalid_service",
         )
-        selected_sport = (state.get("selected_sport") or "").strip().lower()
-        if valid_service and selected_sport:
-            service_sport = (get_service_sport_category(business["id"], valid_service) or "").strip().lower()
-            if service_sport and service_sport != selected_sport:
-                valid_service = None
+        return "ok", 200
 
-        if not valid_service:
-            if selected_sport:
-                services_text = format_service_bullets_for_sport(business["id"], selected_sport)
-            elif available_services:
-                services_text = "\n".join([f"• {s}" for s in available_services])
-            else:
-                services_text = "• No services configured yet"
+    conversation_log.debug("service step: %r -> ai %r, normalized %r", t, ai_service, valid_service)
 
-            send_friendly_message(
-                phone,
-                business,
-                lang,
-                f"Sorry, we don’t offer that service.\nAvailable services:\n{services_text}",
-                purpose="invalid_service",
-            )
-            return "ok", 200
+    state["service"] = valid_service
+    state["step"] = "awaiting_date"
 
-        print("SERVICE STEP raw:", t, "ai:", ai_service, "normalized:", valid_service)
+    send_reply(
+        phone,
+        business,
+        lang,
+        "ask_date",
+        service=valid_service,
+        purpose="ask_date",
+    )
+    return "ok", 200
 
-        state["service"] = valid_service
-        state["step"] = "awaiting_date"
 
-        send_friendly_message(
+# STEP 3 – DATE
+@conversation_step("awaiting_date")
+def handle_awaiting_date(business, phone, t, state, lang, intents):
+    if intents["booking"] or intents["cancel"]:
+        send_reply(
             phone,
             business,
             lang,
-            tr(lang, "ask_date", service=valid_service),
+            "ask_date",
+            service=state.get("service", ""),
             purpose="ask_date",
         )
         return "ok", 200
 
-    # STEP 3 – DATE
-    if state and state.get("step") == "awaiting_date":
-        lang = state.get("lang", lang)
+    corrected_service, _sport, _available = resolve_valid_service_and_sport(business["id"], t, state.get("selected_sport"))
+    if corrected_service:
+        state["service"] = corrected_service
+        send_reply(phone, business, lang, "ask_date", service=corrected_service, purpose="ask_date")
+        return "ok", 200
 
-        if is_booking_intent(t) or is_cancel_intent(t):
-            send_friendly_message(
-                phone,
-                business,
-                lang,
-                tr(lang, "ask_date", service=state.get("service", "")),
-                purpose="ask_date",
-            )
-            return "ok", 200
+    try:
+        normalized_date = normalize_booking_date(t)
+    except Exception:
+        send_reply(phone, business, lang, "invalid_date", purpose="ask_date")
+        return "ok", 200
 
-        corrected_service, _sport, _available = resolve_valid_service_and_sport(business["id"], t, state.get("selected_sport"))
-        if corrected_service:
-            state["service"] = corrected_service
-            send_friendly_message(phone, business, lang, tr(lang, "ask_date", service=corrected_service), purpose="ask_date")
-            return "ok", 200
+    if is_past_date_only(business, normalized_date):
+        send_reply(phone, business, lang, "past_date", purpose="ask_date")
+        return "ok", 200
 
-        try:
-            normalized_date = normalize_booking_date(t)
-        except Exception:
-            send_friendly_message(phone, business, lang, tr(lang, "invalid_date"), purpose="ask_date")
-            return "ok", 200
+    day_rules = get_day_rules(business["id"], normalized_date)
+    if day_rules.get("closed"):
+        send_reply(phone, business, lang, "closed_day", purpose="availability")
+        return "ok", 200
 
-        if is_past_date_only(business, normalized_date):
-            send_friendly_message(phone, business, lang, tr(lang, "past_date"), purpose="ask_date")
-            return "ok", 200
+    state["date"] = normalized_date
+    state["step"] = "awaiting_time"
 
-        day_rules = get_day_rules(business["id"], normalized_date)
-        if day_rules.get("closed"):
-            send_friendly_message(phone, business, lang, tr(lang, "closed_day"), purpose="availability")
-            return "ok", 200
+    send_reply(phone, business, lang, "ask_time", purpose="ask_time")
+    return "ok", 200
 
-        state["date"] = normalized_date
-        state["step"] = "awaiting_time"
 
-        send_friendly_message(phone, business, lang, tr(lang, "ask_time"), purpose="ask_time")
+# STEP 4 – TIME
+@conversation_step("awaiting_time")
+def handle_awaiting_time(business, phone, t, state, lang, intents):
+    key = (business["id"], phone)
+    if intents["booking"] or intents["cancel"]:
+        send_reply(phone, business, lang, "ask_time", purpose="ask_time")
         return "ok", 200
 
-    # STEP 4 – TIME
-    if state and state.get("step") == "awaiting_time":
-        lang = state.get("lang", lang)
-
-        if is_booking_intent(t) or is_cancel_intent(t):
-            send_friendly_message(phone, business, lang, tr(lang, "ask_time"), purpose="ask_time")
-            return "ok", 200
+    day_rules = get_day_rules(business["id"], state["date"])
+    if day_rules.get("closed"):
+        send_reply(phone, business, lang, "closed_day", purpose="availability")
+        return "ok", 200
 
-        day_rules = get_day_rules(business["id"], state["date"])
-        if day_rules.get("closed"):
-            send_friendly_message(phone, business, lang, tr(lang, "closed_day"), purpose="availability")
-            return "ok", 200
+    time_ = normalize_time_str_with_hours(
+        t,
+        day_rules.get("open_time"),
+        day_rules.get("close_time"),
+    )
 
-        time_ = normalize_time_str_with_hours(
-            t,
-            day_rules.get("open_time"),
-            day_rules.get("close_time"),
-        )
+    if not time_:
+        send_reply(phone, business, lang, "invalid_time", purpose="ask_time")
+        return "ok", 200
 
-        if not time_:
-            send_friendly_message(phone, business, lang, tr(lang, "invalid_time"), purpose="ask_time")
-            return "ok", 200
+    state["time"] = time_
 
-        state["time"] = time_
+    if not is_time_within_business_hours(time_, day_rules["open_time"], day_rules["close_time"]):
+        send_reply(phone, business, lang, "outside_hours", purpose="availability")
+        return "ok", 200
 
-        if not is_time_within_business_hours(time_, day_rules["open_time"], day_rules["close_time"]):
-            send_friendly_message(phone, business, lang, tr(lang, "outside_hours"), purpose="availability")
-            return "ok", 200
+    eligible_resources = get_active_resources_for_service(business["id"], state["service"])
 
-        eligible_resources = get_active_resources_for_service(business["id"], state["service"])
+    # --------------------------------------------------
+    # RESOURCE-BASED MODE
+    # --------------------------------------------------
+    if eligible_resources:
+        requested_resource = extract_requested_resource_from_text(t, eligible_resources)
+        preferred_resource = requested_resource or eligible_resources[0]
 
-        # --------------------------------------------------
-        # RESOURCE-BASED MODE
-        # --------------------------------------------------
-        if eligible_resources:
-            requested_resource = extract_requested_resource_from_text(t, eligible_resources)
-            preferred_resource = requested_resource or eligible_resources[0]
+        preferred_rules = get_resource_day_rules(
+            business["id"],
+            preferred_resource["id"],
+            state["date"],
+        )
 
-            preferred_rules = get_resource_day_rules(
+        preferred_available = (
+            not preferred_rules.get("closed")
+            and is_time_within_business_hours(
+                time_,
+                preferred_rules["open_time"],
+                preferred_rules["close_time"],
+            )
+            and not is_resource_slot_full(
                 business["id"],
                 preferred_resource["id"],
                 state["date"],
+                time_,
+                state["service"],
             )
+        )
 
-            preferred_available = (
-                not preferred_rules.get("closed")
-                and is_time_within_business_hours(
-                    time_,
-                    preferred_rules["open_time"],
-                    preferred_rules["close_time"],
-                )
-                and not is_resource_slot_full(
-                    business["id"],
-                    preferred_resource["id"],
-                    state["date"],
-                    time_,
-                    state["service"],
-                )
-            )
-
-            if preferred_available:
-                chosen_resource = preferred_resource
-
-            else:
-                same_time_options = [
-                    r for r in get_available_resources_for_slot(
-                        business["id"],
-                        state["date"],
-                        time_,
-                        state["service"],
-                    )
-                    if r["id"] != preferred_resource["id"]
-                ]
+        if preferred_available:
+            chosen_resource = preferred_resource
 
-                nearby_with_preferred = suggest_slots_for_resource(
+        else:
+            same_time_options = [
+                r for r in get_available_resources_for_slot(
                     business["id"],
-                    preferred_resource["id"],
                     state["date"],
                     time_,
                     state["service"],
-                    max_suggestions=3,
-                )
-
-                # If another resource is available at the same time,
-                # ask for confirmation instead of silently switching.
-                if same_time_options:
-                    offered_resource = same_time_options[0]
-                    nearby_text = "\n".join([f"• {slot}" for slot in nearby_with_preferred]) if nearby_with_preferred else ""
-
-                    state["step"] = "awaiting_alternative_confirmation"
-                    state["alternative_offer"] = {
-                        "preferred_resource_name": preferred_resource["name"],
-                        "offered_resource_id": offered_resource["id"],
-                        "offered_resource_name": offered_resource["name"],
-                        "nearby_slots": nearby_with_preferred,
-                    }
-
-                    send_friendly_message(
-                        phone,
-                        business,
-                        lang,
-                        tr_switch_offer(
-                            lang,
-                            preferred_resource["name"],
-                            offered_resource["name"],
-                            state["date"],
-                            time_,
-                            nearby_text=nearby_text,
-                        ),
-                        purpose="slot_taken",
-                    )
-                    return "ok", 200
-
-                # Otherwise only show nearby times with the preferred resource
-                nearby_text = "\n".join([f"• {slot}" for slot in nearby_with_preferred]) if nearby_with_preferred else ""
-
-                send_friendly_message(
-                    phone,
-                    business,
-                    lang,
-                    tr_switch_declined(lang, preferred_resource["name"], nearby_text),
-                    purpose="slot_taken",
-                )
-                return "ok", 200
-
-            try:
-                reservation_id = save_reservation(
-                    business["id"],
-                    phone,
-                    state.get("name", ""),
-                    state.get("service", ""),
-                    state.get("date", ""),
-                    state.get("time", ""),
-                    resource_id=chosen_resource["id"],
-                    resource_name_snapshot=chosen_resource["name"],
-                )
-                print("Reservation saved with id:", reservation_id)
-
-                gcal_event = add_reservation_to_google_calendar(
-                    business["id"],
-                    state.get("name", ""),
-                    state.get("service", ""),
-                    state.get("date", ""),
-                    state.get("time", ""),
-                    resource_name=chosen_resource["name"],
-                    resource_id=chosen_resource["id"],
-                )
-
-                if gcal_event:
-                    event_id = gcal_event.get("id")
-                    print("Reservation added to Google Calendar:", event_id)
-                    if event_id:
-                        save_google_event_id(reservation_id, event_id)
-                else:
-                    print("Google Calendar event was not created")
-
-                send_reservation_confirmation(
-                    phone,
-                    state.get("name", ""),
-                    state.get("service", ""),
-                    state.get("date", ""),
-                    state.get("time", ""),
-                    business,
-                    calendar_added=bool(gcal_event),
-                    lang=lang,
-                    resource_name=chosen_resource["name"],
                 )
+                if r["id"] != preferred_resource["id"]
+            ]
 
-                user_state.pop(key, None)
-                return "ok", 200
-
-            except Exception as e:
-                print("STEP 4 resource save error:", str(e))
-                send_friendly_message(phone, business, lang, tr(lang, "save_error"), purpose="error")
-                return "ok", 200
-
-        # --------------------------------------------------
-        # FALLBACK: old single-slot mode
-        # --------------------------------------------------
-        if is_slot_taken(business["id"], state["date"], time_, state["service"]):
-            suggestions = suggest_slots(
+            nearby_with_preferred = suggest_slots_for_resource(
                 business["id"],
+                preferred_resource["id"],
                 state["date"],
                 time_,
                 state["service"],
-                open_start=day_rules["open_time"],
-                open_end=day_rules["close_time"],
-                step_min=15,
                 max_suggestions=3,
             )
 
-            if suggestions:
-                suggestions_text = "\n".join([f"• {s}" for s in suggestions])
+            # If another resource is available at the same time,
+            # ask for confirmation instead of silently switching.
+            if same_time_options:
+                offered_resource = same_time_options[0]
+                nearby_text = "\n".join([f"• {slot}" for slot in nearby_with_preferred]) if nearby_with_preferred else ""
+
+                state["step"] = "awaiting_alternative_confirmation"
+                state["alternative_offer"] = {
+                    "preferred_resource_name": preferred_resource["name"],
+                    "offered_resource_id": offered_resource["id"],
+                    "offered_resource_name": offered_resource["name"],
+                    "nearby_slots": nearby_with_preferred,
+                }
+
                 send_friendly_message(
                     phone,
                     business,
                     lang,
-                    f"{tr(lang, 'slot_taken', date=state['date'], time=time_)}\n{suggestions_text}",
+                    tr_switch_offer(
+                        lang,
+                        preferred_resource["name"],
+                        offered_resource["name"],
+                        state["date"],
+                        time_,
+                        nearby_text=nearby_text,
+                    ),
                     purpose="slot_taken",
                 )
-            else:
-                send_friendly_message(
-                    phone,
+                return "ok", 200
+
+            # Otherwise only show nearby times with the preferred resource
+            nearby_text = "\n".join([f"• {slot}" for slot in nearby_with_preferred]) if nearby_with_preferred else ""
+
+            reply = tr_switch_declined(lang, preferred_resource["name"], nearby_text)
+            if not nearby_with_preferred:
+                reply += next_available_reply_suffix(
                     business,
                     lang,
-                    tr(lang, "slot_taken", date=state["date"], time=time_),
-                    purpose="slot_taken",
+                    state["service"],
+                    state["date"],
+                    resource_id=requested_resource["id"] if requested_resource else None,
                 )
+
+            send_friendly_message(
+                phone,
+                business,
+                lang,
+                reply,
+                purpose="slot_taken",
+            )
             return "ok", 200
 
         try:
@@ -4492,44 +5425,96 @@ def process_incoming_message(business, phone, text):
                 state.get("service", ""),
                 state.get("date", ""),
                 state.get("time", ""),
+                resource_id=chosen_resource["id"],
+                resource_name_snapshot=chosen_resource["name"],
             )
-            print("Reservation saved with id:", reservation_id)
-
-            gcal_event = add_reservation_to_google_calendar(
-                business["id"],
-                state.get("name", ""),
-                state.get("service", ""),
-                state.get("date", ""),
-                state.get("time", ""),
-            )
-
-            if gcal_event:
-                event_id = gcal_event.get("id")
-                print("Reservation added to Google Calendar:", event_id)
-                if event_id:
-                    save_google_event_id(reservation_id, event_id)
-            else:
-                print("Google Calendar event was not created")
 
-            send_reservation_confirmation(
+            sync_calendar_and_confirm(
+                business,
+                reservation_id,
                 phone,
                 state.get("name", ""),
                 state.get("service", ""),
                 state.get("date", ""),
                 state.get("time", ""),
-                business,
-                calendar_added=bool(gcal_event),
                 lang=lang,
+                resource_name=chosen_resource["name"],
+                resource_id=chosen_resource["id"],
             )
 
             user_state.pop(key, None)
             return "ok", 200
 
         except Exception as e:
-            print("STEP 4 save error:", str(e))
-            send_friendly_message(phone, business, lang, tr(lang, "save_error"), purpose="error")
+            conversation_log.exception("resource step save error: %s", e)
+            send_reply(phone, business, lang, "save_error", purpose="error")
             return "ok", 200
 
+    # --------------------------------------------------
+    # FALLBACK: old single-slot mode
+    # --------------------------------------------------
+    if is_slot_taken(business["id"], state["date"], time_, state["service"]):
+        suggestions = suggest_slots(
+            business["id"],
+            state["date"],
+            time_,
+            state["service"],
+            open_start=day_rules["open_time"],
+            open_end=day_rules["close_time"],
+            step_min=15,
+            max_suggestions=3,
+        )
+
+        if suggestions:
+            suggestions_text = "\n".join([f"• {s}" for s in suggestions])
+            send_friendly_message(
+                phone,
+                business,
+                lang,
+                f"{tr(lang, 'slot_taken', date=state['date'], time=time_)}\n{suggestions_text}",
+                purpose="slot_taken",
+            )
+        else:
+            send_friendly_message(
+                phone,
+                business,
+                lang,
+                tr(lang, "slot_taken", date=state["date"], time=time_)
+                + next_available_reply_suffix(business, lang, state["service"], state["date"]),
+                purpose="slot_taken",
+            )
+        return "ok", 200
+
+    try:
+        reservation_id = save_reservation(
+            business["id"],
+            phone,
+            state.get("name", ""),
+            state.get("service", ""),
+            state.get("date", ""),
+            state.get("time", ""),
+        )
+
+        sync_calendar_and_confirm(
+            business,
+            reservation_id,
+            phone,
+            state.get("name", ""),
+            state.get("service", ""),
+            state.get("date", ""),
+            state.get("time", ""),
+            lang=lang,
+        )
+
+        user_state.pop(key, None)
+        return "ok", 200
+
+    except Exception as e:
+        conversation_log.exception("time step save error: %s", e)
+        send_reply(phone, business, lang, "save_error", purpose="error")
+        return "ok", 200
+
+
 def calculate_dashboard_metrics(business, reservations):
     tz = pytz.timezone(business.get("timezone") or "Asia/Beirut")
     today_iso = datetime.now(tz).date().isoformat()
@@ -4658,6 +5643,7 @@ def ensure_default_resource_hours(resource_id, business_id):
     conn.close()
 
 
+@turn_memoized
 def get_resource_by_id(resource_id, business_id):
     conn = get_db_connection()
     c = conn.cursor()
@@ -4744,6 +5730,10 @@ def require_support():
 def home():
     return "OK", 200
 
+metrics.counter("webhook_duplicates_total", "Webhook deliveries skipped as duplicates of a known message id.")
+metrics.counter("availability_requests_total", "/api/availability responses, 304 (not_modified) or rendered.")
+
+
 @app.route("/webhook", methods=["GET", "POST"])
 def webhook():
     if request.method == "GET":
@@ -4751,30 +5741,28 @@ def webhook():
         token = request.args.get("hub.verify_token")
         challenge = request.args.get("hub.challenge")
         if mode == "subscribe" and token == VERIFY_TOKEN:
-            print("WEBHOOK VERIFIED (Meta)")
+            webhook_log.info("webhook verified (Meta)")
             return challenge, 200
         return "Forbidden", 403
 
-    raw = request.get_data(as_text=True)
-    print("RAW META:", raw, flush=True)
+    if payload_log.isEnabledFor(logging.DEBUG):
+        payload_log.debug("payload: %s", request.get_data(as_text=True))
 
     data = request.get_json(silent=True)
-    print("INCOMING META:", data, flush=True)
-    sys.stdout.flush()
 
     try:
         entry = data["entry"][0]
         change = entry["changes"][0]
         value = change["value"]
     except Exception as e:
-        print("Meta webhook parse error:", e)
+        webhook_log.warning("Meta webhook parse error: %s", e)
         return "ok", 200
 
     # Ensure production DB has the multi-business columns before lookup.
     try:
         ensure_multi_business_whatsapp_columns()
     except Exception as e:
-        print("ensure_multi_business_whatsapp_columns warning:", e, flush=True)
+        webhook_log.warning("ensure_multi_business_whatsapp_columns warning: %s", e)
 
     if "statuses" in value:
         return "ok", 200
@@ -4789,11 +5777,13 @@ def webhook():
     message_id = message.get("id")
 
     if is_message_already_done(message_id):
-        print("Duplicate message already completed:", message_id, flush=True)
+        metrics.inc("webhook_duplicates_total", state="done")
+        webhook_log.info("duplicate message already completed: %s", message_id)
         return "ok", 200
 
     if is_message_currently_processing(message_id):
-        print("Duplicate message still processing:", message_id, flush=True)
+        metrics.inc("webhook_duplicates_total", state="processing")
+        webhook_log.info("duplicate message still processing: %s", message_id)
         return "ok", 200
 
     mark_message_processing(message_id)
@@ -4801,30 +5791,76 @@ def webhook():
     phone = message.get("from")
     text = message.get("text", {}).get("body", "").strip()
     phone_number_id = (value.get("metadata", {}) or {}).get("phone_number_id", "").strip()
-    print("phone:", phone, "text:", text, "phone_number_id:", phone_number_id, flush=True)
+    webhook_log.info("message %s from %s to phone_number_id %s", message_id, phone, phone_number_id)
+    webhook_log.debug("message %s text: %r", message_id, text)
 
     if not phone_number_id:
         clear_message_processing(message_id)
-        print("Webhook payload has no phone_number_id; cannot route business.", flush=True)
+        webhook_log.warning("webhook payload has no phone_number_id; cannot route business")
         return "ok", 200
 
     business = get_business_by_phone_number_id(phone_number_id)
-    print("business lookup result:", dict(business) if business else None, flush=True)
     if not business:
         clear_message_processing(message_id)
-        print("No business configured for phone_number_id", phone_number_id, flush=True)
+        webhook_log.warning("no business configured for phone_number_id %s", phone_number_id)
         return "ok", 200
+    webhook_log.debug("routing message %s to business %s", message_id, business["id"])
+    sql_profiler.annotate(message_id=message_id, business_id=business["id"])
+
+    if async_pipeline.enabled():
+        # Acknowledge now; the conversation turn runs on the pipeline, in
+        # order with the sender's other messages.
+        key = (business["id"], phone)
+        queued = async_pipeline.submit(
+            key, process_webhook_message, business, phone, text, message_id, True, sql_profiler.is_active()
+        )
+        if queued:
+            return "ok", 200
+        # Refused only when nothing of this conversation is in the
+        # pipeline, so running it here cannot overtake an earlier turn.
+        webhook_log.warning("async pipeline full; processing message %s inline", message_id)
+
+    return process_webhook_message(business, phone, text, message_id)
+
 
-    print("Calling process_incoming_message...", flush=True)
+WEBHOOK_TURN_ENDPOINT = "webhook_async_turn"
 
+
+def process_webhook_message(business, phone, text, message_id, queued=False, profile=False):
+    """
+    One conversation turn for a de-duplicated webhook message, inline or on
+    the async pipeline. Marks the message done, or clears it so a Meta
+    retry is processed again.
+
+    queued: running on the async pipeline, outside the webhook request, so
+    the turn keeps its own DB accounting and SQL profile (when SQL_PROFILE
+    is on or profile says the webhook request was profiled).
+    """
+    if queued:
+        metrics.begin_request_db()
+        if profile or sql_profiler.ALWAYS_ON:
+            sql_profiler.start(
+                WEBHOOK_TURN_ENDPOINT, path="/webhook", method="POST",
+                message_id=message_id, business_id=business["id"],
+            )
+    memo_token = begin_turn_memo()
     try:
         result = process_incoming_message(business, phone, text)
         mark_message_done(message_id)
         return result
     except Exception as e:
         clear_message_processing(message_id)
-        print("process_incoming_message error:", str(e), flush=True)
+        webhook_log.exception("process_incoming_message error: %s", e)
         return "ok", 200
+    finally:
+        lookups, saved = end_turn_memo(memo_token)
+        if saved:
+            webhook_log.debug("turn memo: %s/%s lookups served from memory", saved, lookups)
+        if queued:
+            finish_sql_profile()
+            queries, db_seconds = metrics.end_request_db()
+            metrics.observe("db_queries_per_request", queries, endpoint=WEBHOOK_TURN_ENDPOINT)
+            metrics.observe("db_seconds_per_request", db_seconds, endpoint=WEBHOOK_TURN_ENDPOINT)
 
 @app.route("/privacy")
 def privacy_policy():
@@ -5031,6 +6067,62 @@ def admin_businesses():
 # ------------------ ADMIN SERVICES ------------------
 
 
+@app.route("/admin/conversation-latency")
+def admin_conversation_latency():
+    if not require_support():
+        return redirect("/login")
+    return jsonify({
+        "ok": True,
+        "buckets_ms": [round(b * 1000) for b in metrics.DEFAULT_BUCKETS],
+        "steps": get_step_latency_snapshot(),
+        "turn_memo": get_turn_memo_stats(),
+    })
+
+
+@app.route("/admin/sql-profile")
+def admin_sql_profile():
+    """
+    Recent SQL profiles (newest first), or one by ?id= as returned in the
+    X-SQL-Profile-Id header of the profiled response.
+    """
+    if not require_support():
+        return redirect("/login")
+    report_id = request.args.get("id", type=int)
+    if report_id is not None:
+        report = sql_profiler.get_report(report_id)
+        if report is None:
+            return jsonify({"ok": False, "error": "Unknown profile id"}), 404
+        return jsonify({"ok": True, "report": report})
+
+    reports = sql_profiler.recent_reports()
+    if request.args.get("n_plus_one"):
+        reports = [r for r in reports if r["n_plus_one"]]
+    return jsonify({
+        "ok": True,
+        "n_plus_one_threshold": sql_profiler.N_PLUS_ONE_THRESHOLD,
+        "reports": [
+            {k: v for k, v in r.items() if k != "statements"}
+            for r in reports
+        ],
+    })
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """
+    Prometheus scrape target. With METRICS_TOKEN set the scraper sends it as
+    a bearer token; without it only support users can read it. Values are
+    those of the worker process that answers, see metrics.py.
+    """
+    metrics_token = os.getenv("METRICS_TOKEN")
+    if metrics_token:
+        if not secrets.compare_digest(request.headers.get("Authorization", ""), f"Bearer {metrics_token}"):
+            abort(401)
+    elif not require_support():
+        abort(403)
+    return app.response_class(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
 @app.route("/admin/<int:business_id>/services", methods=["GET", "POST"])
 def admin_services(business_id):
     if not require_support():
@@ -5172,7 +6264,7 @@ def register():
 
     except Exception as e:
         conn.rollback()
-        print("register error:", str(e))
+        onboarding_log.exception("register error: %s", e)
         return render_template("register.html", error="Something went wrong while creating the account.")
     finally:
         conn.close()
@@ -5219,48 +6311,104 @@ def logout():
 
 
 
-@app.route("/shop-mode")
-def shop_mode():
-    if "business_id" not in session:
-        return redirect("/login")
+SHOP_MODE_STREAM_HEARTBEAT_SEC = 15
+SHOP_MODE_STREAM_MAX_SEC = 30 * 60
+# Every open stream holds a server thread. Above this many per process a
+# screen is told to reconnect later and polls /shop-mode/today meanwhile,
+# so streams cannot take the threads /webhook needs. 0 = no limit (the
+# dev server starts a thread per request); gunicorn.conf.py sets it.
+SHOP_MODE_STREAM_MAX_OPEN = int(os.getenv("SHOP_MODE_STREAM_MAX_OPEN") or 0)
+SHOP_MODE_STREAM_BUSY_RETRY_MS = 60000
 
-    business_id = session["business_id"]
-    business = get_business_by_id(business_id)
-    if not business:
-        return redirect("/login")
+metrics.counter("shop_mode_streams_rejected_total", "Shop mode streams turned away because all stream slots were taken.")
 
-    tz = pytz.timezone(business.get("timezone") or "Asia/Beirut")
-    now_dt = datetime.now(tz)
-    today_iso = now_dt.date().isoformat()
 
-    try:
-        mark_past_reservations_done(business)
-    except Exception as e:
-        print("shop_mode mark_past_reservations_done warning:", e, flush=True)
+def load_shop_mode_rows(business, date_iso, now_hhmm, reservation_ids=None):
+    """
+    Confirmed reservations of the day that have not ended yet, with their
+    end time. Pass reservation_ids to load only the rows an event touched.
+    """
+    business_id = business["id"]
 
     conn = get_db_connection()
     c = conn.cursor()
-    c.execute(
-        """
+    sql = """
         SELECT id, customer_name, customer_phone, service, date, time,
-               status, resource_name_snapshot
+               status, resource_name_snapshot, COALESCE(extra_minutes, 0) AS extra_minutes
         FROM reservations
         WHERE business_id = %s
           AND date = %s
           AND status = 'CONFIRMED'
-        ORDER BY time ASC, id ASC
-        """,
-        (business_id, today_iso),
-    )
+    """
+    params = [business_id, date_iso]
+    if reservation_ids is not None:
+        sql += " AND id = ANY(%s)"
+        params.append(list(reservation_ids))
+    sql += " ORDER BY time ASC, id ASC"
+    c.execute(sql, params)
     reservations = c.fetchall()
     conn.close()
 
-    next_reservation = None
+    if not reservations:
+        return []
+
+    service_profiles = get_service_profiles(business_id)
+    now_min = time_to_minutes(now_hhmm)
+
+    rows = []
+    for r in reservations:
+        time_str = normalize_time_str(r["time"]) or r["time"]
+        try:
+            start_min = time_to_minutes(time_str)
+        except (TypeError, ValueError):
+            continue
+
+        profile = build_service_slot_profile(service_profiles, r["service"])
+        end_min = start_min + profile["duration"] + int(r["extra_minutes"] or 0)
+        if end_min <= now_min:
+            continue
+
+        rows.append({
+            "id": r["id"],
+            "time": time_str,
+            "end_time": f"{(end_min // 60) % 24:02d}:{end_min % 60:02d}",
+            "end_min": end_min,
+            "customer_name": r["customer_name"],
+            "customer_phone": r["customer_phone"],
+            "service": r["service"],
+            "resource_name_snapshot": r["resource_name_snapshot"],
+        })
+    return rows
+
+
+def shop_mode_business_or_none():
+    if "business_id" not in session:
+        return None
+    return get_business_by_id(session["business_id"])
+
+
+@app.route("/shop-mode")
+def shop_mode():
+    business = shop_mode_business_or_none()
+    if not business:
+        return redirect("/login")
+
+    tz = pytz.timezone(business.get("timezone") or "Asia/Beirut")
+    now_dt = datetime.now(tz)
+    today_iso = now_dt.date().isoformat()
+
+    try:
+        mark_past_reservations_done(business)
+    except Exception as e:
+        dashboard_log.warning("shop_mode mark_past_reservations_done failed: %s", e)
+
     now_hhmm = now_dt.strftime("%H:%M")
+    reservations = load_shop_mode_rows(business, today_iso, now_hhmm)
+
+    next_reservation = None
 
     enriched = []
-    for r in reservations:
-        item = dict(r)
+    for item in reservations:
         item["is_next"] = False
         if next_reservation is None and item["time"] >= now_hhmm:
             item["is_next"] = True
@@ -5278,10 +6426,152 @@ def shop_mode():
         reservations=enriched,
         next_reservation=next_reservation,
         stats=stats,
-        now_display=now_dt.strftime("%H:%M"),
+        now_display=now_hhmm,
         today_display=now_dt.strftime("%A %d %B %Y"),
+        today_iso=today_iso,
     )
 
+
+@app.route("/shop-mode/today")
+def shop_mode_today():
+    business = shop_mode_business_or_none()
+    if not business:
+        return jsonify({"ok": False, "error": "not_logged_in"}), 401
+
+    now_dt = datetime.now(pytz.timezone(business.get("timezone") or "Asia/Beirut"))
+    now_hhmm = now_dt.strftime("%H:%M")
+    today_iso = now_dt.date().isoformat()
+
+    return jsonify({
+        "ok": True,
+        "date": today_iso,
+        "now": now_hhmm,
+        "reservations": load_shop_mode_rows(business, today_iso, now_hhmm),
+    })
+
+
+def format_sse(event_type, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append("data: " + json.dumps(data, default=str))
+    return "\n".join(lines) + "\n\n"
+
+
+@app.route("/shop-mode/stream")
+def shop_mode_stream():
+    """
+    Server-Sent Events feed for shop mode. Pushes only the reservations that
+    changed instead of having every screen reload the whole page.
+
+    Events raised in this process arrive through event_bus; changes made by
+    other workers are caught on each heartbeat by comparing today's
+    availability version and answered with a "resync".
+    """
+    business = shop_mode_business_or_none()
+    if not business:
+        return jsonify({"ok": False, "error": "not_logged_in"}), 401
+
+    business_id = business["id"]
+    tz = pytz.timezone(business.get("timezone") or "Asia/Beirut")
+    subscription = event_bus.subscribe(business_id, max_total=SHOP_MODE_STREAM_MAX_OPEN)
+    if subscription is None:
+        # A 200 that ends right away makes EventSource reconnect after
+        # `retry`; an error status would stop it for good.
+        metrics.inc("shop_mode_streams_rejected_total")
+        busy = f"retry: {SHOP_MODE_STREAM_BUSY_RETRY_MS}\n\n" + format_sse("busy", {"retry_ms": SHOP_MODE_STREAM_BUSY_RETRY_MS})
+        response = Response(busy, mimetype="text/event-stream")
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    def today_version(today_iso):
+        try:
+            return get_availability_versions(business_id, today_iso)[0]
+        except Exception as e:
+            dashboard_log.warning("shop_mode_stream version read failed for business %s: %s", business_id, e)
+            return None
+
+    def stream():
+        opened_at = time.time()
+        today_iso = datetime.now(tz).date().isoformat()
+        seen_version = today_version(today_iso)
+
+        try:
+            yield "retry: 5000\n\n"
+            yield format_sse("tick", {"now": datetime.now(tz).strftime("%H:%M"), "date": today_iso})
+
+            while time.time() - opened_at < SHOP_MODE_STREAM_MAX_SEC:
+                try:
+                    event = subscription.get(timeout=SHOP_MODE_STREAM_HEARTBEAT_SEC)
+                except queue.Empty:
+                    event = None
+
+                now_dt = datetime.now(tz)
+                now_hhmm = now_dt.strftime("%H:%M")
+
+                if now_dt.date().isoformat() != today_iso:
+                    today_iso = now_dt.date().isoformat()
+                    seen_version = today_version(today_iso)
+                    yield format_sse("resync", {"date": today_iso})
+                    continue
+
+                if event is None:
+                    current_version = today_version(today_iso)
+                    if current_version is not None and current_version != seen_version:
+                        seen_version = current_version
+                        yield format_sse("resync", {"date": today_iso})
+                    yield format_sse("tick", {"now": now_hhmm, "date": today_iso})
+                    continue
+
+                if event["type"] == "resync":
+                    yield format_sse("resync", {"date": today_iso}, event["id"])
+                    continue
+
+                payload = event["payload"]
+                if today_iso not in payload.get("dates", []):
+                    continue
+
+                reservation_ids = payload.get("reservation_ids") or []
+                rows = load_shop_mode_rows(business, today_iso, now_hhmm, reservation_ids)
+                live_ids = {row["id"] for row in rows}
+
+                yield format_sse(
+                    "reservations",
+                    {
+                        "type": event["type"],
+                        "upsert": rows,
+                        "remove": [rid for rid in reservation_ids if rid not in live_ids],
+                        "now": now_hhmm,
+                    },
+                    event["id"],
+                )
+
+                # Each bump adds 1, so the delta accounts for exactly one step
+                # past seen_version. A bigger jump means something changed
+                # without an event here (another worker, a write that did not
+                # publish) and needs a full reload. Changes after this write
+                # are left to their own events or the heartbeat check; a write
+                # at or below seen_version was covered by an earlier resync.
+                written = (payload.get("versions") or {}).get(today_iso)
+                if written is not None and seen_version is not None:
+                    if written <= seen_version:
+                        continue
+                    if written == seen_version + 1:
+                        seen_version = written
+                        continue
+                current_version = today_version(today_iso)
+                if current_version is not None:
+                    seen_version = current_version
+                    yield format_sse("resync", {"date": today_iso})
+        finally:
+            event_bus.unsubscribe(business_id, subscription)
+
+    response = Response(stream_with_context(stream()), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
 @app.route("/dashboard")
 def dashboard():
     if not require_login():
@@ -5323,7 +6613,7 @@ def dashboard():
     try:
         mark_past_reservations_done(business)
     except Exception as e:
-        print("dashboard mark_past_reservations_done warning:", e)
+        dashboard_log.warning("dashboard mark_past_reservations_done failed: %s", e)
 
     tz = pytz.timezone(business.get("timezone") or "Asia/Beirut")
     now = datetime.now(tz)
@@ -5356,24 +6646,13 @@ def dashboard():
         if not s.get("capacity_units_used"):
             s["capacity_units_used"] = infer_service_capacity_units_from_name(s.get("name"))
 
-    service_meta = {}
+    capacity_pools, pool_members = get_capacity_pools(business_id)
+    service_pool_choice = {
+        row["service_id"]: str(row["pool_id"]) if row["pool_id"] else "none"
+        for row in pool_members
+    }
     for s in services:
-        service_meta[(s["name"] or "").strip().lower()] = {
-            "price": float(s.get("price") or 0),
-            "duration": int(s.get("duration_min") or 45),
-        }
-
-    def get_service_meta(service_name):
-        cleaned = (service_name or "").strip().lower()
-
-        if cleaned in service_meta:
-            return service_meta[cleaned]
-
-        for name, meta in service_meta.items():
-            if cleaned in name or name in cleaned:
-                return meta
-
-        return {"price": 0.0, "duration": 45}
+        s["capacity_pool"] = service_pool_choice.get(s["id"], "")
 
     # Load resources for future staff/court UI
     c.execute(
@@ -5411,22 +6690,23 @@ def dashboard():
     for row in resource_service_rows:
         resource_services_map.setdefault(row["resource_id"], set()).add(row["service_id"])
 
-    # Load only recent/future reservations
+    today_iso = now.date().isoformat()
+
+    # Today's strip and revenue cards only need today's rows
     c.execute(
         """
         SELECT id, customer_name, customer_phone, service, date, time, status, notes, resource_id, resource_name_snapshot,
-               COALESCE(extra_minutes, 0) AS extra_minutes,
-               COALESCE(extra_price, 0) AS extra_price,
                COALESCE(extra_minutes, 0) AS extra_minutes,
                COALESCE(extra_price, 0) AS extra_price
         FROM reservations
         WHERE business_id = %s
-          AND date >= %s
-        ORDER BY date DESC, time DESC, id DESC
+          AND date = %s
+          AND status IN ('CONFIRMED', 'DONE')
+        ORDER BY time ASC, id ASC
         """,
-        (business_id, cutoff_date_iso),
+        (business_id, today_iso),
     )
-    recent_reservations = c.fetchall()
+    today_reservations = c.fetchall()
 
     c.execute(
         """
@@ -5489,72 +6769,43 @@ def dashboard():
 
     conn.close()
 
-    visible_reservations = []
-
-    for r in recent_reservations:
-        try:
-            normalized_time = normalize_time_str(r["time"]) or r["time"]
-            start_naive = datetime.strptime(
-                f"{r['date']} {normalized_time}",
-                "%Y-%m-%d %H:%M"
-            )
-            start_dt = tz.localize(start_naive)
-
-            duration_min = get_service_meta(r["service"])["duration"] + int(r.get("extra_minutes") or 0)
-            end_dt = start_dt + timedelta(minutes=duration_min)
-
-            if end_dt >= cutoff_dt:
-                visible_reservations.append(r)
-
-        except Exception as e:
-            print("dashboard reservation filter warning:", r, e)
-            visible_reservations.append(r)
-
-    def reservation_sort_key(r):
-        try:
-            normalized_time = normalize_time_str(r["time"]) or r["time"]
-            dt = datetime.strptime(
-                f"{r['date']} {normalized_time}",
-                "%Y-%m-%d %H:%M"
-            )
-            return tz.localize(dt)
-        except Exception:
-            return tz.localize(datetime(2000, 1, 1, 0, 0))
-
-    reservations = sorted(
-        visible_reservations,
-        key=reservation_sort_key,
-        reverse=True
+    # Recent/future reservations by default; a search looks through all history
+    reservation_page = search_reservations_page(
+        business_id,
+        since_date_iso=None if search_query else cutoff_date_iso,
+        search_query=search_query,
+        status_filter=status_filter,
+        after=request.args.get("after"),
+        before=request.args.get("before"),
+        page_size=request.args.get("per_page") or DASHBOARD_PAGE_SIZE,
     )
+    filtered_reservations = reservation_page["rows"]
 
-    filtered_reservations = reservations
-
-    if search_query:
-        filtered_reservations = [
-            r for r in filtered_reservations
-            if search_query in (r.get("customer_name") or "").lower()
-            or search_query in (r.get("customer_phone") or "").lower()
-            or search_query in (r.get("service") or "").lower()
-            or search_query in (r.get("notes") or "").lower()
-            or search_query in (r.get("resource_name_snapshot") or "").lower()
-        ]
-
-    if status_filter and status_filter != "ALL":
-        filtered_reservations = [
-            r for r in filtered_reservations
-            if (r.get("status") or "").upper() == status_filter
-        ]
+    def reservation_page_url(cursor_name, cursor_value):
+        if not cursor_value:
+            return None
+        params = {"tab": "reservations", cursor_name: cursor_value}
+        if search_query:
+            params["q"] = search_query
+        if status_filter and status_filter != "ALL":
+            params["status"] = status_filter
+        if request.args.get("per_page"):
+            params["per_page"] = request.args.get("per_page")
+        if is_support_user() and requested_business_id:
+            params["business_id"] = business_id
+        return "/dashboard?" + urlencode(params)
+
+    reservation_pagination = {
+        "newer_url": reservation_page_url("before", reservation_page["newer_cursor"]),
+        "older_url": reservation_page_url("after", reservation_page["older_cursor"]),
+    }
 
-    today_iso = now.date().isoformat()
     dashboard_metrics = {
         "today_booked_revenue": 0.0,
         "today_done_revenue": 0.0,
     }
 
-    for r in reservations:
-        if r["date"] != today_iso:
-            continue
-
+    for r in today_reservations:
         price = get_effective_service_price_for_reservation_row(business, r) + float(r.get("extra_price") or 0)
 
         if r["status"] == "CONFIRMED":
@@ -5562,14 +6813,6 @@ def dashboard():
         elif r["status"] == "DONE":
             dashboard_metrics["today_done_revenue"] += price
 
-    today_reservations = sorted(
-        [
-            r for r in reservations
-            if r["date"] == today_iso and r["status"] in ["CONFIRMED", "DONE"]
-        ],
-        key=reservation_sort_key
-    )
-
     resource_blocked_map = {}
     for row in resource_blocked_rows:
         resource_blocked_map.setdefault(row["resource_id"], []).append(row)
@@ -5580,14 +6823,19 @@ def dashboard():
             continue
         same_day_confirmed_map.setdefault(row["date"], []).append(row)
 
+    extension_results = {}
+    if feature_flags.get("enable_time_extension"):
+        extension_results = evaluate_extensions_batch(
+            business,
+            [r for r in filtered_reservations if (r.get("status") or "").upper() == "CONFIRMED"],
+            increment_minutes=30,
+        )
+
     for r in filtered_reservations:
         r["extra_minutes"] = int(r.get("extra_minutes") or 0)
         r["extra_price"] = float(r.get("extra_price") or 0)
         r["can_mark_done"] = reservation_has_ended(business, r) and (r.get("status") or "").upper() == "CONFIRMED"
-        if feature_flags.get("enable_time_extension") and (r.get("status") or "").upper() == "CONFIRMED":
-            r["can_add_30"] = is_reservation_extension_possible(business, r, increment_minutes=30)[0]
-        else:
-            r["can_add_30"] = False
+        r["can_add_30"] = extension_results.get(r["id"], (False, None))[0]
 
     report_metrics = compute_dashboard_report_metrics(business, services, all_reservations)
     fb_report_metrics = compute_fb_report_metrics(business)
@@ -5604,6 +6852,7 @@ def dashboard():
         reservations=filtered_reservations,
         services=services,
         service_options=services,
+        capacity_pools=capacity_pools,
         resources=resources,
         resource_services_map=resource_services_map,
         resource_blocked_map=resource_blocked_map,
@@ -5618,6 +6867,8 @@ def dashboard():
         is_support=is_support_user(),
         dashboard_metrics=dashboard_metrics,
         today_reservations=today_reservations,
+        reservation_counts=reservation_page["counts"],
+        reservation_pagination=reservation_pagination,
         search_query=search_query,
         status_filter=status_filter or "ALL",
         toast=toast,
@@ -5629,6 +6880,223 @@ def dashboard():
         feature_time_extension=feature_flags["enable_time_extension"],
     )
 
+@app.route("/api/next-available")
+def api_next_available():
+    if "business_id" not in session:
+        return jsonify({"ok": False, "error": "Not logged in"}), 401
+
+    business_id = session["business_id"]
+    business = get_business_by_id(business_id)
+    if not business:
+        return jsonify({"ok": False, "error": "Business not found"}), 404
+
+    service_raw = (request.args.get("service") or "").strip()
+    valid_service, _ = validate_service_for_business(business_id, service_raw)
+    if not valid_service:
+        return jsonify({"ok": False, "error": "Unknown service"}), 400
+
+    resource_raw = (request.args.get("resource") or "").strip()
+    resource_id = None
+    if resource_raw and resource_raw != "auto":
+        try:
+            resource_id = int(resource_raw)
+        except Exception:
+            return jsonify({"ok": False, "error": "Invalid resource"}), 400
+
+    slots = find_next_available_slots(
+        business,
+        valid_service,
+        start_date_iso=(request.args.get("date") or "").strip() or None,
+        days=request.args.get("days") or NEXT_AVAILABLE_DEFAULT_DAYS,
+        limit=request.args.get("limit") or 3,
+        resource_id=resource_id,
+    )
+
+    return jsonify({
+        "ok": True,
+        "service": valid_service,
+        "resource_id": resource_id,
+        "slots": slots,
+    })
+
+
+AVAILABILITY_API_STEP_MIN = 15
+
+
+def build_availability_etag(business, date_iso, service_name, resource_id, date_version, business_version):
+    """
+    Strong ETag for /api/availability. It only changes when a write path
+    bumps the business/date counters, or (for today) when the step clock
+    moves and earlier slots start falling into the past.
+    """
+    tz = pytz.timezone(business.get("timezone") or "Asia/Beirut")
+    now_dt = datetime.now(tz)
+    clock_bucket = ""
+    if date_iso == now_dt.date().isoformat():
+        clock_bucket = str((now_dt.hour * 60 + now_dt.minute) // AVAILABILITY_API_STEP_MIN)
+
+    raw = f"{business['id']}|{date_iso}|{service_name}|{resource_id}|{date_version}|{business_version}|{clock_bucket}"
+    return "av-" + hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+
+
+def build_day_availability(business, date_iso, service_name, resource_id=None):
+    """
+    Free/busy grid for one day, built on get_resource_day_rules and
+    is_resource_slot_full_from_prefetched (one reservation query per call).
+    """
+    business_id = business["id"]
+    tz = pytz.timezone(business.get("timezone") or "Asia/Beirut")
+    now_dt = datetime.now(tz)
+    earliest_minutes = None
+    if date_iso == now_dt.date().isoformat():
+        earliest_minutes = now_dt.hour * 60 + now_dt.minute
+    elif date_iso < now_dt.date().isoformat():
+        return {"closed": True, "reason": "past_date", "slots": []}
+
+    reservations_rows = get_confirmed_reservations_for_date_fast(business_id, date_iso)
+    service_duration_cache = {}
+    duration = int(get_service_duration_cached(business_id, service_name, service_duration_cache))
+
+    eligible_resources = get_active_resources_for_service(business_id, service_name)
+    if resource_id is not None:
+        eligible_resources = [r for r in eligible_resources if r["id"] == resource_id]
+        if not eligible_resources:
+            return {"closed": True, "reason": "resource_unavailable", "slots": []}
+
+    slots_by_minute = {}
+
+    if eligible_resources:
+        reservations_by_resource = {}
+        for row in reservations_rows:
+            reservations_by_resource.setdefault(row.get("resource_id"), []).append(row)
+
+        any_open = False
+        for r in eligible_resources:
+            rules = get_resource_day_rules(business_id, r["id"], date_iso)
+            if rules.get("closed"):
+                continue
+            any_open = True
+
+            current = time_to_minutes(rules["open_time"])
+            close_minutes = time_to_minutes(rules["close_time"])
+            while current + duration <= close_minutes:
+                slot = slots_by_minute.setdefault(current, [])
+                if earliest_minutes is None or current >= earliest_minutes:
+                    hhmm = f"{current // 60:02d}:{current % 60:02d}"
+                    if not is_resource_slot_full_from_prefetched(
+                        business_id,
+                        r,
+                        hhmm,
+                        service_name,
+                        reservations_by_resource,
+                        service_duration_cache,
+                    ):
+                        slot.append({"id": r["id"], "name": r["name"]})
+                current += AVAILABILITY_API_STEP_MIN
+
+        if not any_open:
+            return {"closed": True, "reason": "closed", "slots": []}
+    else:
+        rules = get_day_rules(business_id, date_iso)
+        if rules.get("closed"):
+            return {"closed": True, "reason": rules.get("reason") or "closed", "slots": []}
+
+        existing_intervals = []
+        for row in reservations_rows:
+            existing_time = normalize_time_str(row["time"])
+            if not existing_time:
+                continue
+            existing_start = time_to_minutes(existing_time)
+            existing_duration = int(get_service_duration_cached(business_id, row["service"], service_duration_cache))
+            existing_intervals.append((existing_start, existing_duration))
+
+        current = time_to_minutes(rules["open_time"])
+        close_minutes = time_to_minutes(rules["close_time"])
+        while current + duration <= close_minutes:
+            slot = slots_by_minute.setdefault(current, [])
+            if earliest_minutes is None or current >= earliest_minutes:
+                if not any(
+                    ranges_overlap(current, duration, start, length)
+                    for start, length in existing_intervals
+                ):
+                    slot.append({"id": None, "name": None})
+            current += AVAILABILITY_API_STEP_MIN
+
+    slots = []
+    for minutes in sorted(slots_by_minute):
+        resources = slots_by_minute[minutes]
+        slots.append({
+            "time": f"{minutes // 60:02d}:{minutes % 60:02d}",
+            "available": bool(resources),
+            "resources": [r for r in resources if r["id"] is not None],
+        })
+
+    return {"closed": False, "reason": None, "slots": slots}
+
+
+@app.route("/api/availability")
+def api_availability():
+    if "business_id" not in session:
+        return jsonify({"ok": False, "error": "Not logged in"}), 401
+
+    business_id = session["business_id"]
+    business = get_business_by_id(business_id)
+    if not business:
+        return jsonify({"ok": False, "error": "Business not found"}), 404
+
+    date_iso = (request.args.get("date") or "").strip()
+    try:
+        date_iso = datetime.strptime(date_iso, "%Y-%m-%d").date().isoformat()
+    except Exception:
+        return jsonify({"ok": False, "error": "date must be YYYY-MM-DD"}), 400
+
+    service_raw = (request.args.get("service") or "").strip()
+    valid_service, _ = validate_service_for_business(business_id, service_raw)
+    if not valid_service:
+        return jsonify({"ok": False, "error": "Unknown service"}), 400
+
+    resource_raw = (request.args.get("resource") or "").strip()
+    resource_id = None
+    if resource_raw and resource_raw != "auto":
+        try:
+            resource_id = int(resource_raw)
+        except Exception:
+            return jsonify({"ok": False, "error": "Invalid resource"}), 400
+
+    date_version, business_version = get_availability_versions(business_id, date_iso)
+    etag = build_availability_etag(
+        business,
+        date_iso,
+        valid_service,
+        resource_id,
+        date_version,
+        business_version,
+    )
+
+    if request.if_none_match and request.if_none_match.contains(etag):
+        metrics.inc("availability_requests_total", result="not_modified")
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
+    metrics.inc("availability_requests_total", result="rendered")
+    day = build_day_availability(business, date_iso, valid_service, resource_id=resource_id)
+
+    response = jsonify({
+        "ok": True,
+        "date": date_iso,
+        "service": valid_service,
+        "resource_id": resource_id,
+        "closed": day["closed"],
+        "reason": day["reason"],
+        "slots": day["slots"],
+    })
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
 @app.route("/cancel/<int:reservation_id>")
 def cancel_reservation(reservation_id):
     if "business_id" not in session:
@@ -5636,64 +7104,42 @@ def cancel_reservation(reservation_id):
 
     business_id = session["business_id"]
 
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute(
-        """
-        SELECT customer_phone, customer_name, service, date, time, google_event_id, status
-        FROM reservations
-        WHERE id = %s AND business_id = %s
-        """,
-        (reservation_id, business_id),
-    )
-    row = c.fetchone()
-
-    if not row:
-        conn.close()
-        return redirect("/dashboard")
+    # Already canceled or done reservations are left as they are.
+    cancelled = cancel_confirmed_reservations(business_id, reservation_ids=[reservation_id])
 
-    status = row["status"]
+    business = get_business_by_id(business_id) if cancelled else None
+    if business:
+        delete_reservation_events(business, cancelled)
+        notify_cancelled_customers(business, cancelled)
 
-    # If already canceled or done, do nothing
-    if status != "CONFIRMED":
-        conn.close()
-        return redirect("/dashboard")
+    return redirect("/dashboard")
 
-    phone = row["customer_phone"]
-    name = row["customer_name"]
-    service = row["service"]
-    date = row["date"]
-    time = row["time"]
-    google_event_id = row.get("google_event_id")
 
-    business = get_business_by_id(business_id)
+@app.route("/reservations/bulk-cancel", methods=["POST"])
+def bulk_cancel_reservations():
+    if "business_id" not in session:
+        return redirect("/login")
 
-    # Delete Google Calendar event first
-    if business and google_event_id:
-        try:
-            deleted = delete_event(google_event_id, calendar_id=(business.get("calendar_id") or "primary"))
-            print("Google Calendar delete result:", deleted)
-        except Exception as e:
-            print("Error deleting Google Calendar event:", e)
+    business_id = session["business_id"]
+    reservation_ids = sorted({
+        int(value) for value in request.form.getlist("reservation_ids") if value.strip().isdigit()
+    })
+    if not reservation_ids:
+        return dashboard_redirect_with_toast("Select at least one reservation to cancel.", "warning")
 
-    c.execute(
-        """
-        UPDATE reservations
-        SET status = 'CANCELED'
-        WHERE id = %s AND business_id = %s
-        """,
-        (reservation_id, business_id),
-    )
-    conn.commit()
-    conn.close()
+    cancelled = cancel_confirmed_reservations(business_id, reservation_ids=reservation_ids)
 
+    events_deleted = 0
+    business = get_business_by_id(business_id) if cancelled else None
     if business:
-        try:
-            send_reservation_cancellation(phone, name, service, date, time, business)
-        except Exception as e:
-            print("Error sending WhatsApp cancellation:", e)
+        events_deleted = delete_reservation_events(business, cancelled)
+        notify_cancelled_customers(business, cancelled)
 
-    return redirect("/dashboard")
+    message = f"Cancelled {len(cancelled)} reservation(s) and removed {events_deleted} Google Calendar event(s)."
+    skipped = len(reservation_ids) - len(cancelled)
+    if skipped:
+        message += f" {skipped} selected reservation(s) were not active and were left unchanged."
+    return dashboard_redirect_with_toast(message, "success" if cancelled else "warning")
 
 
 @app.route("/resources/block/<int:resource_id>", methods=["POST"])
@@ -5746,6 +7192,7 @@ def block_resource_date(resource_id):
             """,
             (business_id, resource_id, blocked_date, note),
         )
+    bump_availability_version(business_id, cursor=c)
     conn.commit()
     conn.close()
 
@@ -5767,6 +7214,7 @@ def unblock_resource_date(block_id):
         """,
         (block_id, business_id),
     )
+    bump_availability_version(business_id, cursor=c)
     conn.commit()
     conn.close()
 
@@ -5817,8 +7265,10 @@ def mark_reservation_done(reservation_id):
         """,
         (reservation_id, business_id),
     )
+    versions = bump_availability_version(business_id, reservation["date"], cursor=c)
     conn.commit()
     conn.close()
+    publish_reservation_event(business_id, "done", reservation_id, reservation["date"], versions)
 
     return dashboard_redirect_with_toast("Reservation marked as done.", "success", "reservations")
 
@@ -5892,6 +7342,7 @@ def update_business_settings():
         """,
         tuple(params),
     )
+    bump_availability_version(business_id, cursor=c)
     conn.commit()
     conn.close()
 
@@ -5916,6 +7367,7 @@ def add_service():
         c.execute("""INSERT INTO services (name, price, duration_min, business_id, sport_category, night_price, capacity_units_used)
                      VALUES (%s, %s, %s, %s, %s, %s, %s)""",
                   (name, price, duration_min, business_id, sport_category, night_price, capacity_units_used))
+        bump_availability_version(business_id, cursor=c)
         conn.commit(); conn.close()
     return redirect("/dashboard?tab=services")
 
@@ -5937,9 +7389,93 @@ def update_service(service_id):
                  SET name=%s, price=%s, duration_min=%s, sport_category=%s, night_price=%s, capacity_units_used=%s
                  WHERE id=%s AND business_id=%s""",
               (name, price, duration_min, sport_category, night_price, capacity_units_used, service_id, business_id))
+    if c.rowcount and "capacity_pool" in request.form:
+        save_service_capacity_pool(c, business_id, service_id, request.form.get("capacity_pool"))
+    bump_availability_version(business_id, cursor=c)
     conn.commit(); conn.close()
     return redirect("/dashboard?tab=services")
 
+
+def save_service_capacity_pool(c, business_id, service_id, choice):
+    """
+    choice: "" = automatic (sport rule), "none" = never shares a pool,
+    otherwise the id of one of the business's capacity pools.
+    """
+    ensure_capacity_pool_tables()
+    choice = (choice or "").strip().lower()
+
+    if not choice:
+        c.execute("DELETE FROM service_capacity_pools WHERE service_id = %s AND business_id = %s", (service_id, business_id))
+        return
+
+    pool_id = None
+    if choice != "none":
+        c.execute("SELECT id FROM capacity_pools WHERE id = %s AND business_id = %s", (safe_int(choice, 0), business_id))
+        row = c.fetchone()
+        if not row:
+            return
+        pool_id = row["id"]
+
+    c.execute(
+        """
+        INSERT INTO service_capacity_pools (service_id, business_id, pool_id)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (service_id) DO UPDATE SET pool_id = EXCLUDED.pool_id
+        """,
+        (service_id, business_id, pool_id),
+    )
+
+
+@app.route("/pools/add", methods=["POST"])
+def add_capacity_pool():
+    if "business_id" not in session:
+        return redirect("/login")
+    ensure_capacity_pool_tables()
+    business_id = session["business_id"]
+    name = (request.form.get("name") or "").strip()
+    capacity = normalize_capacity(request.form.get("capacity"), default=1)
+    if not name:
+        return dashboard_redirect_with_toast("Pool name is required.", "error", "services")
+
+    conn = get_db_connection(); c = conn.cursor()
+    c.execute("INSERT INTO capacity_pools (business_id, name, capacity) VALUES (%s, %s, %s)", (business_id, name, capacity))
+    bump_availability_version(business_id, cursor=c)
+    conn.commit(); conn.close()
+    return dashboard_redirect_with_toast("Capacity pool added.", "success", "services")
+
+
+@app.route("/pools/update/<int:pool_id>", methods=["POST"])
+def update_capacity_pool(pool_id):
+    if "business_id" not in session:
+        return redirect("/login")
+    ensure_capacity_pool_tables()
+    business_id = session["business_id"]
+    name = (request.form.get("name") or "").strip()
+    capacity = normalize_capacity(request.form.get("capacity"), default=1)
+    if not name:
+        return dashboard_redirect_with_toast("Pool name is required.", "error", "services")
+
+    conn = get_db_connection(); c = conn.cursor()
+    c.execute("UPDATE capacity_pools SET name=%s, capacity=%s WHERE id=%s AND business_id=%s", (name, capacity, pool_id, business_id))
+    bump_availability_version(business_id, cursor=c)
+    conn.commit(); conn.close()
+    return dashboard_redirect_with_toast("Capacity pool updated.", "success", "services")
+
+
+@app.route("/pools/delete/<int:pool_id>", methods=["POST"])
+def delete_capacity_pool(pool_id):
+    if "business_id" not in session:
+        return redirect("/login")
+    ensure_capacity_pool_tables()
+    business_id = session["business_id"]
+
+    # Services assigned to the pool go back to the automatic rule.
+    conn = get_db_connection(); c = conn.cursor()
+    c.execute("DELETE FROM capacity_pools WHERE id=%s AND business_id=%s", (pool_id, business_id))
+    bump_availability_version(business_id, cursor=c)
+    conn.commit(); conn.close()
+    return dashboard_redirect_with_toast("Capacity pool deleted.", "success", "services")
+
 @app.route("/services/delete/<int:service_id>", methods=["POST"])
 def delete_service(service_id):
     if "business_id" not in session:
@@ -5956,6 +7492,7 @@ def delete_service(service_id):
         """,
         (service_id, business_id),
     )
+    bump_availability_version(business_id, cursor=c)
     conn.commit()
     conn.close()
 
@@ -5990,6 +7527,7 @@ def add_resource():
         row = c.fetchone()
         resource_id = row["id"]
 
+        bump_availability_version(business_id, cursor=c)
         conn.commit()
         conn.close()
 
@@ -5998,7 +7536,7 @@ def add_resource():
     except Exception as e:
         conn.rollback()
         conn.close()
-        print("add_resource error:", str(e))
+        dashboard_log.exception("add_resource error: %s", e)
 
     return redirect("/dashboard?tab=resources")
 
@@ -6020,6 +7558,7 @@ def delete_resource(resource_id):
         """,
         (resource_id, business_id),
     )
+    bump_availability_version(business_id, cursor=c)
     conn.commit()
     conn.close()
 
@@ -6044,6 +7583,7 @@ def toggle_resource(resource_id):
         """,
         (resource_id, business_id),
     )
+    bump_availability_version(business_id, cursor=c)
     conn.commit()
     conn.close()
 
@@ -6075,6 +7615,7 @@ def update_resource(resource_id):
         """,
         (name, resource_type, capacity, color_tag, resource_id, business_id),
     )
+    bump_availability_version(business_id, cursor=c)
     conn.commit()
     conn.close()
 
@@ -6118,10 +7659,11 @@ def assign_resource_services(resource_id):
                 (business_id, resource_id, service_id),
             )
 
+        bump_availability_version(business_id, cursor=c)
         conn.commit()
     except Exception as e:
         conn.rollback()
-        print("assign_resource_services error:", str(e))
+        dashboard_log.exception("assign_resource_services error: %s", e)
     finally:
         conn.close()
 
@@ -6133,73 +7675,77 @@ def update_hours():
         return redirect("/login")
 
     business_id = session["business_id"]
+    weekly_hours = parse_weekly_hours_form(request.form)
 
     conn = get_db_connection()
     c = conn.cursor()
+    write_weekly_hours(c, business_id, weekly_hours)
+    bump_availability_version(business_id, cursor=c)
+    conn.commit()
+    conn.close()
+
+    return redirect("/dashboard?tab=settings")
+
 
-    # Save business hours
+def parse_weekly_hours_form(form):
+    """
+    The settings form's weekly grid as [(weekday, is_closed, open_time, close_time), ...].
+    """
+    weekly_hours = []
     for weekday in range(7):
-        is_closed = request.form.get(f"closed_{weekday}") == "on"
-        open_time = request.form.get(f"open_{weekday}") or None
-        close_time = request.form.get(f"close_{weekday}") or None
+        is_closed = form.get(f"closed_{weekday}") == "on"
+        open_time = form.get(f"open_{weekday}") or None
+        close_time = form.get(f"close_{weekday}") or None
 
         if is_closed:
             open_time = None
             close_time = None
 
-        c.execute(
-            """
-            INSERT INTO business_hours (business_id, weekday, is_closed, open_time, close_time)
-            VALUES (%s, %s, %s, %s, %s)
-            ON CONFLICT (business_id, weekday)
-            DO UPDATE SET
-                is_closed = EXCLUDED.is_closed,
-                open_time = EXCLUDED.open_time,
-                close_time = EXCLUDED.close_time
-            """,
-            (business_id, weekday, is_closed, open_time, close_time),
-        )
+        weekly_hours.append((weekday, is_closed, open_time, close_time))
+    return weekly_hours
 
-    # NEW: sync all existing resources to the same hours
-    c.execute(
+
+def write_weekly_hours(c, business_id, weekly_hours):
+    """
+    Applies one weekly grid to the business and to every one of its
+    resources: two statements whatever the number of resources. Runs on the
+    caller's cursor so the caller commits it together with the version bump.
+    """
+    rows = [(business_id, weekday, is_closed, open_time, close_time) for weekday, is_closed, open_time, close_time in weekly_hours]
+    template = "(%s, %s, %s::boolean, %s::time, %s::time)"
+
+    execute_values(
+        c,
         """
-        SELECT id
-        FROM resources
-        WHERE business_id = %s
+        INSERT INTO business_hours (business_id, weekday, is_closed, open_time, close_time)
+        VALUES %s
+        ON CONFLICT (business_id, weekday)
+        DO UPDATE SET
+            is_closed = EXCLUDED.is_closed,
+            open_time = EXCLUDED.open_time,
+            close_time = EXCLUDED.close_time
         """,
-        (business_id,),
+        rows,
+        template=template,
     )
-    resource_rows = c.fetchall()
-
-    for resource in resource_rows:
-        resource_id = resource["id"]
-
-        for weekday in range(7):
-            is_closed = request.form.get(f"closed_{weekday}") == "on"
-            open_time = request.form.get(f"open_{weekday}") or None
-            close_time = request.form.get(f"close_{weekday}") or None
-
-            if is_closed:
-                open_time = None
-                close_time = None
-
-            c.execute(
-                """
-                INSERT INTO resource_hours (business_id, resource_id, weekday, is_closed, open_time, close_time)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                ON CONFLICT (business_id, resource_id, weekday)
-                DO UPDATE SET
-                    is_closed = EXCLUDED.is_closed,
-                    open_time = EXCLUDED.open_time,
-                    close_time = EXCLUDED.close_time
-                """,
-                (business_id, resource_id, weekday, is_closed, open_time, close_time),
-            )
-
-    conn.commit()
-    conn.close()
 
-    return redirect("/dashboard?tab=settings")
+    # Same grid for all existing resources, joined server-side.
+    execute_values(
+        c,
+        """
+        INSERT INTO resource_hours (business_id, resource_id, weekday, is_closed, open_time, close_time)
+        SELECT r.business_id, r.id, g.weekday, g.is_closed, g.open_time, g.close_time
+        FROM (VALUES %s) AS g (business_id, weekday, is_closed, open_time, close_time)
+        JOIN resources r ON r.business_id = g.business_id
+        ON CONFLICT (business_id, resource_id, weekday)
+        DO UPDATE SET
+            is_closed = EXCLUDED.is_closed,
+            open_time = EXCLUDED.open_time,
+            close_time = EXCLUDED.close_time
+        """,
+        rows,
+        template=template,
+    )
 
 @app.route("/reservations/add-manual", methods=["POST"])
 def add_manual_reservation():
@@ -6307,31 +7853,30 @@ def reschedule_reservation(reservation_id):
             if ranges_overlap(new_start, new_duration, existing_start, existing_duration):
                 return dashboard_redirect_with_toast("This time slot is already taken.", "error")
 
+    notify = None
+    if reservation.get("customer_phone"):
+        notify = lambda: send_reservation_rescheduled(  # noqa: E731
+            reservation.get("customer_phone"),
+            reservation.get("customer_name", ""),
+            valid_service,
+            reservation.get("date", ""),
+            reservation.get("time", ""),
+            new_date,
+            normalized_time,
+            business,
+            old_resource_name=reservation.get("resource_name_snapshot"),
+            new_resource_name=chosen_resource["name"] if chosen_resource else None,
+        )
+
     apply_reschedule_update(
         business,
         reservation,
         new_date,
         normalized_time,
         chosen_resource,
+        notify=notify,
     )
 
-    if reservation.get("customer_phone"):
-        try:
-            send_reservation_rescheduled(
-                reservation.get("customer_phone"),
-                reservation.get("customer_name", ""),
-                valid_service,
-                reservation.get("date", ""),
-                reservation.get("time", ""),
-                new_date,
-                normalized_time,
-                business,
-                old_resource_name=reservation.get("resource_name_snapshot"),
-                new_resource_name=chosen_resource["name"] if chosen_resource else None,
-            )
-        except Exception as e:
-            print("reschedule whatsapp notify warning:", e, flush=True)
-
     return dashboard_redirect_with_toast("Reservation rescheduled successfully.", "success")
 
 @app.route("/reservations/update-note/<int:reservation_id>", methods=["POST"])
@@ -6381,6 +7926,7 @@ def add_blocked_date():
             """,
             (business_id, blocked_date, note),
         )
+        bump_availability_version(business_id, cursor=c)
         conn.commit()
         conn.close()
 
@@ -6403,6 +7949,7 @@ def delete_blocked_date(block_id):
         """,
         (block_id, business_id),
     )
+    bump_availability_version(business_id, cursor=c)
     conn.commit()
     conn.close()
 
@@ -6431,8 +7978,10 @@ def add_fb_product():
         """,
         (business_id, name, price),
     )
+    bump_fb_catalog_version(business_id, c)
     conn.commit()
     conn.close()
+    invalidate_compiled_business_data(business_id, "fb_catalog")
 
     return dashboard_redirect_with_toast("F&B product added successfully.", "success", "fb")
 
@@ -6464,8 +8013,10 @@ def update_fb_product(product_id):
         """,
         (name, price, is_active, product_id, business_id),
     )
+    bump_fb_catalog_version(business_id, c)
     conn.commit()
     conn.close()
+    invalidate_compiled_business_data(business_id, "fb_catalog")
 
     return dashboard_redirect_with_toast("F&B product updated successfully.", "success", "fb")
 
@@ -6487,8 +8038,10 @@ def delete_fb_product(product_id):
         """,
         (product_id, business_id),
     )
+    bump_fb_catalog_version(business_id, c)
     conn.commit()
     conn.close()
+    invalidate_compiled_business_data(business_id, "fb_catalog")
 
     return dashboard_redirect_with_toast("F&B product deleted.", "success", "fb")
 
@@ -6500,68 +8053,18 @@ def close_fb_sale():
 
     ensure_fb_tables()
     business_id = session["business_id"]
-    products = get_fb_products(business_id, active_only=True)
-
-    items = []
-    total_amount = 0.0
-
-    for product in products:
-        qty = safe_int(request.form.get(f"qty_{product['id']}") or 0, 0)
-        if qty <= 0:
-            continue
-
-        unit_price = float(product.get("price") or 0)
-        line_total = unit_price * qty
-        total_amount += line_total
-        items.append(
-            {
-                "product_id": product["id"],
-                "product_name_snapshot": product["name"],
-                "quantity": qty,
-                "unit_price": unit_price,
-                "line_total": line_total,
-            }
-        )
+    catalog = get_fb_catalog(business_id)
+    items, total_amount = build_fb_sale_items(
+        catalog,
+        {product["id"]: request.form.get(f"qty_{product['id']}") for product in catalog},
+    )
 
     if not items:
         return dashboard_redirect_with_toast("Choose at least one F&B item before closing the sale.", "error", "fb")
 
     conn = get_db_connection()
     c = conn.cursor()
-    c.execute(
-        """
-        INSERT INTO fb_sales (business_id, total_amount)
-        VALUES (%s, %s)
-        RETURNING id
-        """,
-        (business_id, total_amount),
-    )
-    sale_row = c.fetchone()
-    sale_id = sale_row["id"] if isinstance(sale_row, dict) else sale_row[0]
-
-    for item in items:
-        c.execute(
-            """
-            INSERT INTO fb_sale_items (
-                sale_id,
-                product_id,
-                product_name_snapshot,
-                quantity,
-                unit_price,
-                line_total
-            )
-            VALUES (%s, %s, %s, %s, %s, %s)
-            """,
-            (
-                sale_id,
-                item["product_id"],
-                item["product_name_snapshot"],
-                item["quantity"],
-                item["unit_price"],
-                item["line_total"],
-            ),
-        )
-
+    insert_fb_sale(c, business_id, total_amount, items)
     conn.commit()
     conn.close()
 
@@ -6572,49 +8075,111 @@ def close_fb_sale():
     )
 
 
-def is_reservation_extension_possible(business, reservation, increment_minutes=30):
+def evaluate_extensions_batch(business, reservations, increment_minutes=30):
+    """
+    Can each reservation be extended by increment_minutes?
+    Loads hours, blocked dates, resources and every involved day's confirmed
+    reservations once, then checks all rows in one pass.
+    Returns {reservation_id: (possible, reason)}.
+    """
     business_id = business["id"]
-    date_iso = reservation["date"]
-    start_time = normalize_time_str(reservation["time"]) or reservation["time"]
-    resource_id = reservation.get("resource_id")
-    service_name = reservation["service"]
     increment_minutes = int(increment_minutes or 0)
-    base_duration = get_reservation_base_duration_minutes(business_id, service_name)
-    extra_minutes = int(reservation.get("extra_minutes") or 0)
-    proposed_total_duration = base_duration + extra_minutes + increment_minutes
-    start_minutes = time_to_minutes(start_time)
-    proposed_end_minutes = start_minutes + proposed_total_duration
-    shared_pool = get_service_shared_pool_key(business_id, service_name)
-    if resource_id:
-        rules = get_resource_day_rules(business_id, resource_id, date_iso)
-        resource = get_resource_by_id(resource_id, business_id)
-    else:
-        rules = get_day_rules(business_id, date_iso)
-        resource = None
-    if rules.get("closed"):
-        return False, "Resource is unavailable on that date."
-    if proposed_end_minutes > time_to_minutes(rules["close_time"]):
-        return False, "The next 30 minutes are outside working hours."
-    capacity = get_service_pool_capacity(business_id, resource, service_name)
-    current_units = get_service_capacity_units(business_id, service_name)
-    rows = get_confirmed_reservations_for_date_excluding_fast(business_id, date_iso, excluded_reservation_id=reservation["id"])
-    overlapping_units = 0
-    for row in rows:
-        existing_service = row["service"]
-        existing_pool = get_service_shared_pool_key(business_id, existing_service)
-        same_pool = existing_pool == shared_pool if shared_pool else (row.get("resource_id") == resource_id if resource_id else True)
-        if not same_pool:
+
+    reservations = [r for r in reservations if r.get("date") and r.get("time")]
+    if not reservations:
+        return {}
+
+    dates = sorted({r["date"] for r in reservations})
+    resource_ids = sorted({r["resource_id"] for r in reservations if r.get("resource_id")})
+
+    window = load_availability_window(business_id, dates[0], dates[-1], resource_ids, dates=dates)
+
+    resource_capacity = {}
+    if resource_ids:
+        conn = get_db_connection()
+        c = conn.cursor()
+        c.execute(
+            """
+            SELECT id, capacity
+            FROM resources
+            WHERE business_id = %s
+              AND id = ANY(%s)
+            """,
+            (business_id, resource_ids),
+        )
+        resource_capacity = {row["id"]: int(row["capacity"] or 1) for row in c.fetchall()}
+        conn.close()
+
+    service_profiles = get_service_profiles(business_id)
+
+    day_cache = {}
+
+    def day_intervals(date_iso):
+        if date_iso not in day_cache:
+            intervals = []
+            for row in window["reservations_by_date"].get(date_iso, []):
+                interval = build_day_intervals([row], service_profiles)
+                if interval:
+                    intervals.append((row["id"],) + interval[0])
+            day_cache[date_iso] = intervals
+        return day_cache[date_iso]
+
+    results = {}
+    for reservation in reservations:
+        reservation_id = reservation["id"]
+        date_iso = reservation["date"]
+        resource_id = reservation.get("resource_id")
+
+        try:
+            start_minutes = time_to_minutes(normalize_time_str(reservation["time"]) or reservation["time"])
+            rules = resolve_window_day_rules(window, date_iso, resource_id)
+        except Exception as e:
+            dashboard_log.warning("evaluate_extensions_batch: reservation %s has an invalid date/time: %s", reservation_id, e)
+            results[reservation_id] = (False, "Invalid reservation date/time.")
             continue
-        existing_time = normalize_time_str(row["time"])
-        if not existing_time:
+
+        profile = build_service_slot_profile(service_profiles, reservation["service"])
+        proposed_total_duration = (
+            profile["duration"] + int(reservation.get("extra_minutes") or 0) + increment_minutes
+        )
+        proposed_end_minutes = start_minutes + proposed_total_duration
+
+        if rules.get("closed"):
+            results[reservation_id] = (False, "Resource is unavailable on that date.")
             continue
-        existing_start = time_to_minutes(existing_time)
-        existing_duration = get_reservation_total_duration_minutes(business_id, existing_service, extra_minutes=row.get("extra_minutes") or 0)
-        if ranges_overlap(start_minutes, proposed_total_duration, existing_start, existing_duration):
-            overlapping_units += get_service_capacity_units(business_id, existing_service)
-    if overlapping_units + current_units > capacity:
-        return False, "The next 30 minutes are already booked."
-    return True, None
+        if proposed_end_minutes > time_to_minutes(rules["close_time"]):
+            results[reservation_id] = (False, "The next 30 minutes are outside working hours.")
+            continue
+
+        shared_pool = profile["pool"]
+        if shared_pool:
+            capacity = profile["pool_capacity"]
+        else:
+            capacity = resource_capacity.get(resource_id, 1) if resource_id else 1
+
+        free_units = capacity - profile["units"]
+        for other_id, other_start, other_end, other_resource_id, other_units, other_pool in day_intervals(date_iso):
+            if other_id == reservation_id:
+                continue
+            if shared_pool:
+                if other_pool != shared_pool:
+                    continue
+            elif resource_id and other_resource_id != resource_id:
+                continue
+            if start_minutes < other_end and other_start < proposed_end_minutes:
+                free_units -= other_units
+
+        if free_units < 0:
+            results[reservation_id] = (False, "The next 30 minutes are already booked.")
+        else:
+            results[reservation_id] = (True, None)
+
+    return results
+
+
+def is_reservation_extension_possible(business, reservation, increment_minutes=30):
+    results = evaluate_extensions_batch(business, [reservation], increment_minutes=increment_minutes)
+    return results.get(reservation["id"], (False, "Invalid reservation date/time."))
 
 @app.route("/reservations/add-30/<int:reservation_id>", methods=["POST"])
 def add_30_minutes_to_reservation(reservation_id):
@@ -6687,28 +8252,26 @@ def add_30_minutes_to_reservation(reservation_id):
         """,
         (new_extra_minutes, new_extra_price, reservation_id, business_id),
     )
+    versions = bump_availability_version(business_id, reservation["date"], cursor=c)
     conn.commit()
     conn.close()
+    publish_reservation_event(business_id, "extended", reservation_id, reservation["date"], versions)
 
-    old_event_id = reservation.get("google_event_id")
-    if old_event_id:
-        try:
-            delete_event(old_event_id, calendar_id=(business.get("calendar_id") or "primary"))
-        except Exception as e:
-            print("add_30_minutes_to_reservation delete_event warning:", e, flush=True)
-
-    new_event = add_reservation_to_google_calendar(
-        business_id,
-        reservation["customer_name"],
-        reservation["service"],
-        reservation["date"],
-        reservation["time"],
-        resource_name=reservation.get("resource_name_snapshot"),
-        resource_id=reservation.get("resource_id"),
-        extra_minutes=new_extra_minutes,
+    replace_google_event(
+        business,
+        reservation_id,
+        reservation.get("google_event_id"),
+        lambda: add_reservation_to_google_calendar(
+            business_id,
+            reservation["customer_name"],
+            reservation["service"],
+            reservation["date"],
+            reservation["time"],
+            resource_name=reservation.get("resource_name_snapshot"),
+            resource_id=reservation.get("resource_id"),
+            extra_minutes=new_extra_minutes,
+        ),
     )
-    if new_event and new_event.get("id"):
-        save_google_event_id(reservation_id, new_event["id"])
 
     total_price = get_reservation_total_price(
         business_id,
@@ -6723,16 +8286,39 @@ def add_30_minutes_to_reservation(reservation_id):
     )
 
 
-# ------------------ RUN ------------------
+# ------------------ APP FACTORY ------------------
+
+_app_schema_ready = False
+
+
+def create_app(init_schema=True, preload_imports=False):
+    """
+    Returns the configured app. Importing this module only defines routes
+    and helpers; the one-time startup work (creating tables, the ensure_*
+    migrations) runs here, once per process, so WSGI servers and the dev
+    server start the same way. preload_imports loads the Google client
+    libraries up front; gunicorn.conf.py sets it so the preloading master
+    imports them once for every worker.
+    """
+    global _app_schema_ready
+    if preload_imports:
+        preload_clients()
+    if init_schema and not _app_schema_ready:
+        init_db()       # <-- creates tables automatically
+        ensure_multi_business_whatsapp_columns()
+        ensure_fb_tables()
+        ensure_business_feature_columns()
+        ensure_reservation_extension_columns()
+        ensure_resource_availability_tables()
+        ensure_reservation_search_indexes()
+        ensure_capacity_pool_tables()
+        _app_schema_ready = True
+    return app
+
 
 if __name__ == "__main__":
-    init_db()       # <-- creates tables automatically
-    ensure_multi_business_whatsapp_columns()
-    ensure_fb_tables()
-    ensure_business_feature_columns()
-    ensure_reservation_extension_columns()
-    ensure_resource_availability_tables()
-    app.run(host="0.0.0.0", port=10000)
+    # Development server; production runs gunicorn -c gunicorn.conf.py.
+    create_app().run(host="0.0.0.0", port=int(os.getenv("PORT") or 10000))
 
 
 
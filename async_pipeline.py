@@ -0,0 +1,163 @@
+# async_pipeline.py
+import atexit
+import concurrent.futures
+import contextvars
+import os
+import threading
+import time
+
+import metrics
+from log_utils import get_logger
+
+# Asynchronous processing mode for inbound WhatsApp messages
+# (WEBHOOK_MODE=async). The webhook acknowledges Meta as soon as a message
+# is de-duplicated and hands it to an asyncio loop running in a background
+# thread of the worker. The loop keeps every pending conversation as a
+# cheap task and runs the blocking steps (psycopg2, Graph API, OpenRouter,
+# Google Calendar) on a bounded thread pool, so a worker answers webhooks
+# without waiting on any of them and works through hundreds of
+# conversations at once. Messages of one conversation (same key) still run
+# one at a time, in arrival order.
+#
+#   WEBHOOK_MODE=async
+#   ASYNC_PIPELINE_WORKERS=32        blocking steps running at once; keep it
+#                                    within the DB connection budget
+#   ASYNC_PIPELINE_MAX_PENDING=1000  queued messages before submit() refuses
+#                                    new conversations and the webhook
+#                                    processes them inline
+
+WORKERS = int(os.getenv("ASYNC_PIPELINE_WORKERS") or 32)
+MAX_PENDING = int(os.getenv("ASYNC_PIPELINE_MAX_PENDING") or 1000)
+DRAIN_SECONDS = 10
+
+log = get_logger("pipeline")
+
+_lock = threading.Lock()
+_state = None
+_stats = {"pending": 0, "running": 0, "done": 0, "failed": 0}
+_key_counts = {}  # key -> messages queued or running
+
+metrics.counter("async_pipeline_overflow_total", "Messages processed inline because the pipeline queue was full.")
+metrics.histogram("async_pipeline_wait_seconds", "Time a message waited in the pipeline before it started.")
+metrics.collector(
+    "async_pipeline_messages",
+    "Messages queued or running in the async pipeline.",
+    lambda: [({"state": "pending"}, _stats["pending"]), ({"state": "running"}, _stats["running"])],
+)
+
+
+def enabled():
+    return (os.getenv("WEBHOOK_MODE") or "sync").strip().lower() == "async"
+
+
+def _start():
+    # asyncio is imported on first use: it is a noticeable share of the
+    # app's import time and only async mode needs it.
+    import asyncio
+
+    loop = asyncio.new_event_loop()
+    loop.set_default_executor(
+        concurrent.futures.ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="pipeline")
+    )
+    thread = threading.Thread(target=loop.run_forever, name="pipeline-loop", daemon=True)
+    thread.start()
+    log.info("async pipeline started (pid %s, %s workers)", os.getpid(), WORKERS)
+    return {"pid": os.getpid(), "loop": loop, "thread": thread, "key_locks": {}}
+
+
+def _get_state():
+    """
+    Started on first use in each process: threads do not survive a fork,
+    so a pipeline inherited from a preloading master is replaced.
+    """
+    global _state
+    with _lock:
+        if _state is None or _state["pid"] != os.getpid():
+            _state = _start()
+        return _state
+
+
+async def _run(state, key, fn, args, queued_at):
+    import asyncio
+
+    key_locks = state["key_locks"]
+    entry = key_locks.get(key)
+    if entry is None:
+        entry = key_locks[key] = {"lock": asyncio.Lock(), "users": 0}
+    entry["users"] += 1
+    try:
+        # asyncio.Lock wakes waiters first come, first served, and tasks
+        # reach this point in submission order.
+        async with entry["lock"]:
+            with _lock:
+                _stats["pending"] -= 1
+                _stats["running"] += 1
+            metrics.observe("async_pipeline_wait_seconds", time.perf_counter() - queued_at)
+            try:
+                # A fresh context per message, like a request would get.
+                await state["loop"].run_in_executor(None, contextvars.Context().run, fn, *args)
+                outcome = "done"
+            except Exception as e:
+                log.exception("pipeline task for %s failed: %s", key, e)
+                outcome = "failed"
+            with _lock:
+                _stats["running"] -= 1
+                _stats[outcome] += 1
+    finally:
+        entry["users"] -= 1
+        if not entry["users"]:
+            key_locks.pop(key, None)
+        with _lock:
+            _key_counts[key] -= 1
+            if not _key_counts[key]:
+                del _key_counts[key]
+
+
+def submit(key, fn, *args):
+    """
+    Queues fn(*args). Calls sharing a key run one at a time in submission
+    order. Returns False, without queueing, when MAX_PENDING messages are
+    already waiting and nothing of this key is queued or running; the
+    caller should then run fn itself. A key with work in the pipeline is
+    always queued behind it, over the limit if need be, so its calls
+    never run out of order or alongside each other.
+    """
+    state = _get_state()
+    with _lock:
+        if _stats["pending"] >= MAX_PENDING and key not in _key_counts:
+            metrics.inc("async_pipeline_overflow_total")
+            return False
+        _stats["pending"] += 1
+        _key_counts[key] = _key_counts.get(key, 0) + 1
+    import asyncio
+
+    asyncio.run_coroutine_threadsafe(_run(state, key, fn, args, time.perf_counter()), state["loop"])
+    return True
+
+
+def stats():
+    with _lock:
+        return dict(_stats)
+
+
+def wait_idle(timeout=DRAIN_SECONDS):
+    """
+    Blocks until nothing is queued or running, or timeout seconds pass.
+    Returns True when the pipeline drained.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        with _lock:
+            if not _stats["pending"] and not _stats["running"]:
+                return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.01)
+
+
+@atexit.register
+def _drain_on_exit():
+    if _state is None or _state["pid"] != os.getpid():
+        return
+    if not wait_idle(DRAIN_SECONDS):
+        log.warning("async pipeline exiting with unfinished messages: %s", stats())
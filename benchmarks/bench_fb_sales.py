@@ -0,0 +1,146 @@
+"""
+F&B sale close throughput against a real database.
+
+    DATABASE_URL=postgresql://... python benchmarks/bench_fb_sales.py [--sales 500] [--items 4]
+
+Compares the old close_fb_sale write path (catalog query on every sale,
+sale insert, then one insert per line item) with the current one (cached
+catalog, sale and items in a single statement). Both open a connection per
+sale like the request handler does. Then times the F&B report
+(compute_fb_report_metrics), which reads the daily rollups those writes
+kept up to date. Writes go to a scratch business id that is deleted at the
+end; do not point this at production.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Reservation_Bot as rb  # noqa: E402
+
+PRODUCT_COUNT = 40
+
+
+def setup(business_id):
+    rb.ensure_fb_tables()
+    conn = rb.get_db_connection()
+    c = conn.cursor()
+    for i in range(PRODUCT_COUNT):
+        c.execute(
+            "INSERT INTO fb_products (business_id, name, price, is_active) VALUES (%s, %s, %s, TRUE)",
+            (business_id, f"Bench product {i}", 1.5 + i % 7),
+        )
+    conn.commit()
+    conn.close()
+
+
+def cleanup(business_id):
+    conn = rb.get_db_connection()
+    c = conn.cursor()
+    c.execute("DELETE FROM fb_sales WHERE business_id = %s", (business_id,))
+    c.execute("DELETE FROM fb_daily_sales WHERE business_id = %s", (business_id,))
+    c.execute("DELETE FROM fb_daily_items WHERE business_id = %s", (business_id,))
+    c.execute("DELETE FROM fb_products WHERE business_id = %s", (business_id,))
+    conn.commit()
+    conn.close()
+    rb.invalidate_compiled_business_data(business_id)
+
+
+def make_baskets(business_id, sales, items):
+    product_ids = [p["id"] for p in rb.get_fb_products(business_id, active_only=True)]
+    rng = random.Random(11)
+    return [
+        {pid: rng.randint(1, 3) for pid in rng.sample(product_ids, min(items, len(product_ids)))}
+        for _ in range(sales)
+    ]
+
+
+def legacy_close(business_id, quantities):
+    products = rb.get_fb_products(business_id, active_only=True)
+    items = []
+    total_amount = 0.0
+    for product in products:
+        qty = int(quantities.get(product["id"]) or 0)
+        if qty <= 0:
+            continue
+        unit_price = float(product.get("price") or 0)
+        items.append((product["id"], product["name"], qty, unit_price, unit_price * qty))
+        total_amount += unit_price * qty
+
+    conn = rb.get_db_connection()
+    c = conn.cursor()
+    c.execute(
+        "INSERT INTO fb_sales (business_id, total_amount) VALUES (%s, %s) RETURNING id",
+        (business_id, total_amount),
+    )
+    sale_id = c.fetchone()["id"]
+    for item in items:
+        c.execute(
+            """
+            INSERT INTO fb_sale_items (sale_id, product_id, product_name_snapshot, quantity, unit_price, line_total)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            """,
+            (sale_id,) + item,
+        )
+    conn.commit()
+    conn.close()
+
+
+def current_close(business_id, quantities):
+    items, total_amount = rb.build_fb_sale_items(rb.get_fb_catalog(business_id), quantities)
+    conn = rb.get_db_connection()
+    c = conn.cursor()
+    rb.insert_fb_sale(c, business_id, total_amount, items)
+    conn.commit()
+    conn.close()
+
+
+def run(fn, business_id, baskets):
+    started = time.perf_counter()
+    for quantities in baskets:
+        fn(business_id, quantities)
+    return time.perf_counter() - started
+
+
+def time_report(business_id, repeat):
+    business = {"id": business_id, "timezone": "Asia/Beirut"}
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rb.compute_fb_report_metrics(business)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sales", type=int, default=500)
+    parser.add_argument("--items", type=int, default=4)
+    parser.add_argument("--business-id", type=int, default=-4242)
+    parser.add_argument("--report-repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    business_id = args.business_id
+    cleanup(business_id)
+    setup(business_id)
+    try:
+        baskets = make_baskets(business_id, args.sales, args.items)
+        legacy = run(legacy_close, business_id, baskets)
+        current = run(current_close, business_id, baskets)
+        report = time_report(business_id, args.report_repeat)
+    finally:
+        cleanup(business_id)
+
+    print(f"{args.sales} sales x {args.items} items")
+    for name, seconds in (("legacy", legacy), ("current", current)):
+        print(f"  {name:<8} {seconds * 1000:9.1f} ms  {args.sales / seconds:8.1f} sales/s")
+    print(f"  speedup  {legacy / current:9.1f}x")
+    print(f"  report   {report * 1000:9.1f} ms  (rollups, best of {args.report_repeat})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+"""
+Micro-benchmarks for the availability, parsing, reporting and reply hot paths.
+
+    python benchmarks/bench_hot_paths.py [--only NAME ...] [--tolerance 0.5]
+    python benchmarks/bench_hot_paths.py --update-baselines
+
+Each function is timed in isolation on a synthetic business (many
+resources, dense days, a long reservation history). Database reads are
+answered by an in-process stand-in that serves the fixture rows, so the
+numbers measure the Python side only and need no DATABASE_URL.
+
+Results are compared with benchmarks/baselines.json: a benchmark slower
+than baseline * (1 + tolerance) is reported as a regression and the script
+exits with status 1. Baselines are machine-specific; refresh them with
+--update-baselines on the machine that runs the comparison.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "postgresql://bench-stand-in")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Reservation_Bot as rb  # noqa: E402
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+BUSINESS_ID = 1
+RESOURCE_COUNT = 20
+RESERVATIONS_PER_DAY = 240
+HISTORY_SIZE = 50_000
+BENCH_DATE = "2030-06-12"
+
+SERVICE_ROWS = [
+    {"id": 10 + i, "name": name, "price": price, "duration_min": duration,
+     "sport_category": sport, "night_price": night, "capacity_units_used": units}
+    for i, (name, price, duration, sport, night, units) in enumerate([
+        ("Padel 1 hour", 30, 60, "padel", 40, 1),
+        ("Padel 90 min", 40, 90, "padel", 55, 1),
+        ("Padel 2 hours", 55, 120, "padel", None, 1),
+        ("Tennis full court 1 hour", 10, 60, "tennis", None, 2),
+        ("Basketball half court 1 hour", 12, 60, "basketball", None, 1),
+        ("Football 5v5", 60, 60, None, 70, 1),
+    ])
+][::-1]  # newest first, like ORDER BY id DESC
+
+RESOURCE_ROWS = [
+    {"id": 100 + i, "business_id": BUSINESS_ID, "name": f"Court {i + 1}", "resource_type": "court",
+     "capacity": 1 if i % 5 else 2, "is_active": True, "display_order": i, "color_tag": None}
+    for i in range(RESOURCE_COUNT)
+]
+
+BUSINESS = {"id": BUSINESS_ID, "name": "Bench club", "timezone": "Asia/Beirut", "access_token": "x",
+            "extension_pricing_mode": "tier_diff", "extension_flat_30_price": 10}
+
+
+def make_day_rows(rng):
+    rows = []
+    for i in range(RESERVATIONS_PER_DAY):
+        rows.append({
+            "id": i + 1,
+            "service": rng.choice(SERVICE_ROWS)["name"],
+            "time": f"{rng.randint(8, 21):02d}:{rng.choice(['00', '15', '30', '45'])}",
+            "resource_id": rng.choice(RESOURCE_ROWS)["id"],
+            "extra_minutes": rng.choice([0, 0, 0, 30]),
+            "status": "CONFIRMED",
+            "date": BENCH_DATE,
+        })
+    return rows
+
+
+def make_history(rng):
+    today = datetime.now().date()
+    statuses = ["CONFIRMED", "CANCELED", "DONE"]
+    return [
+        {
+            "service": rng.choice(SERVICE_ROWS)["name"],
+            "date": (today - timedelta(days=rng.randint(-14, 720))).isoformat(),
+            "time": f"{rng.randint(8, 22):02d}:{rng.choice(['00', '30'])}",
+            "status": rng.choice(statuses),
+            "extra_price": rng.choice([0, 0, 5]),
+            "resource_name_snapshot": rng.choice(RESOURCE_ROWS)["name"],
+        }
+        for _ in range(HISTORY_SIZE)
+    ]
+
+
+# ------------------ DB STAND-IN ------------------
+
+class StandInCursor:
+    def __init__(self, day_rows):
+        self.day_rows = day_rows
+        self.rows = []
+
+    def execute(self, sql, params=None):
+        self.rows = self.answer(" ".join(sql.split()), params or ())
+
+    def answer(self, sql, params):
+        if "FROM availability_versions" in sql or "FROM capacity_pools" in sql \
+                or "FROM service_capacity_pools" in sql or "FROM resource_services" in sql \
+                or "blocked_dates" in sql:
+            return []
+        if "FROM services" in sql:
+            if "lower(trim(name)) = lower(trim(%s))" in sql:
+                wanted = (params[1] or "").strip().lower()
+                return [r for r in SERVICE_ROWS if r["name"].strip().lower() == wanted][:1]
+            if "LIKE" in sql:
+                wanted = params[1].strip("%").lower()
+                return [r for r in SERVICE_ROWS if wanted in r["name"].lower()][:1]
+            return list(SERVICE_ROWS)
+        if "FROM resources" in sql:
+            if "WHERE id = %s" in sql:
+                return [r for r in RESOURCE_ROWS if r["id"] == params[0]]
+            return list(RESOURCE_ROWS)
+        if "FROM resource_hours" in sql or "FROM business_hours" in sql:
+            return [{"weekday": 0, "is_closed": False, "open_time": "08:00", "close_time": "23:00"}]
+        if "FROM reservations" in sql:
+            return list(self.day_rows)
+        return []
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+
+class StandInConnection:
+    def __init__(self, day_rows):
+        self.day_rows = day_rows
+
+    def cursor(self):
+        return StandInCursor(self.day_rows)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def install_stand_in(day_rows):
+    rb.get_db_connection = lambda: StandInConnection(day_rows)
+    for name in dir(rb):
+        if name.startswith("_") and name.endswith("_ready"):
+            setattr(rb, name, True)
+    rb.invalidate_compiled_business_data(BUSINESS_ID)
+
+
+# ------------------ BENCHMARKS ------------------
+
+def build_benchmarks():
+    rng = random.Random(2024)
+    day_rows = make_day_rows(rng)
+    history = make_history(rng)
+    install_stand_in(day_rows)
+
+    duration_cache = rb.build_service_duration_cache(BUSINESS_ID, day_rows, extra_service_names=["Padel 1 hour"])
+    resource = RESOURCE_ROWS[3]
+    times = [f"{h:02d}:{m:02d}" for h in range(8, 22) for m in (0, 15, 30, 45)]
+    time_inputs = ["7pm", "19:30", "7", "٧:٣٠", "10am", "9 30", "noon", "22h", "8", "3.45pm"]
+    date_inputs = ["tomorrow", "2030-06-12", "12/6", "12 June", "next friday", "١٢ حزيران", "demain", "friday"]
+    lang_inputs = ["Hello I want to book", "bonjour je veux réserver", "بدي احجز بكرا", "cancel my booking",
+                   "merci beaucoup", "7pm please"]
+    services = [dict(s) for s in SERVICE_ROWS]
+    tone_businesses = [
+        dict(BUSINESS, id=BUSINESS_ID + i, assistant_tone=tone, custom_welcome_message="Welcome to the club! 👋" if i % 2 else "")
+        for i, tone in enumerate(("friendly", "professional", "warm", "luxury"))
+    ]
+    render_from = rb.localization.render_from
+
+    def slot_full_fast():
+        for t in times:
+            rb.is_resource_slot_full_fast(BUSINESS_ID, resource, day_rows, duration_cache, t, "Padel 1 hour")
+
+    def resource_options():
+        rb.suggest_resource_options(BUSINESS_ID, BENCH_DATE, "18:00", "Padel 1 hour")
+
+    def time_parsing():
+        for value in time_inputs:
+            rb.normalize_time_str_with_hours(value, "08:00", "23:00")
+
+    def date_parsing():
+        for value in date_inputs:
+            try:
+                rb.normalize_booking_date(value)
+            except Exception:
+                pass
+
+    def report_metrics():
+        rb.compute_dashboard_report_metrics(BUSINESS, services, history)
+
+    def lang_detection():
+        for value in lang_inputs:
+            rb.detect_lang(value)
+
+    def reply_rendering():
+        # The replies of one booking conversation, rendered the way
+        # send_reply / send_reservation_confirmation do, for every tone.
+        for tone_business in tone_businesses:
+            templates = rb.get_reply_templates(tone_business)
+            tone = rb.get_business_tone(tone_business)
+            for lang in ("en", "fr", "ar"):
+                render_from(templates, lang, "greeting")
+                render_from(templates, lang, "ask_name")
+                render_from(templates, lang, "ask_service_list", name="Sam", services="• Padel 1 hour\n• Padel 90 min")
+                render_from(templates, lang, "ask_date", service="Padel 1 hour")
+                render_from(templates, lang, "ask_time")
+                rb.tr_confirmation(lang, "Sam", "Padel 1 hour", BENCH_DATE, "18:00", 30, True, "Court 4", tone=tone)
+
+    return {
+        "is_resource_slot_full_fast": (slot_full_fast, f"{len(times)} slots x {RESERVATIONS_PER_DAY} reservations"),
+        "suggest_resource_options": (resource_options, f"{RESOURCE_COUNT} resources, dense day"),
+        "normalize_time_str_with_hours": (time_parsing, f"{len(time_inputs)} inputs"),
+        "normalize_booking_date": (date_parsing, f"{len(date_inputs)} inputs"),
+        "compute_dashboard_report_metrics": (report_metrics, f"{HISTORY_SIZE} reservations"),
+        "detect_lang": (lang_detection, f"{len(lang_inputs)} inputs"),
+        "reply_rendering": (reply_rendering, "6 replies x 3 languages x 4 tones"),
+    }
+
+
+def time_call(fn, min_seconds=0.2, repeat=3):
+    """
+    Best-of-repeat milliseconds per call; each round runs for at least min_seconds.
+    """
+    fn()  # warm caches
+    best = None
+    for _ in range(repeat):
+        calls = 0
+        started = time.perf_counter()
+        while True:
+            fn()
+            calls += 1
+            elapsed = time.perf_counter() - started
+            if elapsed >= min_seconds:
+                break
+        per_call = elapsed / calls * 1000
+        best = per_call if best is None else min(best, per_call)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", nargs="*", help="benchmark names to run")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown vs baseline (0.5 = 50%%)")
+    parser.add_argument("--update-baselines", action="store_true")
+    parser.add_argument("--min-seconds", type=float, default=0.2)
+    args = parser.parse_args()
+
+    benchmarks = build_benchmarks()
+    if args.only:
+        unknown = set(args.only) - set(benchmarks)
+        if unknown:
+            parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+        benchmarks = {name: benchmarks[name] for name in args.only}
+
+    baselines = {}
+    if os.path.exists(BASELINES_PATH):
+        with open(BASELINES_PATH, encoding="utf-8") as f:
+            baselines = json.load(f)
+
+    results = {}
+    regressions = []
+    print(f"{'benchmark':<34} {'ms/call':>10} {'baseline':>10} {'ratio':>7}  workload")
+    for name, (fn, workload) in benchmarks.items():
+        with contextlib.redirect_stdout(io.StringIO()):
+            ms = time_call(fn, min_seconds=args.min_seconds)
+        results[name] = round(ms, 4)
+        baseline = baselines.get(name)
+        if baseline:
+            ratio = ms / baseline
+            flag = "  REGRESSION" if ratio > 1 + args.tolerance else ""
+            if flag:
+                regressions.append(name)
+            print(f"{name:<34} {ms:10.3f} {baseline:10.3f} {ratio:6.2f}x  {workload}{flag}")
+        else:
+            print(f"{name:<34} {ms:10.3f} {'-':>10} {'-':>7}  {workload}")
+
+    if args.update_baselines:
+        baselines.update(results)
+        with open(BASELINES_PATH, "w", encoding="utf-8") as f:
+            json.dump(dict(sorted(baselines.items())), f, indent=2)
+            f.write("\n")
+        print(f"baselines written to {BASELINES_PATH}")
+        return
+
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
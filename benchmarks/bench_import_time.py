@@ -0,0 +1,127 @@
+"""
+Cold-start import time of the app, measured in fresh interpreters.
+
+    python benchmarks/bench_import_time.py [--runs 7] [--top 15] [--tolerance 0.5]
+    python benchmarks/bench_import_time.py --update-baselines
+
+Each run starts a new `python -X importtime -c "import Reservation_Bot"`,
+which is what every gunicorn worker (without preload) and every
+autoscaled instance pays before it can serve a request. Prints the median
+import time and the slowest top-level imports of the median run, and
+fails if a module that should load lazily (the Google client libraries,
+dateutil, asyncio) was imported.
+
+The median is compared with the "import_reservation_bot" entry of
+benchmarks/baselines.json, like bench_hot_paths.py: slower than
+baseline * (1 + tolerance) exits with status 1.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINES_PATH = os.path.join(REPO_DIR, "benchmarks", "baselines.json")
+BASELINE_KEY = "import_reservation_bot"
+
+LAZY_MODULES = [
+    "asyncio",
+    "googleapiclient.discovery",
+    "google.oauth2.credentials",
+    "google_auth_oauthlib.flow",
+    "dateutil.parser",
+]
+
+PROBE = (
+    "import json, sys\n"
+    "import Reservation_Bot\n"
+    f"print(json.dumps(sorted(m for m in {LAZY_MODULES!r} if m in sys.modules)))\n"
+)
+
+
+def run_once():
+    """
+    (total ms, {top-level module: cumulative ms}, eagerly loaded lazy modules)
+    """
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "postgresql://bench-stand-in")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=REPO_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    total_ms = None
+    modules = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # header line
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        ms = int(cumulative) / 1000.0
+        if name == "Reservation_Bot":
+            total_ms = ms
+        elif depth == 1:
+            modules[name] = ms
+
+    eager = json.loads(proc.stdout.strip().splitlines()[-1])
+    return total_ms, modules, eager
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--top", type=int, default=15, help="slowest top-level imports to list")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown vs baseline (0.5 = 50%%)")
+    parser.add_argument("--update-baselines", action="store_true")
+    args = parser.parse_args()
+
+    run_once()  # warm the .pyc and filesystem caches
+    runs = sorted((run_once() for _ in range(args.runs)), key=lambda run: run[0])
+    median_ms, modules, eager = runs[len(runs) // 2]
+
+    print(f"import Reservation_Bot: median {median_ms:.1f} ms over {args.runs} runs "
+          f"(min {runs[0][0]:.1f}, max {runs[-1][0]:.1f}, stdev {statistics.pstdev(r[0] for r in runs):.1f})")
+    print(f"\n{'module':<34} {'cumulative ms':>14}")
+    for name, ms in sorted(modules.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"{name:<34} {ms:14.1f}")
+
+    baselines = {}
+    if os.path.exists(BASELINES_PATH):
+        with open(BASELINES_PATH, encoding="utf-8") as f:
+            baselines = json.load(f)
+
+    if args.update_baselines:
+        baselines[BASELINE_KEY] = round(median_ms, 1)
+        with open(BASELINES_PATH, "w", encoding="utf-8") as f:
+            json.dump(dict(sorted(baselines.items())), f, indent=2)
+            f.write("\n")
+        print(f"\nbaseline written to {BASELINES_PATH}")
+
+    failed = False
+    if eager:
+        print(f"\nimported eagerly but should load on first use: {', '.join(eager)}")
+        failed = True
+
+    baseline = baselines.get(BASELINE_KEY)
+    if baseline and not args.update_baselines:
+        ratio = median_ms / baseline
+        print(f"\nbaseline {baseline:.1f} ms, ratio {ratio:.2f}x")
+        if ratio > 1 + args.tolerance:
+            print("REGRESSION")
+            failed = True
+
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Report computation benchmark on a synthetic tenant.
+
+    python benchmarks/bench_reports.py [--reservations 100000]
+
+Compares the row-by-row reservation report loop the dashboard used before
+(strptime, fuzzy service lookup and price resolution per row) with
+report_engine's columnar passes. Runs fully in memory: the old path's
+per-row service queries are replaced by an in-memory scan, so the
+real-world gap is larger than what this prints. The F&B report is
+aggregated in SQL from daily rollups; bench_fb_sales.py times it.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import report_engine  # noqa: E402
+
+TZ = pytz.timezone("Asia/Beirut")
+
+SERVICES = [
+    {"name": f"Service {i}", "price": 10 + i, "night_price": (15 + i) if i % 3 == 0 else None}
+    for i in range(40)
+]
+SERVICE_NAMES = [s["name"] for s in SERVICES] + ["service 3", "Unknown"]
+STATUSES = ["CONFIRMED", "CANCELED", "DONE"]
+RESOURCES = [f"Court {i}" for i in range(1, 9)] + [None]
+
+
+def make_reservations(n, today):
+    rng = random.Random(42)
+    rows = []
+    for _ in range(n):
+        rows.append({
+            "service": rng.choice(SERVICE_NAMES),
+            "date": (today - timedelta(days=rng.randint(-14, 365))).isoformat(),
+            "time": f"{rng.randint(8, 23):02d}:{rng.choice(['00', '15', '30', '45'])}",
+            "status": rng.choice(STATUSES),
+            "extra_price": rng.choice([0, 0, 0, 5]),
+            "resource_name_snapshot": rng.choice(RESOURCES),
+        })
+    return rows
+
+
+def lookup_service(name):
+    cleaned = (name or "").strip().lower()
+    for s in SERVICES:
+        if s["name"].strip().lower() == cleaned:
+            return s
+    for s in SERVICES:
+        if cleaned in s["name"].lower():
+            return s
+    return None
+
+
+def price_for(name, time_str):
+    row = lookup_service(name)
+    if row and time_str >= "19:00" and row["night_price"] is not None:
+        return float(row["night_price"])
+    return float(row["price"]) if row else 0.0
+
+
+def legacy_reservation_report(rows, today):
+    def summarize(subset):
+        service_counts, resource_counts = {}, {}
+        booked = done_rev = 0.0
+        counts = {"CONFIRMED": 0, "CANCELED": 0, "DONE": 0}
+        for r in subset:
+            status = (r.get("status") or "").upper()
+            if status in counts:
+                counts[status] += 1
+            price = price_for(r["service"], r["time"]) + float(r.get("extra_price") or 0)
+            if status in ("CONFIRMED", "DONE"):
+                booked += price
+            if status == "DONE":
+                done_rev += price
+            name = (r.get("service") or "").strip()
+            if name:
+                service_counts[name] = service_counts.get(name, 0) + 1
+            res = (r.get("resource_name_snapshot") or "").strip()
+            if res:
+                resource_counts[res] = resource_counts.get(res, 0) + 1
+        return booked, done_rev, counts, service_counts, resource_counts
+
+    overall = summarize(rows)
+    current_start = today - timedelta(days=6)
+    previous_start = today - timedelta(days=13)
+    previous_end = today - timedelta(days=7)
+    current, previous = [], []
+    for r in rows:
+        d = datetime.strptime(r["date"], "%Y-%m-%d").date()
+        if current_start <= d <= today:
+            current.append(r)
+        elif previous_start <= d <= previous_end:
+            previous.append(r)
+    return overall, summarize(current), summarize(previous)
+
+
+def engine_reservation_report(rows, today):
+    windows = report_engine.week_windows(today)
+    columns = report_engine.build_reservation_columns(rows, price_for, windows)
+    return (
+        report_engine.summarize_reservation_columns(columns),
+        report_engine.summarize_reservation_columns(columns, report_engine.BUCKET_CURRENT),
+        report_engine.summarize_reservation_columns(columns, report_engine.BUCKET_PREVIOUS),
+    )
+
+
+def best_of(fn, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--reservations", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    today = datetime.now(TZ).date()
+    rows = make_reservations(args.reservations, today)
+
+    results = [
+        ("reservations legacy", best_of(legacy_reservation_report, rows, today, repeat=args.repeat)),
+        ("reservations engine", best_of(engine_reservation_report, rows, today, repeat=args.repeat)),
+    ]
+
+    print(f"{args.reservations} reservations (best of {args.repeat})")
+    for name, seconds in results:
+        print(f"  {name:<22} {seconds * 1000:9.1f} ms")
+    print(f"  reservations speedup   {results[0][1] / results[1][1]:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+HTTP throughput of the Flask dev server vs the gunicorn entry point.
+
+    DATABASE_URL=postgresql://... python benchmarks/bench_server_throughput.py \
+        [--servers dev gunicorn] [--clients 32] [--seconds 15] [--json out.json]
+
+Starts each server as its own process (`python Reservation_Bot.py`, then
+`gunicorn -c gunicorn.conf.py`) on a free port and drives it over real
+HTTP with --clients concurrent keep-alive clients for --seconds. The
+request mix needs no outbound calls:
+- webhook text messages that start no conversation (dedup check, business
+  routing, intent classification);
+- delivery-status callbacks;
+- /api/availability for a logged-in dashboard user (the availability
+  engine, several queries per request).
+
+A scratch business and user are created in DATABASE_URL and deleted at the
+end. Do not point this at production.
+
+Prints requests per second, p50/p95/p99 latency and errors per server.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import loadtest_webhook as loadtest  # noqa: E402
+from loadtest_webhook import rb  # noqa: E402
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "bench-password"
+# Texts the bot answers with nothing, so no request leaves the machine.
+NO_OP_TEXTS = ["ok", "👍", "thanks", "hmm", "later maybe"]
+
+SERVER_COMMANDS = {
+    "dev": [sys.executable, "Reservation_Bot.py"],
+    "gunicorn": [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def create_user(business_id, email):
+    conn = rb.get_db_connection()
+    c = conn.cursor()
+    c.execute(
+        "INSERT INTO users (email, password_hash, business_id, role) VALUES (%s, %s, %s, 'business')",
+        (email, rb.generate_password_hash(PASSWORD), business_id),
+    )
+    conn.commit()
+    conn.close()
+
+
+def start_server(name, port):
+    env = dict(os.environ, PORT=str(port), LOG_LEVEL="WARNING")
+    proc = subprocess.Popen(
+        SERVER_COMMANDS[name],
+        cwd=REPO_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{name} server exited with status {proc.returncode}")
+        try:
+            requests.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return proc
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"{name} server did not start within 60s")
+
+
+def stop_server(proc):
+    proc.terminate()
+    try:
+        proc.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+
+
+def run_client(base_url, phone_number_id, email, seconds, seed, start, latencies, errors, lock):
+    rng = random.Random(seed)
+    http = requests.Session()
+    http.post(f"{base_url}/login", data={"username": email, "password": PASSWORD}, allow_redirects=False)
+    days = [(date.today() + timedelta(days=d)).isoformat() for d in range(1, 8)]
+    # Password hashing on login is slow by design; keep it out of the window.
+    start.wait()
+
+    local, failed = [], 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        kind = rng.random()
+        started = time.perf_counter()
+        try:
+            if kind < 0.5:
+                payload = loadtest.webhook_payload(
+                    phone_number_id, f"9617{rng.randint(1000000, 9999999)}", rng.choice(NO_OP_TEXTS),
+                    f"wamid.{uuid.uuid4().hex}",
+                )
+                response = http.post(f"{base_url}/webhook", json=payload, timeout=30)
+            elif kind < 0.7:
+                payload = {"entry": [{"changes": [{"value": {"statuses": [{"id": uuid.uuid4().hex, "status": "read"}]}}]}]}
+                response = http.post(f"{base_url}/webhook", json=payload, timeout=30)
+            else:
+                response = http.get(
+                    f"{base_url}/api/availability",
+                    params={"date": rng.choice(days), "service": rng.choice(loadtest.SERVICES)[0]},
+                    timeout=30,
+                )
+            if response.status_code != 200:
+                failed += 1
+        except requests.RequestException:
+            failed += 1
+        local.append((time.perf_counter() - started) * 1000)
+
+    with lock:
+        latencies.extend(local)
+        errors[0] += failed
+
+
+def measure(name, args, phone_number_id, email):
+    port = free_port()
+    proc = start_server(name, port)
+    try:
+        latencies, errors, lock = [], [0], threading.Lock()
+        clock = {}
+        start = threading.Barrier(args.clients, action=lambda: clock.setdefault("started", time.perf_counter()))
+        threads = [
+            threading.Thread(
+                target=run_client,
+                args=(f"http://127.0.0.1:{port}", phone_number_id, email, args.seconds, args.seed + i,
+                      start, latencies, errors, lock),
+            )
+            for i in range(args.clients)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - clock["started"]
+    finally:
+        stop_server(proc)
+
+    latencies.sort()
+    return {
+        "server": name,
+        "requests": len(latencies),
+        "errors": errors[0],
+        "requests_per_sec": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(loadtest.percentile(latencies, 50), 1),
+        "p95_ms": round(loadtest.percentile(latencies, 95), 1),
+        "p99_ms": round(loadtest.percentile(latencies, 99), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--servers", nargs="+", choices=list(SERVER_COMMANDS), default=list(SERVER_COMMANDS))
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=15.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", dest="json_path")
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        parser.error("DATABASE_URL is not set")
+
+    phone_number_id = f"bench-{os.getpid()}"
+    email = f"bench-{os.getpid()}@example.invalid"
+    business_id = loadtest.setup_business(phone_number_id)
+    results = []
+    try:
+        create_user(business_id, email)
+        for name in args.servers:
+            results.append(measure(name, args, phone_number_id, email))
+    finally:
+        conn = rb.get_db_connection()
+        c = conn.cursor()
+        c.execute("DELETE FROM users WHERE email = %s", (email,))
+        conn.commit()
+        conn.close()
+        loadtest.cleanup_business(business_id)
+
+    print(f"{args.clients} clients, {args.seconds:.0f}s per server")
+    print(f"{'server':<10} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for r in results:
+        print(f"{r['server']:<10} {r['requests_per_sec']:8.1f} {r['p50_ms']:8.1f} {r['p95_ms']:8.1f} "
+              f"{r['p99_ms']:8.1f} {r['errors']:7d}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"clients": args.clients, "seconds": args.seconds, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
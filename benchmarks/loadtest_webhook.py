@@ -0,0 +1,312 @@
+"""
+Replays synthetic WhatsApp webhook traffic against /webhook.
+
+    DATABASE_URL=postgresql://... python benchmarks/loadtest_webhook.py \
+        [--conversations 200] [--concurrency 8] [--dup-rate 0.05] [--json out.json] \
+        [--mode sync|async] [--send-delay-ms 0]
+
+Generates Meta webhook payloads for complete booking conversations in
+English, French and Arabic, some followed by a reschedule or a cancel, and
+re-delivers a share of messages with the same id like Meta does on retries.
+Requests go through the Flask test client, so the whole webhook path runs
+in-process against the database in DATABASE_URL. Outbound side effects are
+replaced for the run: WhatsApp sends, OpenRouter and Google Calendar.
+
+A scratch business (phone_number_id "loadtest-<pid>") is created and deleted
+at the end unless --keep is given. Do not point this at production.
+
+--mode async runs with WEBHOOK_MODE=async: latencies are then the time to
+acknowledge Meta, and the run ends when the pipeline has drained.
+--send-delay-ms makes each stubbed WhatsApp send and calendar call sleep,
+standing in for Graph / Google round trips.
+
+Prints p50/p95/p99 latency, messages per second and DB queries per message;
+--json writes the same numbers for regression tracking.
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import date, timedelta
+
+import psycopg2
+import psycopg2.extras
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Reservation_Bot as rb  # noqa: E402
+
+SERVICES = [("Padel 1 hour", 30, 60), ("Padel 90 min", 40, 90), ("Tennis 1 hour", 10, 60)]
+RESOURCES = ["Court 1", "Court 2", "Court 3", "Court 4"]
+
+SCRIPTS = {
+    "en": {"greet": "hi", "book": "I want to book", "reschedule": "reschedule", "cancel": "cancel",
+           "names": ["John", "Sarah", "Mike", "Emma"]},
+    "fr": {"greet": "bonjour", "book": "je veux reserver", "reschedule": "reporter reservation", "cancel": "annuler",
+           "names": ["Julien", "Camille", "Louis", "Chloé"]},
+    "ar": {"greet": "مرحبا", "book": "بدي احجز", "reschedule": "غير الحجز", "cancel": "الغاء",
+           "names": ["أحمد", "ليلى", "كريم", "نور"]},
+}
+
+
+# ------------------ DB QUERY COUNTING ------------------
+
+query_count = 0
+query_count_lock = threading.Lock()
+
+
+class CountingCursor(psycopg2.extras.RealDictCursor):
+    def execute(self, query, vars=None):
+        global query_count
+        with query_count_lock:
+            query_count += 1
+        return super().execute(query, vars)
+
+
+def counting_connection():
+    return psycopg2.connect(os.environ["DATABASE_URL"], cursor_factory=CountingCursor)
+
+
+# ------------------ SIDE EFFECT STUBS ------------------
+
+def install_stubs(send_delay_ms=0):
+    def network_call(result):
+        def call(*args, **kwargs):
+            if send_delay_ms:
+                time.sleep(send_delay_ms / 1000.0)
+            return result
+        return call
+
+    rb.get_db_connection = counting_connection
+    rb.send_message = network_call(None)
+    rb.OPENROUTER_API_KEY = ""
+    rb.add_reservation_to_google_calendar = network_call(None)
+    rb.create_event = network_call(None)
+    rb.delete_event = network_call(True)
+    rb.delete_events = network_call(set())
+
+
+# ------------------ SCRATCH BUSINESS ------------------
+
+def setup_business(phone_number_id):
+    rb.init_db()
+    rb.ensure_multi_business_whatsapp_columns()
+    rb.ensure_business_feature_columns()
+    rb.ensure_reservation_extension_columns()
+    rb.ensure_resource_availability_tables()
+
+    conn = rb.get_db_connection()
+    c = conn.cursor()
+    c.execute(
+        """
+        INSERT INTO businesses (name, phone_number_id, access_token, timezone)
+        VALUES ('Load test club', %s, 'loadtest', 'Asia/Beirut')
+        RETURNING id
+        """,
+        (phone_number_id,),
+    )
+    business_id = c.fetchone()["id"]
+    for name, price, duration in SERVICES:
+        c.execute(
+            "INSERT INTO services (business_id, name, price, duration_min) VALUES (%s, %s, %s, %s)",
+            (business_id, name, price, duration),
+        )
+    resource_ids = []
+    for order, name in enumerate(RESOURCES):
+        c.execute(
+            """
+            INSERT INTO resources (business_id, name, resource_type, capacity, is_active, display_order)
+            VALUES (%s, %s, 'court', 1, TRUE, %s)
+            RETURNING id
+            """,
+            (business_id, name, order),
+        )
+        resource_ids.append(c.fetchone()["id"])
+    conn.commit()
+    conn.close()
+
+    rb.ensure_default_hours(business_id)
+    for resource_id in resource_ids:
+        rb.ensure_default_resource_hours(resource_id, business_id)
+    return business_id
+
+
+def cleanup_business(business_id):
+    conn = rb.get_db_connection()
+    c = conn.cursor()
+    for table in ("reservations", "resource_hours", "resource_services", "resources",
+                  "services", "business_hours", "availability_versions"):
+        c.execute(f"DELETE FROM {table} WHERE business_id = %s", (business_id,))
+    c.execute("DELETE FROM businesses WHERE id = %s", (business_id,))
+    conn.commit()
+    conn.close()
+
+
+# ------------------ TRAFFIC ------------------
+
+def webhook_payload(phone_number_id, phone, text, message_id):
+    return {
+        "object": "whatsapp_business_account",
+        "entry": [{
+            "id": "loadtest",
+            "changes": [{
+                "field": "messages",
+                "value": {
+                    "messaging_product": "whatsapp",
+                    "metadata": {"display_phone_number": "0000", "phone_number_id": phone_number_id},
+                    "contacts": [{"profile": {"name": "Load test"}, "wa_id": phone}],
+                    "messages": [{
+                        "from": phone,
+                        "id": message_id,
+                        "timestamp": str(int(time.time())),
+                        "type": "text",
+                        "text": {"body": text},
+                    }],
+                },
+            }],
+        }],
+    }
+
+
+def build_conversation(rng, index):
+    lang = rng.choice(list(SCRIPTS))
+    script = SCRIPTS[lang]
+    day = (date.today() + timedelta(days=rng.randint(1, 14))).isoformat()
+    messages = [
+        script["greet"],
+        script["book"],
+        rng.choice(script["names"]),
+        rng.choice(SERVICES)[0],
+        day,
+        f"{rng.randint(9, 17):02d}:{rng.choice(['00', '30'])}",
+    ]
+    follow_up = rng.random()
+    if follow_up < 0.25:
+        new_day = (date.today() + timedelta(days=rng.randint(1, 14))).isoformat()
+        messages += [script["reschedule"], new_day, f"{rng.randint(9, 17):02d}:00"]
+    elif follow_up < 0.4:
+        messages.append(script["cancel"])
+    return {"phone": f"961{70000000 + index}", "lang": lang, "messages": messages}
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100.0
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+def run_worker(conversations, phone_number_id, dup_rate, seed, latencies, lock):
+    rng = random.Random(seed)
+    client = rb.app.test_client()
+    local = []
+    for conversation in conversations:
+        for text in conversation["messages"]:
+            message_id = f"wamid.{uuid.uuid4().hex}"
+            deliveries = 2 if rng.random() < dup_rate else 1
+            for _ in range(deliveries):
+                payload = webhook_payload(phone_number_id, conversation["phone"], text, message_id)
+                started = time.perf_counter()
+                client.post("/webhook", json=payload)
+                local.append((time.perf_counter() - started) * 1000)
+    with lock:
+        latencies.extend(local)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--conversations", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--dup-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", dest="json_path")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch business and its data")
+    parser.add_argument("--verbose", action="store_true", help="show the app's own logging")
+    parser.add_argument("--mode", choices=["sync", "async"], default="sync", help="WEBHOOK_MODE to run with")
+    parser.add_argument("--send-delay-ms", type=float, default=0.0,
+                        help="simulated latency of each WhatsApp send / calendar call")
+    args = parser.parse_args()
+
+    if not os.getenv("DATABASE_URL"):
+        parser.error("DATABASE_URL is not set")
+
+    os.environ["WEBHOOK_MODE"] = args.mode
+    install_stubs(args.send_delay_ms)
+    phone_number_id = f"loadtest-{os.getpid()}"
+    business_id = setup_business(phone_number_id)
+
+    rng = random.Random(args.seed)
+    conversations = [build_conversation(rng, i) for i in range(args.conversations)]
+    shards = [conversations[i::args.concurrency] for i in range(args.concurrency)]
+
+    global query_count
+    query_count = 0
+    latencies = []
+    lock = threading.Lock()
+    log_sink = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    if not args.verbose:
+        logging.getLogger("reservation_bot").setLevel(logging.WARNING)
+
+    try:
+        with log_sink:
+            started = time.perf_counter()
+            threads = [
+                threading.Thread(
+                    target=run_worker,
+                    args=(shard, phone_number_id, args.dup_rate, args.seed + i, latencies, lock),
+                )
+                for i, shard in enumerate(shards)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            if args.mode == "async" and not rb.async_pipeline.wait_idle(timeout=600):
+                print("async pipeline did not drain within 600s", file=sys.stderr)
+            elapsed = time.perf_counter() - started
+    finally:
+        if not args.keep:
+            cleanup_business(business_id)
+
+    latencies.sort()
+    count = len(latencies)
+    result = {
+        "conversations": args.conversations,
+        "concurrency": args.concurrency,
+        "mode": args.mode,
+        "send_delay_ms": args.send_delay_ms,
+        "messages": count,
+        "seconds": round(elapsed, 3),
+        "messages_per_sec": round(count / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "max_ms": round(latencies[-1], 1) if latencies else 0.0,
+        "db_queries": query_count,
+        "db_queries_per_message": round(query_count / count, 2) if count else 0.0,
+    }
+
+    print(f"{count} messages from {args.conversations} conversations, concurrency {args.concurrency}, "
+          f"{args.mode} mode")
+    print(f"  throughput     {result['messages_per_sec']:8.1f} msg/s")
+    print(f"  latency p50    {result['p50_ms']:8.1f} ms")
+    print(f"  latency p95    {result['p95_ms']:8.1f} ms")
+    print(f"  latency p99    {result['p99_ms']:8.1f} ms")
+    print(f"  db queries/msg {result['db_queries_per_message']:8.2f}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
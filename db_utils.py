@@ -1,18 +1,181 @@
 import os
+import threading
+import time
 import psycopg2
+import psycopg2.extensions
 import psycopg2.extras
+import metrics
+import sql_profiler
 
 # Render will use the DATABASE_URL environment variable
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Per-process connection pool. With DB_POOL_SIZE > 0, conn.close() hands a
+# healthy connection back to the pool instead of disconnecting, and
+# get_db_connection() reuses it, so the open/close-per-helper pattern
+# stops paying a connect + auth round trip per query. Off by default (the
+# dev server); gunicorn.conf.py turns it on. Connections idle longer than
+# DB_POOL_MAX_IDLE_SECONDS are dropped rather than reused, and one idle
+# longer than DB_POOL_CHECK_AFTER_SECONDS is pinged before it is handed out.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE") or 0)
+DB_POOL_MAX_IDLE_SECONDS = int(os.getenv("DB_POOL_MAX_IDLE_SECONDS") or 300)
+DB_POOL_CHECK_AFTER_SECONDS = float(os.getenv("DB_POOL_CHECK_AFTER_SECONDS") or 2)
+
+_pool_lock = threading.Lock()
+_pool_idle = []  # [(connection, released_at)]
+_pool_inherited = []
+_pool_pid = os.getpid()
+
+
+class InstrumentedCursor(psycopg2.extras.RealDictCursor):
+    """
+    RealDictCursor that reports each statement's duration to metrics and,
+    while a request is being profiled, to sql_profiler. execute_values and
+    friends go through execute() too.
+    """
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.record_db_query(elapsed)
+            sql_profiler.record(query, elapsed)
+
+
+class PooledConnection(psycopg2.extensions.connection):
+    """
+    close() returns the connection to the pool when there is room, after
+    rolling back whatever the caller left open. Also runs the callbacks
+    registered with on_commit() once the transaction commits.
+    """
+
+    def commit(self):
+        super().commit()
+        callbacks = self.__dict__.pop("_after_commit", ())
+        for callback in callbacks:
+            callback()
+
+    def rollback(self):
+        self.__dict__.pop("_after_commit", None)
+        super().rollback()
+
+    def close(self):
+        self.__dict__.pop("_after_commit", None)
+        if not _release_to_pool(self):
+            super().close()
+
+    def disconnect(self):
+        super().close()
+
+
+def on_commit(conn, callback):
+    """
+    Runs callback() after conn's current transaction commits, so in-memory
+    caches are only dropped once other connections can see the new rows. A
+    rollback or close discards it; a connection that is not ours runs it
+    at once.
+    """
+    if isinstance(conn, PooledConnection):
+        conn.__dict__.setdefault("_after_commit", []).append(callback)
+    else:
+        callback()
+
+
+def _release_to_pool(conn):
+    if not DB_POOL_SIZE or conn.closed or _pool_pid != os.getpid():
+        return False
+    try:
+        if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        if conn.autocommit:
+            conn.autocommit = False
+    except psycopg2.Error:
+        return False
+    with _pool_lock:
+        if len(_pool_idle) >= DB_POOL_SIZE:
+            return False
+        _pool_idle.append((conn, time.monotonic()))
+    return True
+
+
+def _is_alive(conn):
+    """
+    A pooled connection can die while idle (server restart, idle-session
+    kill). Checks one that sat unused for a while with a round trip.
+    """
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extensions.cursor) as cur:
+            cur.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def _take_from_pool():
+    while True:
+        now = time.monotonic()
+        with _pool_lock:
+            if _pool_pid != os.getpid() or not _pool_idle:
+                return None
+            conn, released_at = _pool_idle.pop()
+        if conn.closed:
+            continue
+        idle_for = now - released_at
+        if idle_for <= DB_POOL_CHECK_AFTER_SECONDS:
+            return conn
+        if idle_for <= DB_POOL_MAX_IDLE_SECONDS and _is_alive(conn):
+            return conn
+        try:
+            conn.disconnect()
+        except psycopg2.Error:
+            pass
+
+
+def close_pool():
+    """
+    Disconnects every idle connection. gunicorn calls this in the master
+    before forking, so no worker inherits a socket opened during preload.
+    """
+    with _pool_lock:
+        idle = [conn for conn, _ in _pool_idle]
+        _pool_idle.clear()
+    for conn in idle:
+        try:
+            conn.disconnect()
+        except psycopg2.Error:
+            pass
+
+
+def reset_pool():
+    """
+    Starts an empty pool owned by the current process (gunicorn post_fork).
+    Inherited entries are set aside, never closed or garbage collected:
+    their sockets belong to the parent, and closing them here would end the
+    parent's sessions.
+    """
+    global _pool_pid
+    with _pool_lock:
+        _pool_inherited.extend(_pool_idle)
+        _pool_idle.clear()
+        _pool_pid = os.getpid()
+
 
 def get_db_connection():
     if not DATABASE_URL:
         raise Exception("DATABASE_URL not set. Add it in Render Environment Variables")
 
+    if DB_POOL_SIZE:
+        conn = _take_from_pool()
+        if conn is not None:
+            return conn
+
     conn = psycopg2.connect(
         DATABASE_URL,
-        cursor_factory=psycopg2.extras.RealDictCursor,
+        cursor_factory=InstrumentedCursor,
+        connection_factory=PooledConnection,
     )
     return conn
 
@@ -0,0 +1,81 @@
+# event_bus.py
+import itertools
+import queue
+import threading
+
+# In-process pub/sub used to push reservation changes to shop mode screens.
+# Each subscriber gets its own bounded queue; a slow screen never blocks the
+# write path that publishes the event.
+
+SUBSCRIBER_QUEUE_SIZE = 200
+
+_lock = threading.Lock()
+_subscribers = {}  # key: business_id -> set of queue.Queue
+_event_ids = itertools.count(1)
+
+
+def subscribe(business_id, max_total=None):
+    """
+    Returns the subscriber queue, or None when max_total subscribers (across
+    all businesses) are already open in this process.
+    """
+    q = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+    with _lock:
+        if max_total and sum(len(s) for s in _subscribers.values()) >= max_total:
+            return None
+        _subscribers.setdefault(business_id, set()).add(q)
+    return q
+
+
+def unsubscribe(business_id, q):
+    with _lock:
+        subscribers = _subscribers.get(business_id)
+        if not subscribers:
+            return
+        subscribers.discard(q)
+        if not subscribers:
+            _subscribers.pop(business_id, None)
+
+
+def subscriber_count(business_id=None):
+    with _lock:
+        if business_id is None:
+            return sum(len(s) for s in _subscribers.values())
+        return len(_subscribers.get(business_id, ()))
+
+
+def publish(business_id, event_type, payload=None):
+    """
+    Fan an event out to every subscriber of the business.
+    Returns the number of queues that received it.
+    """
+    with _lock:
+        subscribers = list(_subscribers.get(business_id, ()))
+
+    if not subscribers:
+        return 0
+
+    event = {
+        "id": next(_event_ids),
+        "type": event_type,
+        "payload": payload or {},
+    }
+
+    delivered = 0
+    for q in subscribers:
+        try:
+            q.put_nowait(event)
+            delivered += 1
+        except queue.Full:
+            # The screen fell behind: drop its backlog and ask it to resync.
+            try:
+                while True:
+                    q.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                q.put_nowait({"id": next(_event_ids), "type": "resync", "payload": {}})
+            except queue.Full:
+                pass
+
+    return delivered
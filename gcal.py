@@ -5,16 +5,19 @@ import tempfile
 import atexit
 from datetime import datetime, timedelta
 import pytz
-from dateutil import parser as dtparse
-from googleapiclient.discovery import build
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
 import re
+from log_utils import get_logger
+import metrics
+
+# The Google client libraries (and dateutil) are imported inside the
+# functions that use them: together they are about a third of the app's
+# import time, and most processes never touch the calendar before their
+# first booking.
 
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
 TIMEZONE = "Asia/Beirut"
 _TEMP_FILES = []
+log = get_logger("gcal")
 
 
 def _cleanup_temp_files():
@@ -57,14 +60,28 @@ def _get_credentials_file_path():
     return None, None
 
 
+def preload_clients():
+    """
+    Imports the Google client libraries now instead of in the first calendar
+    call. create_app does this in a preloading gunicorn master, so workers
+    inherit the modules rather than importing them inside a booking.
+    """
+    import google.auth.transport.requests  # noqa: F401
+    import google.oauth2.credentials  # noqa: F401
+    import googleapiclient.discovery  # noqa: F401
+    from dateutil import parser  # noqa: F401
+
+
 def _load_token_credentials():
+    from google.oauth2.credentials import Credentials
+
     env_token_json = (os.getenv("GOOGLE_TOKEN_JSON") or "").strip()
     if env_token_json:
         try:
             info = json.loads(env_token_json)
             return Credentials.from_authorized_user_info(info, SCOPES), "env_json", None
         except Exception as e:
-            print("GCAL token env parse error:", e)
+            log.warning("token env parse error: %s", e)
 
     env_token_path = (os.getenv("GOOGLE_TOKEN_PATH") or "").strip()
     if env_token_path and os.path.exists(env_token_path):
@@ -101,28 +118,29 @@ def is_google_calendar_connected():
 
 
 def _service(allow_interactive=False):
+    from google.auth.transport.requests import Request
+    from googleapiclient.discovery import build
+
     creds, token_source, token_path = _load_token_credentials()
     credentials_path, credentials_source = _get_credentials_file_path()
 
-    print(
-        "GCAL credential sources:",
-        {
-            "token_source": token_source,
-            "credentials_source": credentials_source,
-            "render": _is_render_environment(),
-        },
+    log.debug(
+        "credential sources: token=%s credentials=%s render=%s",
+        token_source,
+        credentials_source,
+        _is_render_environment(),
     )
 
     if creds and not creds.valid:
         if creds.expired and creds.refresh_token:
-            print("GCAL refreshing expired token")
+            log.info("refreshing expired token")
             creds.refresh(Request())
             if token_path:
                 try:
                     with open(token_path, "w") as f:
                         f.write(creds.to_json())
                 except Exception as e:
-                    print("GCAL token save warning:", e)
+                    log.warning("token save warning: %s", e)
         else:
             creds = None
 
@@ -134,6 +152,8 @@ def _service(allow_interactive=False):
         if not credentials_path:
             raise RuntimeError("Missing credentials.json for Google Calendar OAuth.")
 
+        from google_auth_oauthlib.flow import InstalledAppFlow
+
         flow = InstalledAppFlow.from_client_secrets_file(credentials_path, SCOPES)
         creds = flow.run_local_server(port=0)
 
@@ -141,7 +161,7 @@ def _service(allow_interactive=False):
             with open("token.json", "w") as f:
                 f.write(creds.to_json())
         except Exception as e:
-            print("GCAL token save warning:", e)
+            log.warning("token save warning: %s", e)
 
     return build("calendar", "v3", credentials=creds)
 
@@ -206,16 +226,16 @@ def parse_when(date_str, time_str, duration_min=45):
     if re.match(r"^\d{4}-\d{2}-\d{2}$", normalized_date):
         parsed_date = datetime.strptime(normalized_date, "%Y-%m-%d").date()
     else:
+        from dateutil import parser as dtparse
+
         parsed_date = dtparse.parse(normalized_date, dayfirst=True, fuzzy=True).date()
     start = tz.localize(datetime.combine(parsed_date, parsed_time))
     end = start + timedelta(minutes=duration_min)
 
-    print("GCAL start_iso:", start.isoformat())
-    print("GCAL end_iso:", end.isoformat())
-
     return start.isoformat(), end.isoformat()
 
 
+@metrics.timed("external_call_seconds", errors="external_call_errors_total", service="google_calendar")
 def create_event(
 
     summary,
@@ -238,21 +258,57 @@ def create_event(
     if color_id:
         body["colorId"] = str(color_id)
 
-    print("GCAL event body:", body)
-    print("GCAL create_event calendar_id:", calendar_id, flush=True)
+    log.debug("create_event in %s: %s", calendar_id, body)
     created = svc.events().insert(calendarId=calendar_id, body=body).execute()
-    print("GCAL created event id:", created.get("id"), flush=True)
-    print("GCAL created event htmlLink:", created.get("htmlLink"), flush=True)
+    log.debug("created event %s: %s", created.get("id"), created.get("htmlLink"))
     return created
     return svc.events().insert(calendarId=calendar_id, body=body).execute()
 
 
+@metrics.timed("external_call_seconds", errors="external_call_errors_total", ok=bool, service="google_calendar")
 def delete_event(event_id, calendar_id="primary"):
     svc = _service(allow_interactive=False)
     try:
         svc.events().delete(calendarId=calendar_id, eventId=event_id).execute()
-        print(f"Google Calendar event deleted: {event_id}")
+        log.info("event %s deleted", event_id)
         return True
     except Exception as e:
-        print("delete_event error:", e)
+        log.warning("delete_event error: %s", e)
         return False
+
+
+# Google caps a batch at 50 calls for the Calendar API.
+BATCH_SIZE = 50
+
+
+@metrics.timed("external_call_seconds", errors="external_call_errors_total", service="google_calendar")
+def delete_events(event_ids, calendar_id="primary"):
+    """
+    Deletes many events with one client and batched HTTP requests (one round
+    trip per BATCH_SIZE events) instead of a delete_event call each.
+    Returns the set of ids that were deleted.
+    """
+    event_ids = list(dict.fromkeys(eid for eid in event_ids if eid))
+    if not event_ids:
+        return set()
+
+    svc = _service(allow_interactive=False)
+    deleted = set()
+
+    def on_response(request_id, response, exception):
+        if exception is not None:
+            log.warning("delete_events error for %s: %s", request_id, exception)
+            return
+        deleted.add(request_id)
+
+    for start in range(0, len(event_ids), BATCH_SIZE):
+        batch = svc.new_batch_http_request(callback=on_response)
+        for event_id in event_ids[start:start + BATCH_SIZE]:
+            batch.add(svc.events().delete(calendarId=calendar_id, eventId=event_id), request_id=event_id)
+        try:
+            batch.execute()
+        except Exception as e:
+            log.warning("delete_events batch error: %s", e)
+
+    log.info("%s of %s events deleted", len(deleted), len(event_ids))
+    return deleted
@@ -0,0 +1,107 @@
+# gunicorn.conf.py
+import multiprocessing
+import os
+
+# Production entry point (see Procfile): gunicorn -c gunicorn.conf.py
+#
+#   PORT=10000
+#   WEB_CONCURRENCY=1         worker processes, or "auto" for 2 x CPUs + 1
+#   GUNICORN_THREADS=auto     request threads per worker; auto = 4 x CPUs, 8..32
+#   SHOP_MODE_STREAM_MAX_OPEN=8
+#                             shop mode screens streaming at once per worker
+#   DB_POOL_SIZE              idle DB connections kept per worker
+#                             (defaults to the thread count)
+#
+# A shop mode stream (/shop-mode/stream) holds its thread for up to 30
+# minutes, so each worker runs GUNICORN_THREADS + SHOP_MODE_STREAM_MAX_OPEN
+# threads: the streams get their own slots and cannot starve /webhook.
+# Screens beyond the limit poll every minute until a slot frees up; raise
+# the limit for sites with more tablets.
+#
+# Conversation state (user_state) and webhook de-duplication live in the
+# memory of the process that handled the previous message, so by default
+# there is a single worker and concurrency comes from threads: the webhook
+# spends its time waiting on Postgres, Graph, OpenRouter and Google, which
+# threads overlap well. Only raise WEB_CONCURRENCY where messages of one
+# conversation are guaranteed to reach the same worker. /metrics is
+# per-process as well: with several workers each scrape reports just the
+# worker that answered it.
+#
+# gthread rather than gevent: gevent is not a dependency, and psycopg2
+# blocks its event loop without extra patching.
+
+CPU_COUNT = multiprocessing.cpu_count()
+
+
+def _workers():
+    value = (os.getenv("WEB_CONCURRENCY") or "1").strip().lower()
+    if value == "auto":
+        return CPU_COUNT * 2 + 1
+    return max(1, int(value))
+
+
+def _request_threads():
+    value = (os.getenv("GUNICORN_THREADS") or "auto").strip().lower()
+    if value == "auto":
+        return min(32, max(8, CPU_COUNT * 4))
+    return max(1, int(value))
+
+
+def _shop_mode_streams():
+    return max(1, int(os.getenv("SHOP_MODE_STREAM_MAX_OPEN") or 8))
+
+
+bind = f"0.0.0.0:{os.getenv('PORT') or '10000'}"
+wsgi_app = "Reservation_Bot:create_app(preload_imports=True)"
+
+workers = _workers()
+worker_class = "gthread"
+shop_mode_streams = _shop_mode_streams()
+threads = _request_threads() + shop_mode_streams
+
+# Import the app (Google client libraries included) and run its startup
+# migrations once, in the master; workers fork from it and share the
+# loaded code copy-on-write.
+preload_app = True
+
+# Graph / OpenRouter / Calendar calls can be slow, and the shop-mode event
+# stream keeps requests open.
+timeout = 120
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = None
+errorlog = "-"
+loglevel = (os.getenv("LOG_LEVEL") or "info").lower()
+
+# Read by db_utils and Reservation_Bot when the app is preloaded.
+os.environ.setdefault("DB_POOL_SIZE", str(threads))
+os.environ["SHOP_MODE_STREAM_MAX_OPEN"] = str(shop_mode_streams)
+
+
+def pre_fork(server, worker):
+    # Connections opened by the startup migrations must not be shared with
+    # the children.
+    import db_utils
+
+    db_utils.close_pool()
+
+
+def post_fork(server, worker):
+    import db_utils
+    import log_utils
+    import metrics
+
+    log_utils.restart_after_fork()
+    db_utils.reset_pool()
+    # Counters start from zero in the worker rather than carrying the
+    # master's startup values.
+    metrics.reset()
+    # The compiled business-data caches inherited from the master stay:
+    # they are revalidated against availability_versions on use. The
+    # side-effect executor and the async pipeline start their threads on
+    # first use in the worker.
+    server.log.info(
+        "worker %s ready (%s threads, %s for shop mode streams, DB pool %s)",
+        worker.pid, threads, shop_mode_streams, db_utils.DB_POOL_SIZE,
+    )
@@ -0,0 +1,338 @@
+# localization.py
+# Reply catalog for the WhatsApp conversation. Templates are compiled once at
+# import: every (lang, tone, key) gets its own str.format template with the
+# business tone already applied, so rendering a reply is one dict lookup and
+# one format call instead of rebuilding the dicts and rewriting the text on
+# every message.
+
+LANGUAGES = ("en", "fr", "ar")
+DEFAULT_LANG = "en"
+DEFAULT_TONE = "friendly"
+
+CATALOG = {
+    "greeting": {
+        "en": "Hi! Welcome 👋\n\nHow can I help you today?\n• Type *book* to make a reservation\n• Type *cancel* to cancel your reservation\n• Type *reschedule* to move your reservation",
+        "ar": "أهلاً 👋\n\nكيف فيني ساعدك اليوم؟\n• اكتب *احجز* لتعمل حجز\n• اكتب *الغاء* لتلغي الحجز\n• اكتب *تغيير الحجز* لتغيير الموعد",
+        "fr": "Bonjour 👋\n\nComment puis-je vous aider aujourd’hui ?\n• Tapez *book* pour réserver\n• Tapez *cancel* pour annuler votre réservation\n• Tapez *reschedule* pour déplacer votre réservation",
+    },
+    "ask_name": {
+        "en": "Sure — what is your full name?",
+        "ar": "أكيد 🤍 شو الاسم الكامل للحجز؟",
+        "fr": "Bien sûr — quel est votre nom complet ?",
+    },
+    "ask_service": {
+        "en": "Thanks, {name}. Which service would you like? (e.g., haircut, consultation)",
+        "ar": "شكراً {name}. أي خدمة بدك؟ (مثلاً: قص شعر، استشارة)",
+        "fr": "Merci, {name}. Quel service souhaitez-vous ? (ex. coupe, consultation)",
+    },
+    "ask_date": {
+        "en": "Great — {service}. What date would you like? (e.g., 2026-04-20)",
+        "ar": "ممتاز — {service}. أي تاريخ بدك؟ (مثلاً: 2026-04-20)",
+        "fr": "Parfait — {service}. Quelle date souhaitez-vous ? (ex. 2026-04-20)",
+    },
+    "ask_time": {
+        "en": "Perfect — and what time? (e.g., 16:00 or 4 PM)",
+        "ar": "ممتاز — وأي ساعة؟ (مثلاً: 16:00 أو 4 PM)",
+        "fr": "Parfait — à quelle heure ? (ex. 16:00 ou 4 PM)",
+    },
+    "invalid_time": {
+        "en": "Please send a valid time, like 16:00 or 4 PM.",
+        "ar": "من فضلك ابعت وقت صحيح، مثل 16:00 أو 4 PM.",
+        "fr": "Veuillez envoyer une heure valide, comme 16:00 ou 4 PM.",
+    },
+    "slot_taken": {
+        "en": "Sorry, {date} at {time} is already booked. Please choose another time 🤍",
+        "ar": "عذراً، الموعد {date} الساعة {time} محجوز. اختار وقت تاني 🤍",
+        "fr": "Désolé, le créneau du {date} à {time} est déjà réservé. Choisissez une autre heure 🤍",
+    },
+    "next_available": {
+        "en": "The next available times are:\n{slots}",
+        "ar": "أقرب المواعيد المتاحة:\n{slots}",
+        "fr": "Prochains créneaux disponibles :\n{slots}",
+    },
+    "next_available_line": {
+        "en": "• {date} at {time}",
+        "ar": "• {date} الساعة {time}",
+        "fr": "• {date} à {time}",
+    },
+    "next_available_with": {
+        "en": " (with {resource_name})",
+        "ar": " (مع {resource_name})",
+        "fr": " (avec {resource_name})",
+    },
+    "no_active_cancel": {
+        "en": "You have no active reservations to cancel.",
+        "ar": "ما عندك أي حجوزات مفعّلة لتلغيها.",
+        "fr": "Vous n’avez aucune réservation active à annuler.",
+    },
+    "cancel_done": {
+        "en": "✅ Cancelled {count} reservation(s).\n🗓 Removed {events} event(s) from Google Calendar.",
+        "ar": "✅ تم إلغاء {count} حجز/حجوزات.\n🗓 وتم حذف {events} موعد/مواعيد من Google Calendar.",
+        "fr": "✅ {count} réservation(s) annulée(s).\n🗓 {events} événement(s) supprimé(s) de Google Calendar.",
+    },
+    "save_error": {
+        "en": "Something went wrong while saving your reservation. Please try again.",
+        "ar": "صار خطأ أثناء حفظ الحجز. جرب مرة ثانية.",
+        "fr": "Une erreur s’est produite أثناء حفظ la réservation. Veuillez réessayer.",
+    },
+    "invalid_date": {
+        "en": "Please send a valid date, like 2026-04-20 or 20 April.",
+        "ar": "من فضلك ابعت تاريخ صحيح، مثل 2026-04-20 أو 20 نيسان.",
+        "fr": "Veuillez envoyer une date valide, comme 2026-04-20 ou 20 avril.",
+    },
+    "past_date": {
+        "en": "That date is in the past. Please choose today or a future date.",
+        "ar": "هذا التاريخ أصبح بالماضي. اختار اليوم أو تاريخ بالمستقبل.",
+        "fr": "Cette date est déjà passée. Veuillez choisir aujourd’hui ou une date future.",
+    },
+    "closed_day": {
+        "en": "Sorry, we’re closed on that day. Please choose another date.",
+        "ar": "عذراً، نحن مغلقون في هذا اليوم. اختار تاريخ تاني.",
+        "fr": "Désolé, nous sommes fermés ce jour-là. Choisissez une autre date.",
+    },
+    "outside_hours": {
+        "en": "That time is outside business hours. Please choose another time.",
+        "ar": "هذا الوقت خارج ساعات العمل. اختار وقت تاني.",
+        "fr": "Cette heure est en dehors des horaires d’ouverture. Choisissez une autre heure.",
+    },
+
+    # Booking flow prompts
+    "ask_sport": {
+        "en": "Thanks, {name}. Which sport would you like?\nAvailable sports:\n{sports}",
+        "fr": "Merci, {name}. Quel sport souhaitez-vous ?\nSports disponibles :\n{sports}",
+        "ar": "شكراً {name}. أي رياضة بدك؟\nالرياضات المتوفرة:\n{sports}",
+    },
+    "ask_sport_retry": {
+        "en": "Please choose a sport first.\nAvailable sports:\n{sports}",
+        "fr": "Veuillez d'abord choisir un sport.\nSports disponibles :\n{sports}",
+        "ar": "من فضلك اختار الرياضة أولاً.\nالرياضات المتوفرة:\n{sports}",
+    },
+    "ask_service_list": {
+        "en": "Thanks, {name}. Which service would you like?\nAvailable services:\n{services}",
+        "fr": "Merci, {name}. Quel service souhaitez-vous ?\nServices disponibles :\n{services}",
+        "ar": "شكراً {name}. أي خدمة بدك؟\nالخدمات المتوفرة:\n{services}",
+    },
+    "ask_sport_service": {
+        "en": "Great — {sport}. Which service would you like?\nAvailable services:\n{services}",
+        "fr": "Parfait — {sport}. Quel service souhaitez-vous ?\nServices disponibles :\n{services}",
+        "ar": "ممتاز — {sport}. أي خدمة بدك؟\nالخدمات المتوفرة:\n{services}",
+    },
+    "invalid_service": {
+        "en": "Sorry, we don’t offer that service.\nAvailable services:\n{services}",
+    },
+
+    # Confirmation / cancellation / reschedule notices
+    "confirmation": {
+        "en": "✅ Your reservation is confirmed!\nName: {name}\nService: {service}{resource_line}\nDate: {date}\nTime: {time}{calendar_line}\n\nThank you for booking with us 🤍",
+        "fr": "✅ Votre réservation est confirmée !\nNom : {name}\nService : {service}{resource_line}\nDate : {date}\nHeure : {time}{calendar_line}\n\nMerci pour votre réservation 🤍",
+        "ar": "✅ تم تأكيد حجزك!\nالاسم: {name}\nالخدمة: {service}{resource_line}\nالتاريخ: {date}\nالوقت: {time}{calendar_line}\n\nشكراً لحجزك معنا 🤍",
+    },
+    "cancellation": {
+        "en": "❌ Your reservation has been canceled.\nName: {name}\nService: {service}{resource_line}\nDate: {date}\nTime: {time}\n\nIf this is a mistake, please contact us to reschedule.",
+        "fr": "❌ Votre réservation a été annulée.\nNom : {name}\nService : {service}{resource_line}\nDate : {date}\nHeure : {time}\n\nSi c’est une erreur, veuillez nous contacter pour reprogrammer.",
+        "ar": "❌ تم إلغاء حجزك.\nالاسم: {name}\nالخدمة: {service}{resource_line}\nالتاريخ: {date}\nالوقت: {time}\n\nإذا كان هذا عن طريق الخطأ، يرجى التواصل معنا لإعادة الحجز.",
+    },
+    "resource_line": {
+        "en": "\nWith: {resource_name}",
+        "fr": "\nAvec : {resource_name}",
+        "ar": "\nمع: {resource_name}",
+    },
+    "calendar_added_line": {
+        "en": "\n🗓 Also added to our Google Calendar.",
+        "fr": "\n🗓 Également ajouté à notre Google Calendar.",
+        "ar": "\n🗓 وتمت إضافته أيضاً إلى Google Calendar.",
+    },
+    "rescheduled": {
+        "en": "✅ Your reservation has been rescheduled.\nName: {name}\nService: {service}\nPrevious date: {old_date}\nPrevious time: {old_time}{old_resource_line}\n\nNew date: {new_date}\nNew time: {new_time}{new_resource_line}",
+        "fr": "✅ Votre réservation a été reprogrammée.\nNom : {name}\nService : {service}\nAncienne date : {old_date}\nAncienne heure : {old_time}{old_resource_line}\n\nNouvelle date : {new_date}\nNouvelle heure : {new_time}{new_resource_line}",
+        "ar": "✅ تم تعديل موعد حجزك.\nالاسم: {name}\nالخدمة: {service}\nالتاريخ السابق: {old_date}\nالوقت السابق: {old_time}{old_resource_line}\n\nالتاريخ الجديد: {new_date}\nالوقت الجديد: {new_time}{new_resource_line}",
+    },
+    "old_resource_line": {
+        "en": "\nPrevious staff/resource: {resource_name}",
+        "fr": "\nAncien prestataire : {resource_name}",
+        "ar": "\nالموارد السابقة: {resource_name}",
+    },
+    "new_resource_line": {
+        "en": "\nNew staff/resource: {resource_name}",
+        "fr": "\nNouveau prestataire : {resource_name}",
+        "ar": "\nالمورد الجديد: {resource_name}",
+    },
+
+    # Reschedule flow
+    "no_active_reschedule": {
+        "en": "You have no active reservation to reschedule.",
+        "fr": "Vous n’avez aucune réservation active à reprogrammer.",
+        "ar": "ما عندك حجز مفعّل لتغيير موعده.",
+    },
+    "ask_reschedule_date": {
+        "en": "I found your active reservation for {service} on {date} at {time}. What new date would you like?",
+        "fr": "J’ai trouvé votre réservation active pour {service} le {date} à {time}. Quelle nouvelle date souhaitez-vous ?",
+        "ar": "لقيت حجزك المفعّل لخدمة {service} بتاريخ {date} الساعة {time}. أي تاريخ جديد بدك؟",
+    },
+    "repeat_reschedule_date": {
+        "en": "Please send the new date you want for your reservation.",
+        "fr": "Veuillez envoyer la nouvelle date souhaitée pour votre réservation.",
+        "ar": "من فضلك ابعت التاريخ الجديد اللي بدك ياه للحجز.",
+    },
+    "ask_reschedule_time": {
+        "en": "Great — what new time would you like on {date}?",
+        "fr": "Parfait — quelle nouvelle heure souhaitez-vous le {date} ?",
+        "ar": "ممتاز — أي وقت جديد بدك بتاريخ {date}؟",
+    },
+    "repeat_reschedule_time": {
+        "en": "Please send the new time you want for your reservation.",
+        "fr": "Veuillez envoyer la nouvelle heure souhaitée pour votre réservation.",
+        "ar": "من فضلك ابعت الوقت الجديد اللي بدك ياه للحجز.",
+    },
+    "reschedule_missing": {
+        "en": "I could not find your reservation anymore. Please send book to create a new one.",
+        "fr": "Je n’ai plus trouvé votre réservation. Veuillez envoyer book pour créer une nouvelle réservation.",
+        "ar": "ما عاد لقيت الحجز. ابعت احجز إذا بدك تعمل حجز جديد.",
+    },
+
+    # Resource alternatives
+    "resource_unavailable": {
+        "en": "Sorry, {resource_name} isn’t available on {date} at {time}.",
+        "fr": "Désolé, {resource_name} n’est pas disponible le {date} à {time}.",
+        "ar": "عذراً، {resource_name} غير متاح بتاريخ {date} الساعة {time}.",
+    },
+    "resource_unavailable_same_time": {
+        "en": "Available at the same time: {names}.",
+        "fr": "Disponible à la même heure : {names}.",
+        "ar": "المتاحون في نفس الوقت: {names}.",
+    },
+    "resource_unavailable_nearby": {
+        "en": "Closest times with {resource_name}:\n{nearby}",
+        "fr": "Heures proches avec {resource_name} :\n{nearby}",
+        "ar": "أقرب الأوقات مع {resource_name}:\n{nearby}",
+    },
+    "resource_unavailable_none": {
+        "en": "No nearby alternatives were found.",
+        "fr": "Aucune alternative proche n’a été trouvée.",
+        "ar": "لم يتم العثور على بدائل قريبة.",
+    },
+    "switch_offer": {
+        "en": "{preferred} isn’t available on {date} at {time}.\n{offered} is available at the same time.\nWould you like to book with {offered} instead?{nearby_block}",
+        "fr": "{preferred} n’est pas disponible le {date} à {time}.\n{offered} est disponible à la même heure.\nVoulez-vous réserver avec {offered} ?{nearby_block}",
+        "ar": "{preferred} غير متاح بتاريخ {date} الساعة {time}.\n{offered} متاح بنفس الوقت.\nبدك أحجز مع {offered}؟{nearby_block}",
+    },
+    "switch_offer_nearby": {
+        "en": "\n\nClosest times with {preferred}:\n{nearby}",
+        "fr": "\n\nHeures proches avec {preferred} :\n{nearby}",
+        "ar": "\n\nأقرب الأوقات مع {preferred}:\n{nearby}",
+    },
+    "switch_declined": {
+        "en": "Okay — here are the closest times with {preferred}:\n{nearby}",
+        "fr": "D’accord — voici les heures proches avec {preferred} :\n{nearby}",
+        "ar": "أكيد — هيدي أقرب الأوقات مع {preferred}:\n{nearby}",
+    },
+    "switch_declined_none": {
+        "en": "Okay — no nearby times were found with {preferred}.",
+        "fr": "D’accord — aucune heure proche n’a été trouvée avec {preferred}.",
+        "ar": "أكيد — ما لقينا أوقات قريبة مع {preferred}.",
+    },
+    "repeat_alternative_offer": {
+        "en": "Please reply yes to book with {offered}, or no to see other times.",
+        "fr": "Veuillez répondre oui pour réserver avec {offered}, ou non pour voir d’autres heures.",
+        "ar": "من فضلك جاوب نعم لنحجز مع {offered}، أو لا لنشوف أوقات تانية.",
+    },
+}
+
+# Dashboard "assistant tone" rewrites, applied in order like the old
+# str.replace chain. The friendly tone is the catalog as written.
+TONE_REPLACEMENTS = {
+    "professional": [
+        ("Hi! Welcome 👋", "Hello."),
+        ("Hi!", "Hello."),
+        ("Hello! Welcome 🤍", "Hello."),
+        ("Sure —", "Certainly —"),
+        ("Of course —", "Certainly —"),
+        ("Thanks,", "Thank you,"),
+        ("Thanks so much,", "Thank you,"),
+        ("Perfect —", "Understood —"),
+        ("Perfect 🤍 —", "Understood —"),
+        ("Thank you for booking with us 🤍", "Thank you for your reservation."),
+        ("If this is a mistake, please contact us to reschedule.", "If needed, please contact us to reschedule."),
+        ("🤍", ""),
+        ("👋", ""),
+    ],
+    "warm": [
+        ("Hi! Welcome 👋", "Hello! Welcome 🤍"),
+        ("Hi!", "Hello!"),
+        ("Sure —", "Of course —"),
+        ("Thanks,", "Thanks so much,"),
+        ("Perfect —", "Perfect 🤍 —"),
+    ],
+    "luxury": [
+        ("Hi! Welcome 👋", "Welcome."),
+        ("Hi!", "Welcome."),
+        ("Hello! Welcome 🤍", "Welcome."),
+        ("Sure —", "Certainly —"),
+        ("Of course —", "Certainly —"),
+        ("Thanks,", "Thank you,"),
+        ("Thanks so much,", "Thank you,"),
+        ("Perfect —", "Wonderful —"),
+        ("Perfect 🤍 —", "Wonderful —"),
+        ("Thank you for booking with us 🤍", "We look forward to welcoming you."),
+        ("👋", ""),
+    ],
+}
+
+TONES = (DEFAULT_TONE,) + tuple(TONE_REPLACEMENTS)
+
+
+def normalize_tone(tone):
+    tone = (tone or DEFAULT_TONE).strip().lower()
+    return tone if tone in TONES else DEFAULT_TONE
+
+
+def apply_tone(tone, text):
+    """
+    Tone rewrite for free text (custom welcome messages, replies assembled
+    from several parts). Catalog replies get it at compile time instead.
+    """
+    for old, new in TONE_REPLACEMENTS.get(tone, ()):
+        text = text.replace(old, new)
+    return text
+
+
+def _compile_catalog():
+    compiled = {}
+    for key, by_lang in CATALOG.items():
+        for lang in LANGUAGES:
+            template = by_lang.get(lang) or by_lang.get(DEFAULT_LANG) or key
+            for tone in TONES:
+                compiled[(lang, tone, key)] = apply_tone(tone, template)
+    return compiled
+
+
+_compiled = _compile_catalog()
+
+
+def render(lang, key, tone=DEFAULT_TONE, **kwargs):
+    template = _compiled.get((lang, tone, key))
+    if template is None:
+        lang = lang if lang in LANGUAGES else DEFAULT_LANG
+        template = _compiled.get((lang, normalize_tone(tone), key), key)
+    return template.format(**kwargs)
+
+
+def compile_templates(tone, overrides=None):
+    """
+    (lang, key) -> template in one tone, for a business's reply cache.
+    overrides: key -> plain text used for every language instead of the
+    catalog (e.g. a custom welcome message); toned and brace-escaped here
+    so it renders like any other template.
+    """
+    tone = normalize_tone(tone)
+    templates = {(lang, key): template for (lang, t, key), template in _compiled.items() if t == tone}
+    for key, text in (overrides or {}).items():
+        template = apply_tone(tone, text).replace("{", "{{").replace("}", "}}")
+        for lang in LANGUAGES:
+            templates[(lang, key)] = template
+    return templates
+
+
+def render_from(templates, lang, key, **kwargs):
+    template = templates.get((lang, key)) or templates.get((DEFAULT_LANG, key)) or key
+    return template.format(**kwargs)
@@ -0,0 +1,170 @@
+# log_utils.py
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+
+# Application logging. Callers only format the record and put it on a
+# bounded queue; a listener thread redacts it and writes it to stdout, so a
+# slow log pipe never adds to request latency. Chatty categories (raw
+# webhook payloads, Graph API response bodies) can be sampled, and
+# everything below WARNING is dropped rather than blocking when the queue
+# is full; WARNING and above are then written by the caller itself.
+#
+#   LOG_LEVEL=INFO                                  root level
+#   LOG_SAMPLE_RATES=webhook.payload=0.01,whatsapp=0.1
+#                                                   share of DEBUG/INFO records
+#                                                   kept per category
+#   LOG_QUEUE_SIZE=10000
+
+ROOT_LOGGER = "reservation_bot"
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+DEFAULT_QUEUE_SIZE = 10000
+
+# Meta ids that are as long as phone numbers but are needed to debug
+# routing; a number right after one of these labels is left as is.
+ID_LABEL = re.compile(
+    r"(?i)\b(?:phone_number_id|waba[_ ]id|waba|whatsapp_business_account_id|business_account_id)"
+    r"['\"]?\s*[:=]?\s*['\"]?\s*$"
+)
+ID_LABEL_LOOKBACK = 48
+
+
+def _mask_phone(match):
+    before = match.string[max(0, match.start() - ID_LABEL_LOOKBACK):match.start()]
+    if ID_LABEL.search(before):
+        return match.group(0)
+    return "***" + match.group(1)
+
+
+# Tokens in query strings, JSON/dict reprs and Authorization headers, then
+# anything that looks like a phone number (the last 3 digits are kept so
+# conversations can still be followed in the logs). Labelled Meta ids and
+# numbers in URL paths (Graph API /<phone_number_id>/messages) are kept.
+REDACTIONS = [
+    (re.compile(r"(?i)(bearer\s+)[A-Za-z0-9._\-]+"), r"\1[redacted]"),
+    (re.compile(r"(?i)(['\"]?(?:access_token|refresh_token|client_secret|token|password_hash|app_secret)['\"]?\s*[:=]\s*['\"]?)[^'\"&,\s}]+"), r"\1[redacted]"),
+    (re.compile(r"\bEAA[A-Za-z0-9]{20,}"), "[redacted]"),
+    (re.compile(r"(?<![\w.:/-])\+?\d{5,12}(\d{3})(?![\w:/-])"), _mask_phone),
+]
+
+dropped_records = 0
+
+_listener = None
+_queue_handler = None
+_stream_handler = None
+_sample_rates = {}
+
+
+def redact(text):
+    for pattern, replacement in REDACTIONS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def parse_sample_rates(spec):
+    rates = {}
+    for part in (spec or "").split(","):
+        name, _, value = part.partition("=")
+        try:
+            rates[name.strip()] = min(1.0, max(0.0, float(value)))
+        except ValueError:
+            continue
+    return rates
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a share of the DEBUG/INFO records of a category (the logger name
+    under reservation_bot, matched on its longest configured prefix).
+    WARNING and above are never sampled out.
+    """
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not _sample_rates:
+            return True
+        category = record.name[len(ROOT_LOGGER) + 1:]
+        while category:
+            rate = _sample_rates.get(category)
+            if rate is not None:
+                return rate >= 1.0 or random.random() < rate
+            category = category.rpartition(".")[0]
+        return True
+
+
+class RedactingFormatter(logging.Formatter):
+    def format(self, record):
+        return redact(super().format(record))
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    def enqueue(self, record):
+        global dropped_records
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if record.levelno >= logging.WARNING and _stream_handler is not None:
+                # Never lose a warning or an error: write it synchronously,
+                # serialized with the listener by the handler's lock.
+                _stream_handler.handle(record)
+            else:
+                dropped_records += 1
+
+
+def setup_logging():
+    """
+    Idempotent; called on import of the app and safe to call again.
+    """
+    global _queue_handler, _sample_rates
+    if _listener is not None:
+        return
+
+    _sample_rates = parse_sample_rates(os.getenv("LOG_SAMPLE_RATES"))
+
+    _queue_handler = DroppingQueueHandler(None)
+    _queue_handler.addFilter(SamplingFilter())
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.setLevel((os.getenv("LOG_LEVEL") or "INFO").upper())
+    root.addHandler(_queue_handler)
+    root.propagate = False
+
+    _start_listener()
+    atexit.register(_stop_listener)
+
+
+def _start_listener():
+    global _listener, _stream_handler
+    _stream_handler = logging.StreamHandler(sys.stdout)
+    _stream_handler.setFormatter(RedactingFormatter(LOG_FORMAT))
+
+    log_queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE") or DEFAULT_QUEUE_SIZE))
+    _queue_handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, _stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+def restart_after_fork():
+    """
+    The listener thread does not survive a fork, and the queue's lock may
+    have been held when it happened: a forked worker (gunicorn post_fork)
+    gets a fresh queue and listener of its own.
+    """
+    if _listener is None:
+        setup_logging()
+        return
+    _start_listener()
+
+
+def get_logger(category):
+    setup_logging()
+    return logging.getLogger(f"{ROOT_LOGGER}.{category}")
@@ -0,0 +1,205 @@
+# metrics.py
+import bisect
+import contextvars
+import functools
+import threading
+import time
+
+# In-process counters and histograms rendered in the Prometheus text format
+# by /metrics. Recording is a dict update under one lock, cheap enough for
+# the per-query and per-message paths. Values live in the memory of one
+# process, and a scrape of /metrics is answered by whichever gunicorn
+# worker takes it. The numbers are only coherent with a single worker (the
+# default in gunicorn.conf.py); with WEB_CONCURRENCY > 1 successive
+# scrapes read different workers and counters appear to jump.
+
+# Upper bounds (seconds) of the latency histogram buckets.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds of the per-request DB query count histogram.
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+_lock = threading.Lock()
+_help = {}          # name -> (type, help text, buckets)
+_counters = {}      # (name, labels) -> value
+_histograms = {}    # (name, labels) -> {"counts": [...], "sum": x, "count": n}
+_collectors = []    # callables returning [(name, labels dict, value)] for gauges
+
+
+def counter(name, help_text):
+    _help[name] = ("counter", help_text, None)
+
+
+def histogram(name, help_text, buckets=DEFAULT_BUCKETS):
+    _help[name] = ("histogram", help_text, tuple(buckets))
+
+
+def collector(name, help_text, collect, kind="gauge"):
+    """
+    collect() -> [(labels dict, value)], read at scrape time for values kept
+    elsewhere (queue sizes).
+    """
+    _help[name] = (kind, help_text, None)
+    _collectors.append((name, collect))
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def inc(name, amount=1, **labels):
+    key = (name, _label_key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, value, **labels):
+    buckets = _help[name][2]
+    key = (name, _label_key(labels))
+    bucket = bisect.bisect_left(buckets, value)
+    with _lock:
+        entry = _histograms.get(key)
+        if entry is None:
+            entry = _histograms[key] = {"counts": [0] * (len(buckets) + 1), "sum": 0.0, "count": 0}
+        entry["counts"][bucket] += 1
+        entry["sum"] += value
+        entry["count"] += 1
+
+
+def timed(histogram_name, errors=None, ok=None, **labels):
+    """
+    Decorator: observes the call duration in histogram_name and counts
+    exceptions - and results ok(result) rejects - in the errors counter.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            failed = True
+            try:
+                result = fn(*args, **kwargs)
+                failed = ok is not None and not ok(result)
+                return result
+            finally:
+                observe(histogram_name, time.perf_counter() - started, **labels)
+                if failed and errors:
+                    inc(errors, **labels)
+        return wrapper
+    return decorate
+
+
+def counter_snapshot(name):
+    """
+    {labels tuple: value} for one counter.
+    """
+    with _lock:
+        return {labels: value for (metric, labels), value in _counters.items() if metric == name}
+
+
+def histogram_snapshot(name):
+    """
+    {labels tuple: {"count", "sum", "counts"}} for one histogram, with
+    per-bucket (not cumulative) counts aligned to its buckets plus +Inf.
+    """
+    with _lock:
+        return {
+            labels: {"count": e["count"], "sum": e["sum"], "counts": list(e["counts"])}
+            for (metric, labels), e in _histograms.items()
+            if metric == name
+        }
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + (list(extra.items()) if extra else [])
+    if not items:
+        return ""
+    parts = []
+    for k, v in items:
+        value = str(v).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        parts.append(f'{k}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def render():
+    """
+    Every registered metric in the Prometheus text exposition format.
+    """
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: {"counts": list(e["counts"]), "sum": e["sum"], "count": e["count"]}
+                      for key, e in _histograms.items()}
+
+    gauges = {}
+    for name, collect in _collectors:
+        try:
+            gauges[name] = list(collect())
+        except Exception:
+            gauges[name] = []
+
+    lines = []
+    for name in sorted(_help):
+        kind, help_text, buckets = _help[name]
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if name in gauges:
+            for labels, value in gauges[name]:
+                lines.append(f"{name}{_format_labels(_label_key(labels))} {value}")
+        elif kind == "counter":
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        elif kind == "histogram":
+            for (metric, labels), entry in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(buckets) + ["+Inf"], entry["counts"]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels, {'le': bound})} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {entry['sum']}")
+                lines.append(f"{name}_count{_format_labels(labels)} {entry['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+# ------------------ DB QUERIES ------------------
+
+histogram("db_query_seconds", "Time spent in cursor.execute, one observation per statement.")
+histogram("db_queries_per_request", "SQL statements per HTTP request or async webhook turn.", buckets=QUERY_COUNT_BUCKETS)
+histogram("db_seconds_per_request", "Time spent in SQL per HTTP request or async webhook turn.")
+
+# Per-request accumulator, in a context variable like the turn memo.
+_request_db = contextvars.ContextVar("request_db", default=None)
+
+
+def begin_request_db():
+    _request_db.set({"queries": 0, "seconds": 0.0})
+
+
+def end_request_db():
+    """
+    Returns (queries, seconds) of the request and stops accumulating.
+    """
+    stats = _request_db.get()
+    _request_db.set(None)
+    if stats is None:
+        return 0, 0.0
+    return stats["queries"], stats["seconds"]
+
+
+def record_db_query(seconds):
+    observe("db_query_seconds", seconds)
+    stats = _request_db.get()
+    if stats is not None:
+        stats["queries"] += 1
+        stats["seconds"] += seconds
+
+
+# ------------------ EXTERNAL CALLS ------------------
+
+histogram("external_call_seconds", "Latency of calls to WhatsApp Graph, OpenRouter and Google Calendar.")
+counter("external_call_errors_total", "Failed external calls (exception or error response).")
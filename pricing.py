@@ -0,0 +1,139 @@
+# pricing.py
+from types import MappingProxyType
+
+# Per-business price table. Built once from the services rows and the
+# business pricing settings, then every quote (night rate, duration tier,
+# 30-minute extension) is answered from memory.
+
+DEFAULT_DURATION_MIN = 45
+
+
+def _clean(name):
+    return (name or "").strip().lower()
+
+
+def _to_float(value, default=0.0):
+    try:
+        return float(value)
+    except Exception:
+        return float(default)
+
+
+def build_price_table(service_rows, extension_pricing_mode=None, extension_flat_30_price=0, night_price_map=None):
+    """
+    service_rows: services of one business ordered by id DESC
+    (name, price, duration_min, night_price).
+    night_price_map: fallback night prices by lowercased service name.
+    """
+    night_price_map = night_price_map or {}
+
+    services = []
+    by_name = {}
+    duration_tiers = {}
+
+    for row in service_rows:
+        name = row.get("name") or ""
+        cleaned = _clean(name)
+        duration = int(row.get("duration_min") or DEFAULT_DURATION_MIN)
+        price = _to_float(row.get("price") or 0)
+
+        night = row.get("night_price")
+        night = _to_float(night, 0.0) if night is not None else None
+
+        entry = MappingProxyType({
+            "name": name,
+            "lower_name": name.lower(),
+            "price": price,
+            "duration": duration,
+            "night_price": night,
+        })
+        services.append(entry)
+        # Rows come newest first: keep the first hit, like the SQL lookups do.
+        by_name.setdefault(cleaned, entry)
+        duration_tiers.setdefault(int(row.get("duration_min") or 0), price)
+
+    return MappingProxyType({
+        "services": tuple(services),
+        "by_name": MappingProxyType(by_name),
+        "duration_tiers": MappingProxyType(duration_tiers),
+        "night_price_map": MappingProxyType(dict(night_price_map)),
+        "extension_pricing_mode": (extension_pricing_mode or "").strip().lower() or "tier_diff",
+        "extension_flat_30_price": _to_float(extension_flat_30_price or 0, 0.0),
+    })
+
+
+def find_service(table, service_name):
+    """
+    Exact (case-insensitive) name first, then the newest service whose name
+    contains the given text — the same rules as get_service_info.
+    """
+    cleaned = _clean(service_name)
+    entry = table["by_name"].get(cleaned)
+    if entry is not None or not cleaned:
+        return entry
+    for entry in table["services"]:
+        if cleaned in entry["lower_name"]:
+            return entry
+    return None
+
+
+def base_price(table, service_name):
+    entry = find_service(table, service_name)
+    return entry["price"] if entry else 0.0
+
+
+def base_duration(table, service_name):
+    entry = find_service(table, service_name)
+    return entry["duration"] if entry else DEFAULT_DURATION_MIN
+
+
+def price_for_duration(table, duration_min):
+    return table["duration_tiers"].get(int(duration_min))
+
+
+def quote_service_price(table, service_name, is_night=False):
+    """
+    Price of one booking of the service: the night rate when the booking
+    starts at night and a night rate exists, otherwise the base price.
+    """
+    entry = find_service(table, service_name)
+    if is_night:
+        if entry and entry["night_price"] is not None:
+            return entry["night_price"]
+        night = table["night_price_map"].get(_clean(service_name))
+        if night is not None:
+            return float(night)
+    return entry["price"] if entry else 0.0
+
+
+def quote_extension_charge(table, service_name, current_extra_minutes=0, increment_minutes=30):
+    """
+    Extra charge for extending a booking by increment_minutes, or None when
+    no pricing rule applies (no flat rate and no service of that duration).
+    """
+    flat = table["extension_flat_30_price"]
+    current_extra_minutes = int(current_extra_minutes or 0)
+
+    if table["extension_pricing_mode"] == "flat_30" and flat > 0:
+        return flat
+
+    price = base_price(table, service_name)
+    current_duration = base_duration(table, service_name) + current_extra_minutes
+
+    # What is already being charged for the current reservation state?
+    current_reservation_price = price
+    if current_extra_minutes:
+        current_duration_price = price_for_duration(table, current_duration)
+        if current_duration_price is not None:
+            current_reservation_price = current_duration_price
+        else:
+            current_reservation_price = price + flat * (current_extra_minutes // 30)
+
+    new_duration_price = price_for_duration(table, current_duration + int(increment_minutes or 0))
+    if new_duration_price is not None:
+        return max(0.0, round(new_duration_price - current_reservation_price, 2))
+
+    if flat > 0:
+        return flat
+
+    return None
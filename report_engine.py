@@ -0,0 +1,148 @@
+# report_engine.py
+from array import array
+from collections import Counter
+from datetime import timedelta
+from itertools import compress
+
+# Columnar report helpers for the dashboard. Rows are turned into parallel
+# columns once, then every metric is a single pass over a column instead of
+# a per-row loop that re-parses dates and re-resolves service prices.
+
+STATUS_OTHER = 0
+STATUS_CONFIRMED = 1
+STATUS_CANCELED = 2
+STATUS_DONE = 3
+
+STATUS_CODES = {
+    "CONFIRMED": STATUS_CONFIRMED,
+    "CANCELED": STATUS_CANCELED,
+    "DONE": STATUS_DONE,
+}
+
+BUCKET_NONE = 0
+BUCKET_CURRENT = 1
+BUCKET_PREVIOUS = 2
+
+
+def week_windows(today):
+    """
+    ISO bounds of the current 7 days (today included) and the 7 days before.
+    """
+    return {
+        "today": today.isoformat(),
+        "current_start": (today - timedelta(days=6)).isoformat(),
+        "previous_start": (today - timedelta(days=13)).isoformat(),
+        "previous_end": (today - timedelta(days=7)).isoformat(),
+    }
+
+
+def _is_iso_date(value):
+    return (
+        isinstance(value, str)
+        and len(value) == 10
+        and value[4] == "-"
+        and value[7] == "-"
+        and value[:4].isdigit()
+        and value[5:7].isdigit()
+        and value[8:].isdigit()
+    )
+
+
+def build_reservation_columns(rows, price_for, windows):
+    """
+    rows: reservation dicts (service, time, date, status, extra_price,
+    resource_name_snapshot).
+    price_for(service_name, time_str) -> base price; called once per distinct
+    (service, time) pair.
+    windows: output of week_windows().
+    """
+    today = windows["today"]
+    current_start = windows["current_start"]
+    previous_start = windows["previous_start"]
+    previous_end = windows["previous_end"]
+
+    status = array("b")
+    price = array("d")
+    bucket = array("b")
+    services = []
+    resources = []
+
+    price_cache = {}
+    bucket_cache = {}
+
+    for r in rows:
+        service_name = r.get("service")
+        time_str = r.get("time")
+
+        key = (service_name, time_str)
+        base = price_cache.get(key)
+        if base is None:
+            base = price_cache[key] = float(price_for(service_name, time_str) or 0)
+        price.append(base + float(r.get("extra_price") or 0))
+
+        status.append(STATUS_CODES.get((r.get("status") or "").upper(), STATUS_OTHER))
+
+        date_str = r.get("date")
+        b = bucket_cache.get(date_str)
+        if b is None:
+            b = BUCKET_NONE
+            if _is_iso_date(date_str):
+                if current_start <= date_str <= today:
+                    b = BUCKET_CURRENT
+                elif previous_start <= date_str <= previous_end:
+                    b = BUCKET_PREVIOUS
+            bucket_cache[date_str] = b
+        bucket.append(b)
+
+        services.append((service_name or "").strip())
+        resources.append((r.get("resource_name_snapshot") or "").strip())
+
+    return {
+        "status": status,
+        "price": price,
+        "bucket": bucket,
+        "service": services,
+        "resource": resources,
+    }
+
+
+def _top_label(values):
+    counts = Counter(values)
+    counts.pop("", None)
+    if not counts:
+        return "-"
+    return counts.most_common(1)[0][0]
+
+
+def summarize_reservation_columns(columns, bucket=None):
+    """
+    Status counts, booked/done revenue and top service/resource, either for
+    every row or only for one period bucket.
+    """
+    status = columns["status"]
+    price = columns["price"]
+    services = columns["service"]
+    resources = columns["resource"]
+
+    if bucket is not None:
+        mask = [b == bucket for b in columns["bucket"]]
+        status = list(compress(status, mask))
+        price = list(compress(price, mask))
+        services = list(compress(services, mask))
+        resources = list(compress(resources, mask))
+
+    status_counts = Counter(status)
+
+    return {
+        "total_reservations": len(status),
+        "confirmed_reservations": status_counts[STATUS_CONFIRMED],
+        "canceled_reservations": status_counts[STATUS_CANCELED],
+        "done_reservations": status_counts[STATUS_DONE],
+        "total_booked_revenue": sum(
+            compress(price, (s == STATUS_CONFIRMED or s == STATUS_DONE for s in status)),
+            0.0,
+        ),
+        "total_done_revenue": sum(compress(price, (s == STATUS_DONE for s in status)), 0.0),
+        "top_service": _top_label(services),
+        "top_resource": _top_label(resources),
+    }
@@ -0,0 +1,112 @@
+# side_effects.py
+import concurrent.futures
+import contextvars
+import os
+import threading
+import time
+
+import metrics
+from log_utils import get_logger
+
+# Bounded thread pool for the independent network side effects of a write:
+# the calendar event and the WhatsApp confirmation of a booking, the event
+# deletes of a cancellation. They run concurrently, so the caller waits for
+# the slowest one rather than their sum, and every wait is capped.
+#
+#   SIDE_EFFECT_WORKERS=8     pool size per process
+#   SIDE_EFFECT_TIMEOUT=15    seconds to wait for a batch
+#
+# Tasks run in a copy of the caller's context, so DB statements they issue
+# still count towards the request's metrics and SQL profile. A task that
+# times out keeps running in the background; its result is dropped.
+
+WORKERS = int(os.getenv("SIDE_EFFECT_WORKERS") or 8)
+DEFAULT_TIMEOUT = float(os.getenv("SIDE_EFFECT_TIMEOUT") or 15)
+THREAD_PREFIX = "side-effect"
+
+log = get_logger("side_effects")
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+
+metrics.histogram("side_effect_seconds", "Duration of side effects run on the executor, by effect.")
+metrics.counter("side_effect_failures_total", "Side effects that raised or timed out, by effect and reason.")
+
+
+def _get_pool():
+    """
+    Created on first use in each process; pool threads do not survive a fork.
+    """
+    global _pool, _pool_pid
+    with _lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = concurrent.futures.ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix=THREAD_PREFIX)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _timed(name, fn):
+    def run():
+        started = time.perf_counter()
+        try:
+            return fn()
+        finally:
+            metrics.observe("side_effect_seconds", time.perf_counter() - started, effect=name)
+    return run
+
+
+def _run(tasks, timeout):
+    """
+    tasks: [(name, fn)]. Returns the results in the same order, None for a
+    task that raised or was still running after timeout seconds.
+    """
+    if threading.current_thread().name.startswith(THREAD_PREFIX):
+        # Nested use from a pool thread runs inline, so it cannot exhaust
+        # the pool and deadlock.
+        results = []
+        for name, fn in tasks:
+            try:
+                results.append(_timed(name, fn)())
+            except Exception as e:
+                metrics.inc("side_effect_failures_total", effect=name, reason="error")
+                log.exception("side effect %s failed: %s", name, e)
+                results.append(None)
+        return results
+
+    pool = _get_pool()
+    futures = [pool.submit(contextvars.copy_context().run, _timed(name, fn)) for name, fn in tasks]
+    concurrent.futures.wait(futures, timeout=timeout)
+
+    results = []
+    for (name, _), future in zip(tasks, futures):
+        if not future.done():
+            metrics.inc("side_effect_failures_total", effect=name, reason="timeout")
+            log.warning("side effect %s still running after %.1fs; continuing without it", name, timeout)
+            results.append(None)
+        elif future.exception() is not None:
+            error = future.exception()
+            metrics.inc("side_effect_failures_total", effect=name, reason="error")
+            log.error("side effect %s failed: %s", name, error, exc_info=error)
+            results.append(None)
+        else:
+            results.append(future.result())
+    return results
+
+
+def run_concurrently(calls, timeout=DEFAULT_TIMEOUT):
+    """
+    calls: {name: zero-argument callable}. Runs them on the pool and returns
+    {name: result}; a call that raised or did not finish within timeout
+    seconds (for the whole batch) maps to None and is logged.
+    """
+    names = list(calls)
+    return dict(zip(names, _run([(name, calls[name]) for name in names], timeout)))
+
+
+def map_concurrently(name, fn, items, timeout=DEFAULT_TIMEOUT):
+    """
+    [fn(item) for item in items], run concurrently; an item that failed or
+    timed out gives None.
+    """
+    return _run([(name, (lambda item=item: fn(item))) for item in items], timeout)
@@ -0,0 +1,183 @@
+# sql_profiler.py
+import collections
+import contextvars
+import functools
+import itertools
+import os
+import re
+import sys
+import threading
+import time
+
+# Per-request SQL profile: every statement run through db_utils'
+# InstrumentedCursor while a profile is active is recorded with its
+# duration and the app call site that issued it. When the request ends the
+# statements are grouped by their normalized text, and any statement run
+# more than SQL_PROFILE_N_PLUS_ONE times is flagged as an N+1 candidate.
+#
+#   SQL_PROFILE=1                profile every request (dev); reports with
+#                                N+1 findings are logged at WARNING
+#   SQL_PROFILE_TOKEN=...        value of the X-SQL-Profile header that turns
+#                                profiling on for one request (support users
+#                                can send any value)
+#   SQL_PROFILE_N_PLUS_ONE=5
+#   SQL_PROFILE_KEEP=50          recent reports kept for /admin/sql-profile
+#
+# Nothing is recorded outside an active profile, so the cost in production
+# is one context variable read per statement.
+
+ALWAYS_ON = (os.getenv("SQL_PROFILE") or "").strip().lower() in ("1", "true", "yes", "on")
+N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_PROFILE_N_PLUS_ONE") or 5)
+KEEP_REPORTS = int(os.getenv("SQL_PROFILE_KEEP") or 50)
+CALL_SITE_DEPTH = 3
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_SKIP_FILES = {os.path.join(_APP_DIR, "db_utils.py"), os.path.abspath(__file__)}
+
+_profile = contextvars.ContextVar("sql_profile", default=None)
+_report_ids = itertools.count(1)
+_reports_lock = threading.Lock()
+_reports = collections.deque(maxlen=KEEP_REPORTS)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.$])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%(?:\(\w+\))?s")
+_VALUES_LIST = re.compile(r"\((?:\s*\?\s*,)*\s*\?\s*\)(?:\s*,\s*\((?:\s*\?\s*,)*\s*\?\s*\))+")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,)+\s*\?\s*\)", re.IGNORECASE)
+
+
+@functools.lru_cache(maxsize=2048)
+def normalize_sql(sql):
+    """
+    Statement text with literals and placeholders replaced by ?, so the
+    same query with different arguments (or an execute_values batch of any
+    size) groups together.
+    """
+    sql = " ".join(sql.split())
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _VALUES_LIST.sub("(?), ...", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    return sql
+
+
+def _call_site():
+    """
+    The innermost app frames (outside the DB layer, site-packages and
+    decorator wrappers) that led to the statement, innermost first:
+    "get_service_info:2031 < is_resource_slot_full:3120".
+    """
+    frame = sys._getframe(2)
+    sites = []
+    while frame is not None and len(sites) < CALL_SITE_DEPTH:
+        filename = frame.f_code.co_filename
+        if filename.startswith(_APP_DIR) and filename not in _SKIP_FILES and "site-packages" not in filename \
+                and frame.f_code.co_name != "wrapper":
+            sites.append(f"{frame.f_code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return " < ".join(sites) or "?"
+
+
+def start(label, **context):
+    _profile.set({
+        "label": label,
+        "context": dict(context),
+        "started": time.perf_counter(),
+        "statements": [],
+    })
+
+
+def is_active():
+    return _profile.get() is not None
+
+
+def annotate(**context):
+    """
+    Adds fields to the active profile's report (message id, business id).
+    """
+    profile = _profile.get()
+    if profile is not None:
+        profile["context"].update(context)
+
+
+def record(sql, seconds):
+    profile = _profile.get()
+    if profile is None:
+        return
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", "replace")
+    elif not isinstance(sql, str):
+        sql = str(sql)
+    profile["statements"].append((sql, seconds, _call_site()))
+
+
+def finish():
+    """
+    Ends the active profile and returns its report, or None if no profile
+    was active. The report is also kept for recent_reports().
+    """
+    profile = _profile.get()
+    if profile is None:
+        return None
+    _profile.set(None)
+
+    groups = {}
+    for sql, seconds, site in profile["statements"]:
+        key = normalize_sql(sql)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {"sql": key, "count": 0, "total_ms": 0.0, "max_ms": 0.0, "call_sites": {}}
+        ms = seconds * 1000
+        group["count"] += 1
+        group["total_ms"] += ms
+        group["max_ms"] = max(group["max_ms"], ms)
+        group["call_sites"][site] = group["call_sites"].get(site, 0) + 1
+
+    statements = sorted(groups.values(), key=lambda g: (-g["count"], -g["total_ms"]))
+    for group in statements:
+        group["total_ms"] = round(group["total_ms"], 3)
+        group["max_ms"] = round(group["max_ms"], 3)
+
+    report = {
+        "id": next(_report_ids),
+        "label": profile["label"],
+        "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "wall_ms": round((time.perf_counter() - profile["started"]) * 1000, 3),
+        "queries": len(profile["statements"]),
+        "db_ms": round(sum(seconds for _, seconds, _ in profile["statements"]) * 1000, 3),
+        "distinct_statements": len(statements),
+        "n_plus_one_threshold": N_PLUS_ONE_THRESHOLD,
+        "n_plus_one": [g for g in statements if g["count"] > N_PLUS_ONE_THRESHOLD],
+        "statements": statements,
+    }
+    report.update(profile["context"])
+
+    with _reports_lock:
+        _reports.append(report)
+    return report
+
+
+def recent_reports():
+    with _reports_lock:
+        return list(reversed(_reports))
+
+
+def get_report(report_id):
+    with _reports_lock:
+        for report in _reports:
+            if report["id"] == report_id:
+                return report
+    return None
+
+
+def summarize(report):
+    """
+    Log message: totals, then one line per flagged statement and where it ran.
+    """
+    line = (f"sql profile #{report['id']} {report['label']}: {report['queries']} queries, "
+            f"{report['db_ms']:.1f} ms in SQL of {report['wall_ms']:.1f} ms")
+    for group in report["n_plus_one"]:
+        top_site = max(group["call_sites"].items(), key=lambda item: item[1])[0]
+        line += f"\n  N+1 x{group['count']} ({group['total_ms']:.1f} ms) at {top_site}: {group['sql'][:160]}"
+    return line